@@ -6,10 +6,67 @@ class Settings(BaseSettings):
     SECRET_KEY: str = ""
     REDIS_URL: str = "redis://localhost:6379"
     TOKEN_EXPIRE_SECONDS: int = 3600  # 1 hour
+    TOKEN_LOCAL_MARGIN_SECONDS: int = 60  # el caché en proceso caduca antes que Redis
+    TOKEN_REFRESH_MARGIN_SECONDS: int = 300  # renueva 5 min antes de caducar
+    TOKEN_REFRESH_JITTER_SECONDS: int = 60  # dispersa renovaciones entre réplicas
+    TOKEN_REFRESH_RETRY_SECONDS: int = 30  # reintento si la renovación falla
     SHAREPOINT_CLIENT_ID: str = ""
     SHAREPOINT_CLIENT_SECRET: str = ""
     DATABASE_URL: str = ""
 
+    # Clientes HTTP compartidos (uno por host externo)
+    HTTP2_ENABLED: bool = True
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    HTTP_TIMEOUT_SECONDS: float = 5.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+
+    # Reintentos y circuit breaker de los GET a Scania y Graph
+    HTTP_RETRY_ATTEMPTS: int = 3
+    HTTP_RETRY_BASE_DELAY_SECONDS: float = 0.5
+    HTTP_RETRY_MAX_DELAY_SECONDS: float = 30.0
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_SECONDS: float = 30.0
+
+    # Renovación en segundo plano del mapa de flota (< CACHE_TTL de 1 h)
+    VEHICLE_MAP_REFRESH_MINUTES: int = 30
+
+    # Descargas concurrentes (segmentos + evaluación) por VIN y ventana
+    SCANIA_SEGMENT_CONCURRENCY: int = 3
+
+    # Rate limit compartido (Redis) por endpoint de Scania: peticiones/s y ráfaga.
+    # Un valor <= 0 desactiva el límite de ese endpoint.
+    SCANIA_RATE_VEHICLESTATUSES: float = 5.0
+    SCANIA_BURST_VEHICLESTATUSES: int = 10
+    SCANIA_RATE_VEHICLES: float = 0.5
+    SCANIA_BURST_VEHICLES: int = 2
+    SCANIA_RATE_EVALUATION: float = 2.0
+    SCANIA_BURST_EVALUATION: int = 5
+    REPORT_SCANIA_CONCURRENCY: int = 8
+    REPORT_SCANIA_VIN_TIMEOUT_SECONDS: float = 120.0  # descarga contigua de estatus de un tracto
+
+    # Almacén local de estatus rFMS (tabla vehicle_status_sample)
+    SCANIA_STATUS_STORE_ENABLED: bool = True
+    SCANIA_STATUS_SYNC_MINUTES: int = 15
+    SCANIA_STATUS_SYNC_BACKFILL_DAYS: int = 35
+    SCANIA_STATUS_SYNC_SETTLE_MINUTES: int = 120  # la marca de agua no pasa de ahora - esto
+
+    # Foto de flota (latestOnly) para /api/vehicle_history/latest
+    SCANIA_SNAPSHOT_POLL_SECONDS: int = 60
+
+    # Caché en Redis de estatus rFMS por VIN en cubetas de un día
+    SCANIA_SEGMENT_CACHE_ENABLED: bool = True
+    SCANIA_SEGMENT_CACHE_TTL_DAYS: float = 14
+    SCANIA_SEGMENT_CACHE_SETTLE_MINUTES: int = 120  # no cachear lo más reciente
+
+    # Caché en Redis del Vehicle Evaluation Report (VIN + ventana al minuto)
+    EVALUATION_TIMEOUT_SECONDS: float = 20.0  # un Vehicle Evaluation Report (una ventana)
+    EVALUATION_CACHE_CLOSED_TTL_SECONDS: int = 30 * 86400  # ventana ya cerrada
+    EVALUATION_CACHE_OPEN_TTL_SECONDS: int = 300  # ventana que toca "ahora"
+    EVALUATION_CACHE_NEGATIVE_TTL_SECONDS: int = 3600  # rechazos definitivos / sin datos
+    EVALUATION_CACHE_TRANSIENT_TTL_SECONDS: int = 300  # timeouts, red, 5xx, 429
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,52 @@
+import httpx
+from app.config import settings
+
+# Un cliente de larga vida por host externo: reutiliza conexiones TCP/TLS
+# (y multiplexa con HTTP/2) entre todas las llamadas al mismo upstream.
+SCANIA_HOST = "scania"
+GRAPH_HOST = "graph"
+MS_LOGIN_HOST = "ms_login"
+
+HOSTS = (SCANIA_HOST, GRAPH_HOST, MS_LOGIN_HOST)
+
+_http_clients: dict[str, httpx.AsyncClient] = {}
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=settings.HTTP2_ENABLED,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(
+            settings.HTTP_TIMEOUT_SECONDS,
+            connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+        ),
+    )
+
+
+def get_http_client(host: str) -> httpx.AsyncClient:
+    client = _http_clients.get(host)
+    if client is None or client.is_closed:
+        client = _build_http_client()
+        _http_clients[host] = client
+    return client
+
+
+def set_http_client(host: str, client: httpx.AsyncClient) -> None:
+    """Reemplaza el cliente de un host (p. ej. con un MockTransport en tests)."""
+    _http_clients[host] = client
+
+
+def init_http_clients() -> None:
+    for host in HOSTS:
+        get_http_client(host)
+
+
+async def close_http_clients() -> None:
+    clients = list(_http_clients.values())
+    _http_clients.clear()
+    for client in clients:
+        await client.aclose()
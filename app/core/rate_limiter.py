@@ -0,0 +1,80 @@
+import asyncio
+import logging
+
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.core.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Presupuestos por endpoint de Scania
+VEHICLESTATUSES = "vehiclestatuses"
+VEHICLES = "vehicles"
+EVALUATION = "evaluation"
+
+REDIS_KEY_PREFIX = "rate_limit:scania:"
+
+# Token bucket atómico compartido entre réplicas.  Usa el reloj de Redis y
+# reserva el token aunque haya que esperar (tokens < 0): cada llamador
+# recibe cuánto dormir y los turnos quedan en orden de llegada.
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate) - requested
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+if tokens >= 0 then
+  return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+
+class RedisTokenBucket:
+    def __init__(self, name: str, rate_per_second: float, burst: int):
+        self.key = f"{REDIS_KEY_PREFIX}{name}"
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self._script = None
+
+    async def acquire(self, tokens: int = 1):
+        """Espera hasta que haya presupuesto.  Si Redis no responde no se
+        bloquea la llamada (fail-open)."""
+        if self.rate_per_second <= 0:
+            return
+        if self._script is None:
+            self._script = get_redis_client().register_script(TOKEN_BUCKET_LUA)
+        try:
+            wait = float(await self._script(
+                keys=[self.key],
+                args=[self.rate_per_second, self.burst, tokens],
+            ))
+        except RedisError:
+            logger.warning("Rate limiter %s sin Redis; se continúa sin limitar", self.key)
+            return
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_rate_limiters: dict[str, RedisTokenBucket] = {}
+
+
+def get_rate_limiter(endpoint: str) -> RedisTokenBucket:
+    limiter = _rate_limiters.get(endpoint)
+    if limiter is None:
+        budgets = {
+            VEHICLESTATUSES: (settings.SCANIA_RATE_VEHICLESTATUSES, settings.SCANIA_BURST_VEHICLESTATUSES),
+            VEHICLES: (settings.SCANIA_RATE_VEHICLES, settings.SCANIA_BURST_VEHICLES),
+            EVALUATION: (settings.SCANIA_RATE_EVALUATION, settings.SCANIA_BURST_EVALUATION),
+        }
+        rate, burst = budgets[endpoint]
+        limiter = RedisTokenBucket(endpoint, rate, burst)
+        _rate_limiters[endpoint] = limiter
+    return limiter
@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, UTC
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """El host tuvo demasiados fallos seguidos; se falla rápido sin llamarlo."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def before_call(self):
+        if self._opened_at is None:
+            return
+        if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+            raise CircuitOpenError(f"Circuito abierto para {self.name}")
+        # Semiabierto: se deja pasar una sola llamada de prueba
+        self._trial_in_flight = True
+
+    def release_trial(self):
+        """La llamada de prueba terminó sin veredicto (cancelada o con un
+        error ajeno al host): el circuito sigue semiabierto para otra prueba."""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self._trial_in_flight or self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                logger.warning("Circuito abierto para %s tras %s fallos", self.name, self._failures)
+            self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+_circuit_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(host: str) -> CircuitBreaker:
+    breaker = _circuit_breakers.get(host)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            host,
+            failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.CIRCUIT_RESET_SECONDS,
+        )
+        _circuit_breakers[host] = breaker
+    return breaker
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(UTC)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_seconds(attempt: int) -> float:
+    """Backoff exponencial con full jitter."""
+    cap = min(settings.HTTP_RETRY_MAX_DELAY_SECONDS, settings.HTTP_RETRY_BASE_DELAY_SECONDS * 2 ** attempt)
+    return random.uniform(0, cap)
+
+
+async def resilient_get(
+    http_client: httpx.AsyncClient,
+    url: str,
+    *,
+    host: str,
+    before_attempt: Callable[[], Awaitable[None]] | None = None,
+    **kwargs,
+) -> httpx.Response:
+    """GET idempotente con reintentos (429/5xx y errores de transporte),
+    respetando Retry-After, y con circuit breaker por host.  Devuelve la
+    última respuesta aunque sea de error; el llamador decide si la eleva."""
+    breaker = get_circuit_breaker(host)
+    attempts = settings.HTTP_RETRY_ATTEMPTS + 1
+
+    for attempt in range(attempts):
+        breaker.before_call()
+        last_attempt = attempt == attempts - 1
+        try:
+            if before_attempt is not None:
+                await before_attempt()
+            response = await http_client.get(url, **kwargs)
+        except httpx.TransportError:
+            breaker.record_failure()
+            if last_attempt:
+                raise
+            delay = _backoff_seconds(attempt)
+        except BaseException:
+            # Cancelación o error inesperado: no debe dejar la prueba del
+            # circuito semiabierto tomada para siempre
+            breaker.release_trial()
+            raise
+        else:
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                breaker.record_success()
+                return response
+            # 429 es throttling, no caída del host: ni abre ni cierra el
+            # circuito (una prueba semiabierta queda libre para otra llamada)
+            if response.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.release_trial()
+            if last_attempt:
+                return response
+            retry_after = _retry_after_seconds(response)
+            delay = (
+                min(retry_after, settings.HTTP_RETRY_MAX_DELAY_SECONDS)
+                if retry_after is not None
+                else _backoff_seconds(attempt)
+            )
+            await response.aclose()
+
+        logger.info("Reintentando GET %s en %.2fs (intento %s/%s)", url, delay, attempt + 2, attempts)
+        await asyncio.sleep(delay)
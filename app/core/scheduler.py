@@ -1,26 +1,92 @@
+import logging
+import random
+from datetime import datetime, timedelta, UTC
+
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from app.config import settings
 from app.services.scania_auth.jobs import refresh_scania_token
 from app.services.sharepoint_auth.jobs import refresh_sharepoint_token, update_sharepoint_items, update_sharepoint_reassignments
+from app.services.scania_vehicles.jobs import refresh_vehicle_map
+from app.services.scania_vehicles_status.jobs import poll_fleet_snapshot, sync_vehicle_statuses
+
+logger = logging.getLogger(__name__)
 
 scheduler = AsyncIOScheduler()
 
 
+def _next_refresh_delay(ttl: int | None) -> float:
+    """Segundos hasta la próxima renovación: antes de que caduque el token,
+    con margen de seguridad y jitter para no sincronizar réplicas."""
+    if not ttl or ttl <= 0:
+        return settings.TOKEN_REFRESH_RETRY_SECONDS
+    delay = ttl - settings.TOKEN_REFRESH_MARGIN_SECONDS
+    delay -= random.uniform(0, settings.TOKEN_REFRESH_JITTER_SECONDS)
+    return max(delay, settings.TOKEN_REFRESH_RETRY_SECONDS)
+
+
+def _schedule_once(func, job_id: str, delay_seconds: float):
+    # Cada corrida agenda la siguiente: una ejecución descartada por llegar
+    # tarde (loop ocupado, pausa del proceso) cortaría la cadena, así que
+    # se ejecuta siempre, aunque sea con retraso.
+    scheduler.add_job(
+        func,
+        trigger="date",
+        run_date=datetime.now(UTC) + timedelta(seconds=delay_seconds),
+        id=job_id,
+        misfire_grace_time=None,
+        coalesce=True,
+        replace_existing=True
+    )
+
+
+async def _refresh_scania_token_job():
+    try:
+        ttl = await refresh_scania_token()
+    except Exception:
+        logger.exception("Fallo renovando token Scania")
+        ttl = None
+    _schedule_once(_refresh_scania_token_job, "refresh_token_job", _next_refresh_delay(ttl))
+
+
+async def _refresh_sharepoint_token_job():
+    try:
+        ttl = await refresh_sharepoint_token()
+    except Exception:
+        logger.exception("Fallo renovando token SharePoint")
+        ttl = None
+    _schedule_once(_refresh_sharepoint_token_job, "refresh_sharepoint_token_job", _next_refresh_delay(ttl))
+
+
 def start_scheduler():
+    # Los tokens se renuevan según su caducidad real; la primera corrida
+    # sólo consulta el TTL vigente y agenda la siguiente.
     if not scheduler.get_job("refresh_token_job"):
+        _schedule_once(_refresh_scania_token_job, "refresh_token_job", 0)
+
+    if not scheduler.get_job("refresh_sharepoint_token_job"):
+        _schedule_once(_refresh_sharepoint_token_job, "refresh_sharepoint_token_job", 0)
+
+    if not scheduler.get_job("refresh_vehicle_map_job"):
+        # Corre también al arrancar para que ninguna petición espere la flota
         scheduler.add_job(
-            refresh_scania_token,
+            refresh_vehicle_map,
             trigger="interval",
-            minutes=1,
-            id="refresh_token_job",
+            minutes=settings.VEHICLE_MAP_REFRESH_MINUTES,
+            next_run_time=datetime.now(UTC),
+            id="refresh_vehicle_map_job",
+            max_instances=1,
             replace_existing=True
         )
 
-    if not scheduler.get_job("refresh_sharepoint_token_job"):
+    if not scheduler.get_job("poll_fleet_snapshot_job"):
         scheduler.add_job(
-            refresh_sharepoint_token,
+            poll_fleet_snapshot,
             trigger="interval",
-            minutes=30,
-            id="refresh_sharepoint_token_job",
+            seconds=settings.SCANIA_SNAPSHOT_POLL_SECONDS,
+            next_run_time=datetime.now(UTC),
+            id="poll_fleet_snapshot_job",
+            max_instances=1,
+            coalesce=True,
             replace_existing=True
         )
 
@@ -44,6 +110,16 @@ def start_scheduler():
             replace_existing=True
         )
 
+    if settings.SCANIA_STATUS_STORE_ENABLED and not scheduler.get_job("sync_vehicle_statuses_job"):
+        scheduler.add_job(
+            sync_vehicle_statuses,
+            trigger="interval",
+            minutes=settings.SCANIA_STATUS_SYNC_MINUTES,
+            id="sync_vehicle_statuses_job",
+            max_instances=1,
+            replace_existing=True
+        )
+
     if not scheduler.running:
         scheduler.start()
 
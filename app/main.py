@@ -6,6 +6,7 @@ from app.services.scania_vehicles.routers import router as vehicles_router
 from app.services.scania_vehicles_status.routers import router as vehicle_history_router
 
 from app.core.scheduler import start_scheduler, shutdown_scheduler
+from app.core.http_client import init_http_clients, close_http_clients
 import uvicorn
 from app.utils import setup_logging
 
@@ -15,10 +16,12 @@ setup_logging()
 @asynccontextmanager
 async def lifespan(_: FastAPI):
     # Startup
+    init_http_clients()
     start_scheduler()
     yield
     # Shutdown
     shutdown_scheduler()
+    await close_http_clients()
 
 app = FastAPI(
     title="My Microservice API",
@@ -0,0 +1,294 @@
+"""
+lookups.py
+────────────────────────────────────────────────────────────────────────────
+• Búsquedas vectorizadas que usa generate_excel_report sobre los Excel de
+  OneDrive (peajes, diésel, factores) y sobre los propios viajes (viaje
+  anterior del tracto).
+• Cada tabla se ordena una sola vez; cada viaje se resuelve con
+  searchsorted, merge_asof o groupby().shift() en lugar de filtrar el
+  DataFrame completo fila por fila.
+• Las fechas de carga de SharePoint se leen con una regla por valor que
+  get_filtered_logs repite en SQL.
+• Las tablas de diésel y factores se construyen una vez por versión del
+  archivo (ver por_version) y se reusan entre reportes.
+"""
+
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+import numpy as np
+import pandas as pd
+
+T = TypeVar("T")
+
+
+def _primero(df: pd.DataFrame, *columnas: str) -> pd.Series:
+    """Equivale a ``r.get(a) or r.get(b)`` fila por fila: el primer valor
+    "verdadero" en el orden dado, o el último aunque sea falso."""
+    out = pd.Series([None] * len(df), index=df.index, dtype=object)
+    for i, col in enumerate(columnas):
+        if col not in df.columns:
+            continue
+        vals = df[col].astype(object)
+        if i == len(columnas) - 1:
+            usar = out.map(lambda v: not v)
+        else:
+            usar = out.map(lambda v: not v) & vals.map(bool)
+        out = out.where(~usar, vals)
+    return out
+
+
+def _fecha_hora(fecha: pd.Series, hora: pd.Series) -> pd.Series:
+    """``pd.to_datetime(f"{fecha.date()} {hora}")`` por elemento; lo que no
+    se puede interpretar queda NaT."""
+    dia = pd.to_datetime(fecha, errors="coerce", format="mixed")
+    texto = dia.dt.date.astype(str) + " " + hora.map(str)
+    return pd.to_datetime(texto, errors="coerce", format="mixed").astype("datetime64[ns]")
+
+
+# DD/MM/AAAA… y AAAA-MM-DD… (el resto del texto, p. ej. la hora, se ignora).
+# Sintaxis válida tanto en `re` como en las expresiones de PostgreSQL;
+# [0-9] y no \d, que también acepta dígitos Unicode que ::int rechaza.
+FECHA_DMY = r"^\s*([0-9]{1,2})/([0-9]{1,2})/([1-9][0-9]{3})"
+FECHA_YMD = r"^\s*([1-9][0-9]{3})-([0-9]{1,2})-([0-9]{1,2})"
+
+
+def fechas_sharepoint(valores: pd.Series) -> pd.Series:
+    """Día de cada fecha de SharePoint (sin hora); NaT si no es texto, no
+    sigue FECHA_DMY ni FECHA_YMD o no es una fecha válida.
+
+    Cada valor se lee por sí solo.  ``pd.to_datetime(..., dayfirst=True)``
+    infiere un formato de la primera fila y con él lee (o descarta) las
+    demás, así que el mes de un viaje dependía de qué filas trajera la
+    consulta."""
+    texto = valores.where(valores.map(lambda v: isinstance(v, str))).astype(object)
+    dmy = texto.str.extract(FECHA_DMY)
+    ymd = texto.str.extract(FECHA_YMD)
+    partes = pd.DataFrame({
+        "year": dmy[2].fillna(ymd[0]),
+        "month": dmy[1].fillna(ymd[1]),
+        "day": dmy[0].fillna(ymd[2]),
+    }).astype(float)
+    return pd.to_datetime(partes, errors="coerce")
+
+
+class PeajesIndex:
+    """Peajes agrupados por No. Económico: fechas ordenadas y suma
+    acumulada del costo, para sumar cualquier rango con dos searchsorted."""
+
+    def __init__(self, peajes_df: pd.DataFrame):
+        validos = peajes_df[peajes_df["Fecha"].notna() & peajes_df["No. Económico"].notna()]
+        validos = validos.sort_values(["No. Económico", "Fecha"], kind="stable")
+        self._grupos: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        for eco, g in validos.groupby("No. Económico", sort=False):
+            fechas = g["Fecha"].to_numpy(dtype="datetime64[ns]")
+            costos = pd.to_numeric(g["Costo final"], errors="coerce").fillna(0).to_numpy(dtype=float)
+            self._grupos[eco] = (fechas, np.concatenate(([0.0], np.cumsum(costos))))
+
+    def sumar(self, ecos: pd.Series, inicios: pd.Series, fines: pd.Series) -> np.ndarray:
+        """Costo de peajes de cada fila con fecha en ``[inicio, fin]``
+        (ambos inclusive, como ``Series.between``)."""
+        out = np.zeros(len(ecos))
+        ini = inicios.to_numpy(dtype="datetime64[ns]")
+        fin = fines.to_numpy(dtype="datetime64[ns]")
+        validas = ~(np.isnat(ini) | np.isnat(fin))
+        posiciones = pd.Series(np.arange(len(ecos)))[validas]
+        claves = ecos.to_numpy(dtype=object)[validas]
+        for eco, idx in posiciones.groupby(claves, sort=False).indices.items():
+            grupo = self._grupos.get(eco)
+            if grupo is None:
+                continue
+            fechas, acumulado = grupo
+            pos = posiciones.to_numpy()[idx]
+            lo = np.searchsorted(fechas, ini[pos], side="left")
+            hi = np.searchsorted(fechas, fin[pos], side="right")
+            out[pos] = np.where(hi > lo, acumulado[hi] - acumulado[np.minimum(lo, hi)], 0.0)
+        return out
+
+
+def costo_peajes(df: pd.DataFrame, peajes: PeajesIndex) -> pd.Series:
+    """Costo total de peajes del rango carga→descarga de cada fila.
+
+    Acepta el DataFrame base (columnas 'fecha_carga', 'hora_carga', ...) o
+    el ya transformado ('FECHA_CARGA', 'HORA_CARGA', ...); una fila cuyo
+    rango no se puede interpretar cuesta 0."""
+    eco = _primero(df, "No. Económico", "NO_TRACTO")
+    ini = _fecha_hora(_primero(df, "fecha_carga", "FECHA_CARGA"), _primero(df, "hora_carga", "HORA_CARGA"))
+    fin = _fecha_hora(
+        _primero(df, "fecha_descarga", "FECHA_DESCARGA"), _primero(df, "hora_descarga", "HORA_DESCARGA")
+    )
+    return pd.Series(peajes.sumar(eco, ini, fin), index=df.index)
+
+
+class PrecioDieselIndex:
+    """Precio del diésel sin IVA vigente en cada fecha: el del último
+    registro de Diesel.xlsx con FECHA ≤ fecha (sin hora).
+
+    Un archivo sin las columnas FECHA o PRECIO_DIESEL es un ValueError:
+    sin ellas todos los precios saldrían vacíos sin aviso."""
+
+    def __init__(self, diesel_df: pd.DataFrame):
+        diesel_df = diesel_df.copy()
+        diesel_df.columns = diesel_df.columns.str.strip().str.upper()
+        faltantes = [c for c in ("FECHA", "PRECIO_DIESEL") if c not in diesel_df.columns]
+        if faltantes:
+            raise ValueError(f"Diesel.xlsx sin columnas {', '.join(faltantes)}")
+        fechas = pd.to_datetime(diesel_df["FECHA"], dayfirst=True, errors="coerce")
+        tabla = pd.DataFrame({
+            "FECHA": fechas.astype("datetime64[ns]"),
+            "PRECIO_DIESEL": pd.to_numeric(diesel_df["PRECIO_DIESEL"], errors="coerce").astype(float),
+        })
+        self._tabla = tabla[tabla["FECHA"].notna()].sort_values("FECHA", kind="stable").reset_index(drop=True)
+
+    def precios(self, fechas: pd.Series) -> pd.Series:
+        """Precio por fila (NaN sin fecha o antes del primer registro)."""
+        dias = pd.to_datetime(fechas, errors="coerce").astype("datetime64[ns]").dt.normalize()
+        izquierda = pd.DataFrame({"FECHA": dias.to_numpy(), "pos": np.arange(len(dias))})
+        izquierda = izquierda[izquierda["FECHA"].notna()].sort_values("FECHA", kind="stable")
+        out = np.full(len(dias), np.nan)
+        if len(izquierda) and len(self._tabla):
+            unidos = pd.merge_asof(izquierda, self._tabla, on="FECHA", direction="backward")
+            out[unidos["pos"].to_numpy()] = unidos["PRECIO_DIESEL"].to_numpy()
+        return pd.Series(out, index=fechas.index)
+
+
+class FactoresIndex:
+    """Factor de mantenimiento por odómetro: el de la primera fila de
+    Factores.xlsx con Rango1 ≤ odómetro ≤ Rango2, 0 si ninguna aplica.
+
+    Los rangos son cerrados y suelen compartir extremos, así que no forman
+    un IntervalIndex sin traslapes; se precalcula la primera fila que
+    cubre cada extremo y cada tramo abierto entre extremos, y cada
+    odómetro se resuelve con un searchsorted."""
+
+    def __init__(self, factores_df: pd.DataFrame):
+        validos = factores_df.dropna(subset=["Rango1", "Rango2"])
+        inicio = validos["Rango1"].to_numpy(dtype=float)
+        fin = validos["Rango2"].to_numpy(dtype=float)
+        factor = validos["Factor"].to_numpy(dtype=float)
+
+        self._bordes = np.unique(np.concatenate([inicio, fin]))
+        medios = (self._bordes[:-1] + self._bordes[1:]) / 2
+        self._en_borde = self._primer_factor(self._bordes, inicio, fin, factor)
+        self._en_tramo = self._primer_factor(medios, inicio, fin, factor)
+
+    @staticmethod
+    def _primer_factor(puntos, inicio, fin, factor) -> np.ndarray:
+        if not len(factor):
+            return np.zeros(len(puntos))
+        cubre = (inicio[None, :] <= puntos[:, None]) & (puntos[:, None] <= fin[None, :])
+        primero = cubre.argmax(axis=1)
+        return np.where(cubre.any(axis=1), factor[primero], 0.0)
+
+    def factores(self, odometros: pd.Series) -> pd.Series:
+        odo = pd.to_numeric(odometros, errors="coerce").to_numpy(dtype=float)
+        out = np.zeros(len(odo))
+        if not len(self._bordes):
+            return pd.Series(out, index=odometros.index)
+        validos = ~np.isnan(odo)
+        pos = np.searchsorted(self._bordes, odo[validos], side="left")
+        tope = np.minimum(pos, len(self._bordes) - 1)
+        exacto = self._bordes[tope] == odo[validos]
+        interior = ~exacto & (pos > 0) & (pos < len(self._bordes))
+        res = np.zeros(len(pos))
+        res[exacto] = self._en_borde[tope[exacto]]
+        res[interior] = self._en_tramo[pos[interior] - 1]
+        out[validos] = res
+        return pd.Series(out, index=odometros.index)
+
+
+# ─── Caché por versión del archivo ───────────────────────────────────
+_por_version: dict[str, tuple[Hashable, object]] = {}
+
+
+async def por_version(nombre: str, version: Hashable | None, construir: Callable[[], Awaitable[T]]) -> T:
+    """Devuelve la tabla de ``nombre`` ya construida si ``version`` no ha
+    cambiado; si cambió (o es desconocida) la reconstruye con ``construir``."""
+    guardado = _por_version.get(nombre)
+    if version is not None and guardado is not None and guardado[0] == version:
+        return guardado[1]
+    valor = await construir()
+    if version is not None:
+        _por_version[nombre] = (version, valor)
+    return valor
+
+
+# ─── Viajes vacíos ───────────────────────────────────────────────────
+_DATOS_TRACTO = ["NO_TRACTO", "PLACAS_TRACTO", "NO_REMOLQUE", "PLACAS_REMOLQUE", "NOMBRE_OP"]
+
+
+def _anterior(claves: pd.DataFrame, grupo: list[str], orden: str) -> pd.Series:
+    """Posición de la fila representativa del valor anterior de ``orden``
+    dentro de ``grupo`` (NaN si no hay).  El representante de cada valor
+    es su última fila."""
+    llaves = grupo + [orden]
+    k = claves.sort_values(llaves + ["pos"], kind="stable")
+    rep = k.drop_duplicates(llaves, keep="last").copy()
+    rep["prev"] = rep.groupby(grupo, sort=False)["pos"].shift()
+    unidos = k[llaves + ["pos"]].merge(rep[llaves + ["prev"]], on=llaves, how="left")
+    return pd.Series(unidos["prev"].to_numpy(), index=unidos["pos"].to_numpy())
+
+
+def viaje_anterior(viajes: pd.DataFrame) -> np.ndarray:
+    """Posición (0..n-1) del viaje anterior del mismo tracto, o -1.
+
+    Anterior = el de mayor (FECHA_CARGA, HORA_CARGA) estrictamente menor;
+    HORA_CARGA se compara como texto y una hora nula sólo cuenta por la
+    fecha, igual que el filtro fila por fila que reemplaza."""
+    n = len(viajes)
+    base = pd.DataFrame({
+        "NO_TRACTO": viajes["NO_TRACTO"].to_numpy(),
+        "FECHA_CARGA": viajes["FECHA_CARGA"].to_numpy(),
+        "HORA_CARGA": viajes["HORA_CARGA"].to_numpy(dtype=object),
+        "pos": np.arange(n),
+    })
+    con_fecha = base["FECHA_CARGA"].notna()
+    con_hora = con_fecha & base["HORA_CARGA"].notna()
+    prev = pd.Series(np.nan, index=base["pos"])
+
+    # Último viaje de una fecha anterior (el de mayor hora; las nulas al final)
+    fechas = base[con_fecha]
+    dia = fechas.sort_values(
+        ["NO_TRACTO", "FECHA_CARGA", "HORA_CARGA", "pos"], kind="stable", na_position="first"
+    ).drop_duplicates(["NO_TRACTO", "FECHA_CARGA"], keep="last").copy()
+    dia["prev"] = dia.groupby("NO_TRACTO", sort=False)["pos"].shift()
+    unidos = fechas.merge(dia[["NO_TRACTO", "FECHA_CARGA", "prev"]], on=["NO_TRACTO", "FECHA_CARGA"], how="left")
+    prev.loc[unidos["pos"].to_numpy()] = unidos["prev"].to_numpy()
+
+    # Mismo día y hora menor: tiene prioridad sobre el día anterior
+    if con_hora.any():
+        mismo_dia = _anterior(base[con_hora], ["NO_TRACTO", "FECHA_CARGA"], "HORA_CARGA").dropna()
+        prev.loc[mismo_dia.index] = mismo_dia.to_numpy()
+
+    return prev.fillna(-1).to_numpy(dtype=int)
+
+
+def viajes_con_vacios(viajes: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
+    """Antepone a cada viaje su viaje vacío: del destino del viaje anterior
+    del tracto al origen del actual.  Sin viaje anterior, el vacío copia
+    origen y destino del propio viaje y no lleva fecha de carga."""
+    base = viajes.reset_index(drop=True)
+    n = len(base)
+    prev = viaje_anterior(base)
+    tiene = pd.Series(prev >= 0)
+    fuente = base.iloc[np.where(prev >= 0, prev, np.arange(n))].reset_index(drop=True)
+
+    vac = pd.DataFrame("", index=base.index, columns=cols, dtype=object)
+    vac[["KM_RECORRIDOS", "CONSUMO_LTS_DIESEL", "LTS_ADBLUE_CONSUMIDOS"]] = None
+    for c in _DATOS_TRACTO:
+        vac[c] = fuente[c].astype(object)
+    vac["ORIGEN"] = fuente["DESTINO"].astype(object).where(tiene, base["ORIGEN"])
+    vac["DESTINO"] = base["ORIGEN"].astype(object).where(tiene, base["DESTINO"])
+    vac["FECHA_CARGA"] = fuente["FECHA_DESCARGA"].astype(object).where(tiene, "")
+    vac["HORA_CARGA"] = fuente["HORA_DESCARGA"].astype(object).where(tiene, "")
+    vac["FECHA_DESCARGA"] = base["FECHA_CARGA"].astype(object)
+    vac["HORA_DESCARGA"] = base["HORA_CARGA"].astype(object)
+    vac["CLIENTE"] = vac["EMPRESA"] = "VIAJE VACÍO"
+    vac["CARGA_KILOS"] = 0
+    vac["TR_NO_VIAJE"] = base["TR_NO_VIAJE"]
+
+    # vacío, viaje, vacío, viaje…
+    todo = pd.concat([vac, base[cols]], ignore_index=True)
+    orden = np.empty(2 * n, dtype=int)
+    orden[0::2] = np.arange(n)
+    orden[1::2] = np.arange(n) + n
+    return todo.iloc[orden].reset_index(drop=True)
@@ -1,22 +1,117 @@
+from typing import Any, Iterable
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+from sqlalchemy import String, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY
 
-async def get_filtered_logs(session: AsyncSession):
-    query = text("""
-        SELECT * FROM travel_log
-        WHERE fields::jsonb ? 'field_16'
-          AND fields::jsonb ? 'field_17'
-          AND (fields->>'F_CARGA_YEAR')::int = EXTRACT(YEAR FROM NOW())::int
-        ORDER BY created_at DESC
+from app.services.reporting_service.lookups import FECHA_DMY, FECHA_YMD
+
+# Llaves de `fields` que lee generate_excel_report (el resto del JSON no se
+# transfiere).  Los valores conservan su tipo JSON (texto, número, bool).
+REPORT_FIELDS = (
+    "Title", "REASIGNACION",
+    "field_1", "field_2", "field_3", "field_4", "field_6", "field_7", "field_8",
+    "field_9", "field_15", "field_16", "field_17", "field_19", "field_20", "field_22",
+    "NO_REMOLQUE", "ORIGEN_TAB", "DESTINO_TAB", "CARGA_KILOS", "REPARTOS1",
+    "COMISION_CLIENTE", "COMISION_OPERADOR", "GASTOS_OPERADOR",
+    "PEAJES_VIAPASS", "PEAJES_EFECTIVO",
+    # columnas del reporte que pasan tal cual si la lista de SharePoint las trae
+    "FLETE_VACIO", "FLETE_FALSO", "RECHAZOS", "RENDIMIENTO", "PRECIO_ADBLUE",
+    "COSTO_ADBLUE", "MANTTO_CAJAS", "RASTREO", "SEGURO", "LLANTAS",
+    "ADMINISTRACION", "MARKETING", "COSTO_TOTAL", "UTILIDAD_BRUTA",
+    "INGRESO_X_KM", "COSTO_X_KM", "UTILIDAD_X_KM",
+)
+
+
+def _verdadero_sql(valor: str) -> str:
+    """``bool(valor)`` de Python sobre un valor JSON (jsonb)."""
+    return f"""CASE jsonb_typeof({valor})
+                WHEN 'boolean' THEN {valor} = 'true'::jsonb
+                WHEN 'number' THEN {valor} <> '0'::jsonb
+                WHEN 'string' THEN {valor} <> '""'::jsonb
+                WHEN 'array' THEN {valor} <> '[]'::jsonb
+                WHEN 'object' THEN {valor} <> '{{}}'::jsonb
+                ELSE false
+            END"""
+
+
+async def get_filtered_logs(session: AsyncSession, mes: int):
+    """Viajes del año en curso que alimentan el reporte del mes ``mes``, con
+    sólo las llaves de REPORT_FIELDS como columnas (una llave ausente llega
+    como NULL).
+
+    Además de los viajes que cargan en el mes (fecha de carga leída como
+    en lookups.fechas_sharepoint) se traen, por tracto, los del día con
+    carga inmediato anterior y posterior: el primero da origen al viaje
+    vacío del primer viaje del mes y el vacío del segundo sale de una
+    descarga del mes.  Los viajes reasignados se traen siempre, porque su
+    duplicado carga en la fecha de descarga real.  El reporte vuelve a
+    filtrar por mes en el paso 7."""
+    columnas = ",\n               ".join(f"v.fields->'{k}' AS \"{k}\"" for k in REPORT_FIELDS)
+    tracto = "'ECO ' || regexp_replace(replace(t.fields->>'field_1', 'ECO', ''), '^\\s+|\\s+$', '', 'g')"
+    # Fecha de carga con la regla de fechas_sharepoint.  Los CASE anidados
+    # evitan que make_date reciba un mes o día fuera de rango (PostgreSQL no
+    # garantiza el orden de evaluación de un AND).
+    query = text(f"""
+        WITH viajes AS (
+            SELECT t.created_at, t.fields,
+                   {tracto} AS tracto,
+                   CASE WHEN p.mes BETWEEN 1 AND 12 AND p.dia >= 1 THEN
+                       CASE WHEN p.dia <= EXTRACT(DAY FROM make_date(p.anio, p.mes, 1) + interval '1 month - 1 day')
+                            THEN make_date(p.anio, p.mes, p.dia) END
+                   END AS carga,
+                   {_verdadero_sql("(t.fields::jsonb->'REASIGNACION')")} AS reasignado
+            FROM travel_log t
+            CROSS JOIN LATERAL (
+                SELECT regexp_match(t.fields->>'field_6', '{FECHA_DMY}') AS dmy,
+                       regexp_match(t.fields->>'field_6', '{FECHA_YMD}') AS ymd
+            ) f
+            CROSS JOIN LATERAL (
+                SELECT coalesce(f.dmy[3], f.ymd[1])::int AS anio,
+                       coalesce(f.dmy[2], f.ymd[2])::int AS mes,
+                       coalesce(f.dmy[1], f.ymd[3])::int AS dia
+            ) p
+            WHERE t.fields::jsonb ? 'field_16'
+              AND t.fields::jsonb ? 'field_17'
+              AND (t.fields->>'F_CARGA_YEAR')::int = EXTRACT(YEAR FROM NOW())::int
+        ),
+        del_mes AS (
+            SELECT tracto, min(carga) AS primera, max(carga) AS ultima
+            FROM viajes
+            WHERE EXTRACT(MONTH FROM carga) = :mes
+            GROUP BY tracto
+        ),
+        vecinos AS (
+            SELECT v.tracto,
+                   max(v.carga) FILTER (WHERE v.carga < m.primera) AS anterior,
+                   min(v.carga) FILTER (WHERE v.carga > m.ultima) AS siguiente
+            FROM viajes v
+            JOIN del_mes m ON m.tracto = v.tracto
+            GROUP BY v.tracto
+        )
+        SELECT {columnas}
+        FROM viajes v
+        LEFT JOIN vecinos n ON n.tracto = v.tracto
+        WHERE EXTRACT(MONTH FROM v.carga) = :mes
+           OR v.carga = n.anterior
+           OR v.carga = n.siguiente
+           OR v.reasignado
+        ORDER BY v.created_at DESC
     """)
-    result = await session.execute(query)
-    return result.fetchall()
+    result = await session.execute(query, {"mes": mes})
+    return result.mappings().all()
 
-async def get_reassignment_by_title(session: AsyncSession, title: str):
+
+async def get_reassignments_by_titles(session: AsyncSession, titles: Iterable[str]) -> dict[str, Any]:
+    """Reasignaciones de varios viajes en una sola consulta, por viaje_id.
+    Si un viaje tiene varias se toma la de menor id."""
+    titles = sorted({str(t) for t in titles if t})
+    if not titles:
+        return {}
     query = text("""
-        SELECT * FROM reassignments
-        WHERE (fields->>'viaje_id') = :title
-        LIMIT 1
-    """)
-    result = await session.execute(query, {"title": title})
-    return result.fetchone()
+        SELECT DISTINCT ON (fields->>'viaje_id') * FROM reassignments
+        WHERE (fields->>'viaje_id') = ANY(:titles)
+        ORDER BY fields->>'viaje_id', id
+    """).bindparams(bindparam("titles", type_=ARRAY(String)))
+    result = await session.execute(query, {"titles": titles})
+    return {str(row.fields.get("viaje_id")): row for row in result.fetchall()}
@@ -10,11 +10,15 @@ router = APIRouter()
 @router.get("/report")
 async def report_endpoint(
     session: AsyncSession = Depends(get_db),
-    mes: int = Query(default=None, description="Mes numérico para filtrar, 1-12")
+    mes: int = Query(default=None, description="Mes numérico para filtrar, 1-12"),
+    incluir_adblue: bool = Query(
+        default=True,
+        description="Calcula LTS_ADBLUE_CONSUMIDOS (requiere recorrer todas las muestras de cada viaje)",
+    ),
 ):
     mes_actual = datetime.now().month
     mes = mes if mes is not None else mes_actual
-    return await generate_excel_report(session, mes)
+    return await generate_excel_report(session, mes, incluir_adblue=incluir_adblue)
 
 @router.get("/pull/data")
 async def pull_data_report():
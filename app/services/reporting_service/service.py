@@ -4,15 +4,15 @@ generate_excel_report.py
 • Construye el reporte Excel de costos de viaje.
 • Integra: reasignaciones, viajes vacíos, peajes y datos de Scania
   (km, diésel y AdBlue) SOLO para los viajes exportados.
-• Maneja time-outs del API Scania y evita peticiones duplicadas
-  mediante un pequeño caché in-memory.
+• Maneja time-outs del API Scania y hace una sola descarga contigua de
+  estatus por tracto para todos sus viajes.
 """
 
 import io
 import asyncio
 import logging
 from asyncio import Semaphore, gather
-from typing import List, Any
+from typing import Any
 
 import httpx
 import pandas as pd
@@ -22,34 +22,60 @@ from openpyxl.styles import PatternFill
 from openpyxl.utils import get_column_letter
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
+from app.core.resilience import CircuitOpenError
+
 # ─── Servicios propios ───────────────────────────────────────────────
+from app.services.reporting_service.lookups import (
+    FactoresIndex,
+    PeajesIndex,
+    PrecioDieselIndex,
+    costo_peajes,
+    fechas_sharepoint,
+    por_version,
+    viajes_con_vacios,
+)
 from app.services.reporting_service.repository import (
     get_filtered_logs,
-    get_reassignment_by_title,
+    get_reassignments_by_titles,
 )
 from app.services.sharepoint_auth.ms_graph import (
+    buscar_archivo_onedrive,
+    version_archivo,
     leer_excel_desde_onedrive,
     leer_diesel_desde_onedrive,
     leer_factores_desde_onedrive,
 )
-from app.services.scania_vehicles.vehicle_map import get_vehicle_map
-from app.services.scania_vehicles_status.service import get_vehicle_historical_data
+from app.services.scania_vehicles.vehicle_map import get_vehicle_index
+from app.services.scania_vehicles_status.service import get_vehicle_window_summaries
 
 logger = logging.getLogger(__name__)
 
 
-async def generate_excel_report(session: AsyncSession, mes: int) -> StreamingResponse:
+async def generate_excel_report(
+    session: AsyncSession,
+    mes: int,
+    incluir_adblue: bool = True,
+) -> StreamingResponse:
     # ╔════════════════ 1. VIAJES + REASIGNACIONES ══════════════════════╗
-    records = await get_filtered_logs(session)
-    data = [r.fields for r in records]
+    # Viajes del mes (más los vecinos que necesitan los vacíos) con sólo
+    # las llaves que se usan; el paso 7 deja exactamente las filas del mes
+    records = await get_filtered_logs(session, mes)
+    # Una llave ausente en el JSON llega como NULL: se omite para que la
+    # columna falte igual que antes (y el paso 4 la rellene con "")
+    data = [{k: v for k, v in r.items() if v is not None} for r in records]
 
     fechas_reasig, horas_reasig = {}, {}
     fechas_desc_real, horas_desc_real = {}, {}
     tracto_reasig: dict[str, Any] = {}
     fecha_desc_prin, hora_desc_prin = {}, {}
 
-    for row in records:
-        f = row.fields
+    # Todas las reasignaciones de los viajes marcados, en una sola consulta
+    reasignaciones = await get_reassignments_by_titles(
+        session, (f.get("Title") for f in data if f.get("REASIGNACION"))
+    )
+
+    for f in data:
         t = f.get("Title")
 
         # descarga original del viaje
@@ -58,7 +84,7 @@ async def generate_excel_report(session: AsyncSession, mes: int) -> StreamingRes
         hora_desc_prin[t] = None if pd.isna(h_raw) else h_raw.strftime("%H:%M:%S")
 
         if f.get("REASIGNACION"):
-            reas = await get_reassignment_by_title(session, t)
+            reas = reasignaciones.get(str(t))
             if reas:
                 ts_reas = pd.to_datetime(
                     reas.fields.get("fecha_reasignacion"), dayfirst=True, errors="coerce"
@@ -85,10 +111,7 @@ async def generate_excel_report(session: AsyncSession, mes: int) -> StreamingRes
                 }
 
     # ╠════════════════ 2. DATAFRAME BASE ══════════════════════════════╣
-    df = (
-        pd.DataFrame(data)
-        .drop(columns=["@odata.etag"], errors="ignore")
-    )
+    df = pd.DataFrame(data)
 
     df["field_16"] = df.apply(
         lambda r: fechas_reasig.get(r["Title"])
@@ -108,7 +131,8 @@ async def generate_excel_report(session: AsyncSession, mes: int) -> StreamingRes
         }
     )
 
-    df["fecha_carga"]    = pd.to_datetime(df["fecha_carga"],    dayfirst=True, errors="coerce")
+    # Misma lectura de la fecha de carga con la que get_filtered_logs eligió los viajes
+    df["fecha_carga"]    = fechas_sharepoint(df["fecha_carga"])
     df["fecha_descarga"] = pd.to_datetime(df["fecha_descarga"], dayfirst=True, errors="coerce")
 
     def hora_fmt(row, campo, title, use_reasig=False):
@@ -136,57 +160,24 @@ async def generate_excel_report(session: AsyncSession, mes: int) -> StreamingRes
     peajes_df["No. Económico"] = peajes_df["No. Económico"].str.strip()
     peajes_df["Costo final"]   = pd.to_numeric(peajes_df["Costo final"], errors="coerce")
 
-    def costo_peajes(r):
-        """Devuelve el costo total de peajes para el rango indicado en la fila.
-
-        La función acepta filas en el formato original del DataFrame base
-        (columnas 'fecha_carga', 'hora_carga', ...) o en el formato ya
-        transformado del DataFrame final ('FECHA_CARGA', 'HORA_CARGA', ...).
-        """
-
-        eco = r.get("No. Económico") or r.get("NO_TRACTO")
-        fecha_carga = r.get("fecha_carga") or r.get("FECHA_CARGA")
-        hora_carga = r.get("hora_carga") or r.get("HORA_CARGA")
-        fecha_descarga = r.get("fecha_descarga") or r.get("FECHA_DESCARGA")
-        hora_descarga = r.get("hora_descarga") or r.get("HORA_DESCARGA")
-
-        try:
-            ini = pd.to_datetime(f"{pd.to_datetime(fecha_carga).date()} {hora_carga}")
-            fin = pd.to_datetime(f"{pd.to_datetime(fecha_descarga).date()} {hora_descarga}")
-        except Exception:
-            return 0
-
-        sel = peajes_df[
-            (peajes_df["No. Económico"] == eco)
-            & (peajes_df["Fecha"].between(ini, fin))
-        ]
-        return sel["Costo final"].sum()
-
-    df["PEAJES_VIAPASS"] = (df.apply(costo_peajes, axis=1) / 1.16).round(2)
+    # Una sola pasada: peajes ordenados por tracto y fecha con suma acumulada
+    peajes = PeajesIndex(peajes_df)
+
+    df["PEAJES_VIAPASS"] = (costo_peajes(df, peajes) / 1.16).round(2)
     df["PEAJES_EFECTIVO"] = (df["PEAJES_EFECTIVO"].fillna(0).astype(float) / 1.16).round(2)
     df["TOTAL_PEAJES"] = (df["PEAJES_VIAPASS"] + df["PEAJES_EFECTIVO"]).round(2)
 
     # ╠═══════════════ 3-bis. DIESEL ═══════════════════════════════════════╣
-    # Lee Diesel.xlsx y prepara un lookup de precios sin IVA
-    diesel_df = await leer_diesel_desde_onedrive()
-
-    # Normaliza encabezados y tipos para facilitar las búsquedas por fecha
-    diesel_df.columns = diesel_df.columns.str.strip().str.upper()
-    if "FECHA" in diesel_df.columns:
-        diesel_df["FECHA"] = pd.to_datetime(
-            diesel_df["FECHA"], dayfirst=True, errors="coerce"
-        )
-        diesel_df = diesel_df.sort_values("FECHA").reset_index(drop=True)
-
-    # ── helper de lookup (precio SIN IVA) ────────────────────────────────
-    def _precio_diesel_por_fecha(fecha: str | pd.Timestamp) -> float | None:
-        if pd.isna(fecha):
-            return None
-        fecha = pd.to_datetime(fecha).normalize()
-        rows = diesel_df[diesel_df["FECHA"] <= fecha]
-        if rows.empty:
-            return None
-        return float(rows.iloc[-1]["PRECIO_DIESEL"])
+    # Lookup de precios sin IVA por fecha; sólo se vuelve a descargar y
+    # construir cuando cambia la versión de Diesel.xlsx en OneDrive
+    archivo_diesel = await buscar_archivo_onedrive("Diesel.xlsx")
+
+    async def _construir_diesel() -> PrecioDieselIndex:
+        return PrecioDieselIndex(await leer_diesel_desde_onedrive(archivo=archivo_diesel))
+
+    precios_diesel = await por_version(
+        "Diesel.xlsx", version_archivo(archivo_diesel), _construir_diesel
+    )
 
         # ╠═══════════════ 4. ORDEN Y MAPEOS ════════════════════════════════╣
     df["eco_num"] = pd.to_numeric(
@@ -295,36 +286,9 @@ async def generate_excel_report(session: AsyncSession, mes: int) -> StreamingRes
         .drop(columns=["hora_sort"])
     )
 
-    rows_out: List[pd.Series] = []
-    for _, v in viajes.iterrows():
-        tracto, fc, hc = v["NO_TRACTO"], v["FECHA_CARGA"], v["HORA_CARGA"]
-        prev = viajes[
-            (viajes["NO_TRACTO"] == tracto)
-            & ((viajes["FECHA_CARGA"] < fc) |
-               ((viajes["FECHA_CARGA"] == fc) & (viajes["HORA_CARGA"] < hc)))
-        ].sort_values(["FECHA_CARGA", "HORA_CARGA"], ascending=False).head(1)
-
-        vac = pd.Series("", index=cols)
-        vac[["KM_RECORRIDOS", "CONSUMO_LTS_DIESEL", "LTS_ADBLUE_CONSUMIDOS"]] = None
-
-        if not prev.empty:
-            p = prev.iloc[0]
-            vac[["NO_TRACTO","PLACAS_TRACTO","NO_REMOLQUE","PLACAS_REMOLQUE","NOMBRE_OP"]] = \
-                p[["NO_TRACTO","PLACAS_TRACTO","NO_REMOLQUE","PLACAS_REMOLQUE","NOMBRE_OP"]]
-            vac["ORIGEN"], vac["DESTINO"] = p["DESTINO"], v["ORIGEN"]
-            vac["FECHA_CARGA"], vac["HORA_CARGA"] = p["FECHA_DESCARGA"], p["HORA_DESCARGA"]
-        else:
-            vac[["NO_TRACTO","PLACAS_TRACTO","NO_REMOLQUE","PLACAS_REMOLQUE","NOMBRE_OP"]] = \
-                v[["NO_TRACTO","PLACAS_TRACTO","NO_REMOLQUE","PLACAS_REMOLQUE","NOMBRE_OP"]]
-            vac["ORIGEN"], vac["DESTINO"] = v["ORIGEN"], v["DESTINO"]
-
-        vac["FECHA_DESCARGA"], vac["HORA_DESCARGA"] = fc, hc
-        vac["CLIENTE"] = vac["EMPRESA"] = "VIAJE VACÍO"
-        vac["CARGA_KILOS"], vac["TR_NO_VIAJE"] = 0, v["TR_NO_VIAJE"]
-
-        rows_out.extend([vac, v])
-
-    df_final = pd.DataFrame(rows_out).drop(columns=["ES_REASIG"])
+    # Un vacío antes de cada viaje: del destino del viaje anterior del
+    # tracto (groupby().shift() sobre los viajes ordenados) a su origen
+    df_final = viajes_con_vacios(viajes, cols)
 
     # ╠═══════════════ 6-bis. PEAJES PARA VIAJES VACÍOS ══════════════════════╣
     # Recalcula peajes donde aún no hay valor (los viajes vacíos vienen sin PEAJES_VIAPASS)
@@ -340,7 +304,7 @@ async def generate_excel_report(session: AsyncSession, mes: int) -> StreamingRes
 
     if mask_vacios.any():
         df_final.loc[mask_vacios, "PEAJES_VIAPASS"] = (
-            df_final[mask_vacios].apply(costo_peajes, axis=1) / 1.16
+            costo_peajes(df_final[mask_vacios], peajes) / 1.16
         ).round(2)
 
     # Asegura que PEAJES_EFECTIVO está numérico y rellena vacíos
@@ -367,74 +331,61 @@ async def generate_excel_report(session: AsyncSession, mes: int) -> StreamingRes
     )
 
     # ╠═══════════════ 8. DATOS SCANIA (km/diesel/adblue) ════════════════╣
-    vin_map = await get_vehicle_map()
-    sem = Semaphore(3)
-    _cache: dict[
-        tuple[str, str, str],
-        tuple[float | None, float | None, float | None, float | None],
-    ] = {}
+    # Una sola descarga contigua por tracto que cubre todos sus viajes del
+    # mes; cada viaje se resuelve localmente sobre esa serie.
+    vin_index = await get_vehicle_index()
+    # El cupo real con Scania lo impone el rate limiter compartido
+    sem = Semaphore(settings.REPORT_SCANIA_CONCURRENCY)
 
     def hhmmss(t):
         return "00:00:00" if t is None or pd.isna(t) else str(t).split(" ")[-1][:8]
 
-    async def fetch_scania(idx: int, row: pd.Series):
-        eco = str(row["NO_TRACTO"]).replace("ECO", "").strip()
-        vin = vin_map.get(eco)
-        if (
-            not vin
-            or pd.isna(row["FECHA_CARGA"])
-            or pd.isna(row["FECHA_DESCARGA"])
-        ):
-            return idx, None, None, None, None
-
+    ventanas: dict[str, list[tuple[Any, str, str]]] = {}
+    for idx, row in df_export.iterrows():
+        if pd.isna(row["FECHA_CARGA"]) or pd.isna(row["FECHA_DESCARGA"]):
+            continue
+        vin = vin_index.lookup(str(row["NO_TRACTO"]).replace("ECO", "").strip())
+        if not vin:
+            continue
         start = f"{row['FECHA_CARGA'].date()}T{hhmmss(row['HORA_CARGA'])}Z"
         stop  = f"{row['FECHA_DESCARGA'].date()}T{hhmmss(row['HORA_DESCARGA'])}Z"
-        key = (vin, start, stop)
-        if key in _cache:
-            return idx, *_cache[key]
+        ventanas.setdefault(vin, []).append((idx, start, stop))
 
+    async def fetch_scania(vin: str, viajes_vin: list[tuple[Any, str, str]]):
+        rango = f"{min(v[1] for v in viajes_vin)}–{max(v[2] for v in viajes_vin)}"
         async with sem:
+            # El plazo del tracto cubre sólo la descarga de estatus; cada
+            # evaluación tiene el suyo y, si vence, se conservan los viajes
+            # que alcanzaron a resolverse.
             try:
-                resp = await asyncio.wait_for(
-                    get_vehicle_historical_data(vin, start, stop),
-                    timeout=20,
-                )
-                s = resp["summary"]
-                km, diesel, adblue, odo = (
-                    (
-                        s.km_recorridos,
-                        s.consumo_lts_diesel,
-                        s.lts_adblue_consumidos,
-                        s.odometro,
-                    )
-                    if s
-                    else (None, None, None, None)
+                resumenes = await get_vehicle_window_summaries(
+                    vin,
+                    [(start, stop) for _, start, stop in viajes_vin],
+                    include_adblue=incluir_adblue,
+                    download_timeout=settings.REPORT_SCANIA_VIN_TIMEOUT_SECONDS,
                 )
             except (asyncio.TimeoutError, httpx.TimeoutException, httpx.ReadTimeout):
-                logger.warning("Timeout Scania %s  %s–%s", vin, start, stop)
-                km = diesel = adblue = odo = None
+                logger.warning("Timeout Scania %s  %s", vin, rango)
+                return []
+            except CircuitOpenError:
+                logger.warning("Scania no disponible (circuito abierto) %s  %s", vin, rango)
+                return []
             except Exception:
-                logger.exception("Fallo Scania %s  %s–%s", vin, start, stop)
-                km = diesel = adblue = odo = None
-
-        _cache[key] = (km, diesel, adblue, odo)
-        return idx, km, diesel, adblue, odo
+                logger.exception("Fallo Scania %s  %s", vin, rango)
+                return []
+        return [(idx, s) for (idx, _, _), s in zip(viajes_vin, resumenes)]
 
-    tasks = [
-        fetch_scania(i, r)
-        for i, r in df_export.iterrows()
-        if not pd.isna(r["FECHA_CARGA"]) and not pd.isna(r["FECHA_DESCARGA"])
-    ]
+    tasks = [fetch_scania(vin, viajes_vin) for vin, viajes_vin in ventanas.items()]
 
     for res in await gather(*tasks, return_exceptions=True):
         if isinstance(res, Exception):
             continue
-        idx, km, diesel, adblue, odo = res
-        if km is not None:
-            df_export.at[idx, "KM_RECORRIDOS"]         = round(km, 0)
-            df_export.at[idx, "CONSUMO_LTS_DIESEL"]    = round(diesel, 0)
-            df_export.at[idx, "LTS_ADBLUE_CONSUMIDOS"] = round(adblue, 2)
-            df_export.at[idx, "ODOMETRO"]              = round(odo, 0)
+        for idx, s in res:
+            if s is not None:
+                df_export.at[idx, "KM_RECORRIDOS"]         = round(s.km_recorridos, 0)
+                df_export.at[idx, "CONSUMO_LTS_DIESEL"]    = round(s.consumo_lts_diesel, 0)
+                df_export.at[idx, "LTS_ADBLUE_CONSUMIDOS"] = round(s.lts_adblue_consumidos, 2)
+                df_export.at[idx, "ODOMETRO"]              = round(s.odometro, 0)
 
     # ── normaliza cadenas vacías/None a float y rellena 0 ──────────────
     for col in ["KM_RECORRIDOS", "CONSUMO_LTS_DIESEL", "LTS_ADBLUE_CONSUMIDOS"]:
@@ -443,7 +394,7 @@ async def generate_excel_report(session: AsyncSession, mes: int) -> StreamingRes
     # ╠═══════════════ 8-bis. PRECIO Y COSTO DIÉSEL ════════════════════════╣
     # Calculamos $/L y el costo total de diesel para cada viaje
 
-    df_export["PRECIO_DIESEL"] = df_export["FECHA_CARGA"].apply(_precio_diesel_por_fecha)
+    df_export["PRECIO_DIESEL"] = precios_diesel.precios(df_export["FECHA_CARGA"])
 
     df_export["COSTO_DIESEL"] = (
             pd.to_numeric(df_export["CONSUMO_LTS_DIESEL"], errors="coerce") *
@@ -451,24 +402,18 @@ async def generate_excel_report(session: AsyncSession, mes: int) -> StreamingRes
     ).round(2)
 
     # ╠═══════════════ 8-ter. MANTTO TRACTOS ════════════════════════════╣
-    factores_df = await leer_factores_desde_onedrive()
-
-    def _factor_por_odometro(odo: float | None) -> float:
-        if odo is None or pd.isna(odo):
-            return 0.0
-        row = factores_df[
-            (factores_df["Rango1"] <= odo) & (odo <= factores_df["Rango2"])
-        ]
-        if row.empty:
-            return 0.0
-        return float(row.iloc[0]["Factor"])
+    archivo_factores = await buscar_archivo_onedrive("Factores.xlsx")
+
+    async def _construir_factores() -> FactoresIndex:
+        return FactoresIndex(await leer_factores_desde_onedrive(archivo=archivo_factores))
+
+    factores = await por_version(
+        "Factores.xlsx", version_archivo(archivo_factores), _construir_factores
+    )
 
     df_export["MANTTO_TRACTOS"] = (
-        df_export.apply(
-            lambda r: _factor_por_odometro(r["ODOMETRO"]) *
-            pd.to_numeric(r["KM_RECORRIDOS"], errors="coerce"),
-            axis=1,
-        )
+        factores.factores(df_export["ODOMETRO"]) *
+        pd.to_numeric(df_export["KM_RECORRIDOS"], errors="coerce")
     ).round(2)
     df_export = df_export.drop(columns=["ODOMETRO"])
 
@@ -1,5 +1,9 @@
 # app/services/scania_auth/auth.py
 
+import asyncio
+import base64
+import json
+import time
 from typing import Optional
 import httpx
 from app.core.redis_client import get_redis_client
@@ -10,10 +14,43 @@ from app.services.scania_auth.client import ScaniaClient
 REDIS_TOKEN_KEY = "scania_api_token"
 REDIS_REFRESH_TOKEN_KEY = "scania_refresh_token"
 
+
+def _token_lifetime(token_data: dict) -> int:
+    """Vida en segundos del token recién emitido: el campo de caducidad de
+    la respuesta si viene, si no el ``exp`` del JWT; ``TOKEN_EXPIRE_SECONDS``
+    sólo como último recurso."""
+    for key in ("expiresIn", "expires_in"):
+        if token_data.get(key):
+            return int(token_data[key])
+    try:
+        payload = token_data["token"].split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return max(0, int(claims["exp"] - time.time()))
+    except (IndexError, KeyError, TypeError, ValueError):
+        return settings.TOKEN_EXPIRE_SECONDS
+
+
 class ScaniaAuthService:
+    """Token de Scania con dos niveles de caché: memoria del proceso
+    (sin round trip) y Redis (compartido entre réplicas).  Los fallos de
+    caché concurrentes esperan a un único intercambio challenge/token."""
+
     def __init__(self):
         self.client = ScaniaClient()
         self.redis = get_redis_client()
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0  # time.monotonic()
+        self._token_lifetime = 0  # vida del último token emitido
+        self._lock = asyncio.Lock()
+
+    def _get_local_token(self) -> Optional[str]:
+        if self._token and time.monotonic() < self._token_expires_at:
+            return self._token
+        return None
+
+    def _set_local_token(self, token: str, ttl: int):
+        self._token = token
+        self._token_expires_at = time.monotonic() + max(0, ttl - settings.TOKEN_LOCAL_MARGIN_SECONDS)
 
     async def _get_token_from_redis(self) -> Optional[str]:
         return await self.redis.get(REDIS_TOKEN_KEY)
@@ -21,33 +58,86 @@ class ScaniaAuthService:
     async def _get_refresh_token_from_redis(self) -> Optional[str]:
         return await self.redis.get(REDIS_REFRESH_TOKEN_KEY)
 
-    async def _save_tokens_to_redis(self, token: str, refresh_token: str):
-        await self.redis.set(REDIS_TOKEN_KEY, token, ex=settings.TOKEN_EXPIRE_SECONDS)
+    async def _save_tokens_to_redis(self, token: str, refresh_token: str, ttl: int):
+        await self.redis.set(REDIS_TOKEN_KEY, token, ex=max(ttl, 1))
         await self.redis.set(REDIS_REFRESH_TOKEN_KEY, refresh_token, ex=86400)
 
-    async def fetch_new_token(self):
+    async def _save_tokens(self, token_data: dict) -> str:
+        ttl = _token_lifetime(token_data)
+        await self._save_tokens_to_redis(token_data["token"], token_data["refreshToken"], ttl)
+        self._set_local_token(token_data["token"], ttl)
+        self._token_lifetime = ttl
+        return token_data["token"]
+
+    async def _fetch_new_token(self) -> str:
         challenge = await self.client.get_challenge()
         response = create_challenge_response(settings.SECRET_KEY, challenge)
         token_data = await self.client.get_token(response)
-        await self._save_tokens_to_redis(token_data["token"], token_data["refreshToken"])
-        return token_data["token"]
+        return await self._save_tokens(token_data)
 
-    async def refresh_token(self):
+    async def _refresh_token(self) -> str:
         refresh_token = await self._get_refresh_token_from_redis()
         if not refresh_token:
-            return await self.fetch_new_token()
+            return await self._fetch_new_token()
         try:
             token_data = await self.client.refresh_token(refresh_token)
         except httpx.HTTPStatusError:
-            return await self.fetch_new_token()
-        await self._save_tokens_to_redis(token_data["token"], token_data["refreshToken"])
-        return token_data["token"]
+            return await self._fetch_new_token()
+        return await self._save_tokens(token_data)
+
+    async def fetch_new_token(self):
+        async with self._lock:
+            return await self._fetch_new_token()
+
+    async def refresh_token(self):
+        async with self._lock:
+            return await self._refresh_token()
+
+    async def refresh_if_expiring(self, margin: int) -> int:
+        """Renueva el token sólo si le quedan ``margin`` segundos o menos
+        (otra réplica pudo haberlo renovado ya).  Devuelve su vida restante."""
+        async with self._lock:
+            ttl = await self.redis.ttl(REDIS_TOKEN_KEY)
+            if ttl and ttl > margin:
+                token = await self._get_token_from_redis()
+                if token:
+                    self._set_local_token(token, ttl)
+                    return ttl
+            await self._refresh_token()
+            return self._token_lifetime
+
+    async def renew_after_unauthorized(self, rejected_token: str) -> str:
+        """Renovación bajo demanda tras un 401 con ``rejected_token``."""
+        async with self._lock:
+            token = self._get_local_token()
+            if token and token != rejected_token:
+                return token
+            self._token = None
+
+            token = await self._get_token_from_redis()
+            if token and token != rejected_token:
+                ttl = await self.redis.ttl(REDIS_TOKEN_KEY)
+                self._set_local_token(token, ttl if ttl and ttl > 0 else 0)
+                return token
+            return await self._refresh_token()
 
     async def get_token(self) -> str:
-        token = await self._get_token_from_redis()
+        token = self._get_local_token()
         if token:
             return token
-        return await self.fetch_new_token()
+
+        async with self._lock:
+            # Otro llamador pudo haberlo resuelto mientras esperábamos
+            token = self._get_local_token()
+            if token:
+                return token
+
+            token = await self._get_token_from_redis()
+            if token:
+                ttl = await self.redis.ttl(REDIS_TOKEN_KEY)
+                self._set_local_token(token, ttl if ttl and ttl > 0 else 0)
+                return token
+            return await self._fetch_new_token()
 
 
 auth_service = ScaniaAuthService()
@@ -1,4 +1,6 @@
+from app.config import settings
 from app.services.scania_auth.auth import auth_service
 
-async def refresh_scania_token():
-    await auth_service.refresh_token()
+async def refresh_scania_token() -> int:
+    """Renueva el token sólo si está por caducar; devuelve su vida restante."""
+    return await auth_service.refresh_if_expiring(settings.TOKEN_REFRESH_MARGIN_SECONDS)
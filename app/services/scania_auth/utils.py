@@ -1 +1,50 @@
-# Aquí puedes agregar utilidades específicas para Scania
+# Utilidades específicas para Scania
+import httpx
+
+from app.core.http_client import SCANIA_HOST
+from app.core.rate_limiter import get_rate_limiter
+from app.core.resilience import resilient_get
+from app.services.scania_auth.auth import auth_service
+
+
+def _auth_headers(token: str, accept: str) -> dict:
+    return {
+        "Authorization": f"Bearer {token}",
+        "Accept": accept,
+    }
+
+
+async def scania_get(
+    http_client: httpx.AsyncClient,
+    url: str,
+    *,
+    accept: str,
+    endpoint: str,
+    params: dict | None = None,
+) -> httpx.Response:
+    """GET autenticado contra Scania.  Cada intento consume del presupuesto
+    compartido de ``endpoint`` y pasa por la capa de reintentos/circuit
+    breaker.  Si el token es rechazado (401) se renueva bajo demanda y se
+    reintenta una sola vez."""
+    limiter = get_rate_limiter(endpoint)
+    token = await auth_service.get_token()
+    response = await resilient_get(
+        http_client,
+        url,
+        host=SCANIA_HOST,
+        before_attempt=limiter.acquire,
+        headers=_auth_headers(token, accept),
+        params=params,
+    )
+    if response.status_code == httpx.codes.UNAUTHORIZED:
+        token = await auth_service.renew_after_unauthorized(token)
+        response = await resilient_get(
+            http_client,
+            url,
+            host=SCANIA_HOST,
+            before_attempt=limiter.acquire,
+            headers=_auth_headers(token, accept),
+            params=params,
+        )
+    response.raise_for_status()
+    return response
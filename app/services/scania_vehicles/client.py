@@ -1,29 +1,48 @@
 from app.core.redis_client import get_redis_client
 from app.config import settings
+import asyncio
 import httpx
 import json
-from app.services.scania_auth.auth import auth_service
+import logging
+import time
+from typing import Optional
+from app.core.http_client import get_http_client, SCANIA_HOST
+from app.core.rate_limiter import VEHICLES
+from app.services.scania_auth.utils import scania_get
+from app.services.scania_vehicles.utils import VehicleIndex
+
+logger = logging.getLogger(__name__)
 
 REDIS_KEY = "scania_vehicle_map"
-CACHE_TTL = 3600  # 1 hora
+CACHE_TTL = 3600  # 1 hora: pasado este tiempo el mapa se considera viejo
+REDIS_KEY_TTL = 86400  # se conserva más tiempo para servirlo mientras se renueva
 
 class ScaniaVehiclesClient:
-    def __init__(self, base_url: str = settings.BASE_URL):
+    """Mapa de flota en dos niveles (memoria del proceso + Redis) con
+    stale-while-revalidate: un mapa viejo se sigue sirviendo mientras una
+    sola tarea en segundo plano lo renueva desde /rfms4/vehicles."""
+
+    def __init__(self, base_url: str = settings.BASE_URL, http_client: httpx.AsyncClient | None = None):
         self.base_url = base_url
+        self._http_client = http_client
+        self._index: Optional[VehicleIndex] = None
+        self._fetched_at = 0.0  # epoch, compartido vía Redis entre réplicas
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self._http_client or get_http_client(SCANIA_HOST)
 
     async def fetch_vehicles_from_api(self):
         url = f"{self.base_url}/rfms4/vehicles"
-        token = await auth_service.get_token()
-
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/json; rfms=vehicles.v4.0",
-        }
-
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+        response = await scania_get(
+            self.http_client,
+            url,
+            accept="application/json; rfms=vehicles.v4.0",
+            endpoint=VEHICLES,
+        )
+        data = response.json()
 
         # Validación extra para evitar errores futuros
         if "vehicleResponse" not in data or "vehicles" not in data["vehicleResponse"]:
@@ -31,24 +50,61 @@ class ScaniaVehiclesClient:
 
         return data["vehicleResponse"]["vehicles"]
 
-    async def get_vehicle_map(self) -> dict[str, str]:
-        redis_client = get_redis_client()
-        cached = await redis_client.get(REDIS_KEY)
-        if cached:
-            try:
-                return json.loads(cached)
-            except json.JSONDecodeError:
-                pass  # Si hay corrupción, seguimos a la API
+    def _is_stale(self) -> bool:
+        return time.time() - self._fetched_at >= CACHE_TTL
 
+    def _set_index(self, index: VehicleIndex, fetched_at: float):
+        self._index = index
+        self._fetched_at = fetched_at
+
+    async def _load_from_redis(self) -> bool:
+        cached = await get_redis_client().get(REDIS_KEY)
+        if not cached:
+            return False
+        try:
+            payload = json.loads(cached)
+        except json.JSONDecodeError:
+            return False  # Si hay corrupción, seguimos a la API
+        if "vehicles" in payload and "fetched_at" in payload:
+            self._set_index(VehicleIndex(payload["vehicles"]), float(payload["fetched_at"]))
+        else:
+            # Formato anterior (dict plano): se usa pero se renueva
+            self._set_index(VehicleIndex(payload), 0.0)
+        return True
+
+    async def refresh_vehicle_map(self) -> VehicleIndex:
         vehicles = await self.fetch_vehicles_from_api()
+        index = VehicleIndex.from_vehicles(vehicles)
+        fetched_at = time.time()
+        payload = {"fetched_at": fetched_at, "vehicles": index.economic_to_vin}
+        await get_redis_client().set(REDIS_KEY, json.dumps(payload), ex=REDIS_KEY_TTL)
+        self._set_index(index, fetched_at)
+        return index
+
+    async def _revalidate(self):
+        try:
+            # Otra réplica pudo haberlo renovado ya
+            if await self._load_from_redis() and not self._is_stale():
+                return
+            await self.refresh_vehicle_map()
+        except Exception:
+            logger.exception("No se pudo renovar el mapa de vehículos; se sigue sirviendo el anterior")
 
-        vehicle_map = {
-            v["customerVehicleName"]: v["vin"]
-            for v in vehicles
-            if "customerVehicleName" in v and "vin" in v
-        }
+    def _schedule_revalidation(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._revalidate())
 
-        await redis_client.set(REDIS_KEY, json.dumps(vehicle_map), ex=CACHE_TTL)
-        return vehicle_map
+    async def get_vehicle_index(self) -> VehicleIndex:
+        if self._index is None:
+            async with self._lock:
+                if self._index is None and not await self._load_from_redis():
+                    await self.refresh_vehicle_map()
+        if self._is_stale():
+            self._schedule_revalidation()
+        return self._index
+
+    async def get_vehicle_map(self) -> dict[str, str]:
+        index = await self.get_vehicle_index()
+        return index.economic_to_vin
 
 vehicles_client = ScaniaVehiclesClient()
@@ -0,0 +1,4 @@
+from app.services.scania_vehicles.client import vehicles_client
+
+async def refresh_vehicle_map():
+    await vehicles_client.refresh_vehicle_map()
@@ -0,0 +1,38 @@
+from typing import Dict, Iterable, Optional
+
+
+def normalize_economic_number(value: str) -> str:
+    """'ECO 012', 'eco-12' y '12' → '12'."""
+    s = str(value).upper().replace("ECO", "")
+    s = "".join(ch for ch in s if ch not in " -_")
+    return s.lstrip("0") or s
+
+
+class VehicleIndex:
+    """Mapa de flota precalculado: No. Económico → VIN, indexado también
+    por número económico normalizado y por VIN."""
+
+    __slots__ = ("economic_to_vin", "vin_to_economic", "_by_normalized")
+
+    def __init__(self, economic_to_vin: Dict[str, str]):
+        self.economic_to_vin = economic_to_vin
+        self.vin_to_economic = {vin: eco for eco, vin in economic_to_vin.items()}
+        self._by_normalized = {
+            normalize_economic_number(eco): vin for eco, vin in economic_to_vin.items()
+        }
+
+    @classmethod
+    def from_vehicles(cls, vehicles: Iterable[dict]) -> "VehicleIndex":
+        return cls({
+            v["customerVehicleName"]: v["vin"]
+            for v in vehicles
+            if "customerVehicleName" in v and "vin" in v
+        })
+
+    def lookup(self, key: str) -> Optional[str]:
+        """VIN para un No. Económico (tal cual o normalizado) o un VIN."""
+        if key in self.economic_to_vin:
+            return self.economic_to_vin[key]
+        if key in self.vin_to_economic:
+            return key
+        return self._by_normalized.get(normalize_economic_number(key))
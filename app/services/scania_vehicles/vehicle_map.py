@@ -1,9 +1,10 @@
 from typing import Dict
 from app.services.scania_vehicles.client import vehicles_client
+from app.services.scania_vehicles.utils import VehicleIndex
 
 async def get_vehicle_map() -> Dict[str, str]:
     """
-    Retorna un dict con mapeo de No. Económico -> VIN desde Redis o desde la API si no existe caché.
+    Retorna un dict con mapeo de No. Económico -> VIN desde memoria/Redis o desde la API si no existe caché.
     """
     vehicle_map = await vehicles_client.get_vehicle_map()
 
@@ -11,3 +12,11 @@ async def get_vehicle_map() -> Dict[str, str]:
         raise ValueError("El mapa de vehículos no tiene el formato esperado (dict[str, str])")
 
     return vehicle_map
+
+
+async def get_vehicle_index() -> VehicleIndex:
+    """
+    Retorna el mapa de flota precalculado, con búsqueda por No. Económico
+    (tal cual o normalizado) y por VIN.
+    """
+    return await vehicles_client.get_vehicle_index()
@@ -1,61 +1,110 @@
+from typing import AsyncIterator, Optional
 from urllib.parse import urljoin, urlparse
 import httpx
-from app.services.scania_auth.auth import auth_service
+from app.core.http_client import get_http_client, SCANIA_HOST
+from app.core.rate_limiter import VEHICLESTATUSES
+from app.services.scania_auth.utils import scania_get
+from app.services.scania_vehicles_status.samples import StatusColumns
 
 BASE_URL = "https://dataaccess.scania.com/rfms4"
 
 class VehicleStatusClient:
-    def __init__(self):
+    def __init__(self, http_client: httpx.AsyncClient | None = None):
         self.base_url = BASE_URL
+        self._http_client = http_client
 
-    async def get_vehicle_status(
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self._http_client or get_http_client(SCANIA_HOST)
+
+    async def iter_vehicle_status_pages(
         self,
-        vin: str,
-        starttime: str,
-        stoptime: str,
+        vin: Optional[str],
+        starttime: Optional[str],
+        stoptime: Optional[str],
         content_filter: str = "HEADER,SNAPSHOT,ACCUMULATED",
         latest_only: bool = False,
-    ):
-        token = await auth_service.get_token()
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/json; rfms=vehiclestatuses.v4.0"
-        }
+    ) -> AsyncIterator[list[dict]]:
+        """Recorre la paginación de rFMS (moreDataAvailableLink) y entrega
+        los estatus página por página, sin acumular la ventana completa.
 
+        Con ``vin=None`` rFMS devuelve los estatus de toda la flota en el
+        mismo flujo paginado; cada estatus trae su propio ``vin``.  Con
+        ``latest_only`` la ventana se omite (rFMS no la admite junto con
+        latestOnly) y llega el último estatus de cada vehículo."""
         params = {
-            "vin": vin,
-            "starttime": starttime,
-            "stoptime": stoptime,
             "contentFilter": content_filter,
             "latestOnly": str(latest_only).lower()
         }
+        if not latest_only:
+            params["starttime"] = starttime
+            params["stoptime"] = stoptime
+        if vin is not None:
+            params["vin"] = vin
 
-        async with httpx.AsyncClient() as client:
-            all_statuses = []
-            next_url = f"{self.base_url}/vehiclestatuses"
+        next_url = f"{self.base_url}/vehiclestatuses"
 
-            while next_url:
-                is_first_call = "vehiclestatuses" in urlparse(next_url).path
-                response = await client.get(next_url, headers=headers, params=params if is_first_call else None)
-                response.raise_for_status()
-                data = response.json()
+        while next_url:
+            is_first_call = "vehiclestatuses" in urlparse(next_url).path
+            response = await scania_get(
+                self.http_client,
+                next_url,
+                accept="application/json; rfms=vehiclestatuses.v4.0",
+                endpoint=VEHICLESTATUSES,
+                params=params if is_first_call else None,
+            )
+            data = response.json()
 
-                vehicle_statuses = data.get("vehicleStatusResponse", {}).get("vehicleStatuses", [])
-                all_statuses.extend(vehicle_statuses)
+            vehicle_statuses = data.get("vehicleStatusResponse", {}).get("vehicleStatuses", [])
 
-                if data.get("moreDataAvailable") and data.get("moreDataAvailableLink"):
-                    link = data["moreDataAvailableLink"]
-                    # Asegura que el link no duplique /rfms4
-                    parsed_link = urlparse(link)
-                    if parsed_link.scheme and parsed_link.netloc:
-                        # link ya es una URL completa
-                        next_url = link
-                    else:
-                        # link es relativo, unir sin duplicar path
-                        next_url = urljoin("https://dataaccess.scania.com", link)
-                    params = None  # No incluir params otra vez
+            if data.get("moreDataAvailable") and data.get("moreDataAvailableLink"):
+                link = data["moreDataAvailableLink"]
+                # Asegura que el link no duplique /rfms4
+                parsed_link = urlparse(link)
+                if parsed_link.scheme and parsed_link.netloc:
+                    # link ya es una URL completa
+                    next_url = link
                 else:
-                    next_url = None
+                    # link es relativo, unir sin duplicar path
+                    next_url = urljoin("https://dataaccess.scania.com", link)
+                params = None  # No incluir params otra vez
+            else:
+                next_url = None
+
+            yield vehicle_statuses
+
+    async def iter_vehicle_status_columns(
+        self,
+        vin: Optional[str],
+        starttime: str,
+        stoptime: str,
+        content_filter: str = "HEADER,SNAPSHOT,ACCUMULATED",
+    ) -> AsyncIterator[StatusColumns]:
+        """Como iter_vehicle_status_pages, pero cada página se reduce a
+        columnas en cuanto se parsea y el JSON crudo se libera.  En el
+        barrido de flota (``vin=None``) se conserva el VIN de cada muestra."""
+        async for page in self.iter_vehicle_status_pages(
+            vin=vin,
+            starttime=starttime,
+            stoptime=stoptime,
+            content_filter=content_filter,
+            latest_only=False,
+        ):
+            yield StatusColumns.from_statuses(page, with_vin=vin is None)
+
+    async def get_vehicle_status(
+        self,
+        vin: str,
+        starttime: str,
+        stoptime: str,
+        content_filter: str = "HEADER,SNAPSHOT,ACCUMULATED",
+        latest_only: bool = False,
+    ):
+        all_statuses = []
+        async for page in self.iter_vehicle_status_pages(
+            vin, starttime, stoptime, content_filter=content_filter, latest_only=latest_only
+        ):
+            all_statuses.extend(page)
 
         return {
             "vehicleStatusResponse": {
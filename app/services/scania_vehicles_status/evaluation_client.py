@@ -1,27 +1,143 @@
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+
 import httpx
-from app.services.scania_auth.auth import auth_service
+from redis.exceptions import RedisError
+
+from app.core.http_client import get_http_client, SCANIA_HOST
+from app.core.rate_limiter import EVALUATION
+from app.core.redis_client import get_redis_client
+from app.core.resilience import CircuitOpenError
+from app.services.scania_auth.utils import scania_get
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "scania_evaluation"
+DATE_FORMAT = "%Y%m%d%H%M"
+# Scania consolida el reporte con retraso: una ventana se considera cerrada
+# hasta que su fin queda este margen en el pasado.
+SETTLE_MARGIN = timedelta(hours=2)
+
+
+class EvaluationUnavailableError(Exception):
+    """El reporte de esta ventana falló hace poco (entrada negativa en caché)."""
+
+
+def _normalize_date(value: str) -> str:
+    """Fecha al minuto en el formato de la API (acepta también ISO 8601)."""
+    try:
+        return datetime.strptime(value, DATE_FORMAT).strftime(DATE_FORMAT)
+    except ValueError:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(timezone.utc)
+        return dt.strftime(DATE_FORMAT)
+
+
+def _negative_ttl(error: Exception) -> int:
+    """Vida de la entrada negativa: larga para una respuesta que se
+    repetiría igual (4xx salvo 429, cuerpo vacío/inválido) y corta para los
+    fallos pasajeros (timeout, red, 5xx, 429)."""
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        definitive = 400 <= status < 500 and status != httpx.codes.TOO_MANY_REQUESTS
+    else:
+        definitive = isinstance(error, ValueError)
+    if definitive:
+        return settings.EVALUATION_CACHE_NEGATIVE_TTL_SECONDS
+    return settings.EVALUATION_CACHE_TRANSIENT_TTL_SECONDS
+
+
+def _cache_ttl(end_date: str) -> int:
+    end_dt = datetime.strptime(end_date, DATE_FORMAT).replace(tzinfo=timezone.utc)
+    if end_dt + SETTLE_MARGIN <= datetime.now(timezone.utc):
+        return settings.EVALUATION_CACHE_CLOSED_TTL_SECONDS
+    return settings.EVALUATION_CACHE_OPEN_TTL_SECONDS
+
+
 class VehicleEvaluationClient:
-    def __init__(self, base_url: str = settings.BASE_URL):
+    def __init__(self, base_url: str = settings.BASE_URL, http_client: httpx.AsyncClient | None = None):
         self.base_url = base_url
+        self._http_client = http_client
 
-    async def get_evaluation(self, vin: str, start_date: str, end_date: str) -> dict:
-        token = await auth_service.get_token()
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Accept": "application/json",
-        }
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self._http_client or get_http_client(SCANIA_HOST)
+
+    async def fetch_evaluation(self, vin: str, start_date: str, end_date: str) -> dict:
         params = {
             "vinOfInterest": vin,
             "startDate": start_date,
             "endDate": end_date,
         }
         url = f"{self.base_url}/cs/vehicle/reports/VehicleEvaluationReport/v2"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            return response.json()
+        response = await scania_get(
+            self.http_client,
+            url,
+            accept="application/json",
+            endpoint=EVALUATION,
+            params=params,
+        )
+        return response.json()
 
-evaluation_client = VehicleEvaluationClient()
+    async def _cache_get(self, key: str) -> dict | None:
+        try:
+            cached = await get_redis_client().get(key)
+        except RedisError as e:
+            logger.warning(f"Caché de evaluación no disponible: {e}")
+            return None
+        if not cached:
+            return None
+        try:
+            return json.loads(cached)
+        except json.JSONDecodeError:
+            return None
+
+    async def _cache_set(self, key: str, entry: dict, ttl: int):
+        try:
+            await get_redis_client().set(key, json.dumps(entry), ex=ttl)
+        except RedisError as e:
+            logger.warning(f"No se pudo guardar la evaluación en caché: {e}")
+
+    async def get_evaluation(self, vin: str, start_date: str, end_date: str) -> dict:
+        """Vehicle Evaluation Report con caché en Redis por VIN y ventana
+        normalizada al minuto.  Las ventanas cerradas se guardan por
+        EVALUATION_CACHE_CLOSED_TTL_SECONDS y las que tocan "ahora" por
+        EVALUATION_CACHE_OPEN_TTL_SECONDS.
+
+        La llamada tiene un plazo de EVALUATION_TIMEOUT_SECONDS.  Un fallo
+        también se guarda (entrada negativa): un rechazo definitivo (4xx
+        salvo 429, o cuerpo inválido) durante
+        EVALUATION_CACHE_NEGATIVE_TTL_SECONDS y uno pasajero (timeout, red,
+        5xx, 429) durante EVALUATION_CACHE_TRANSIENT_TTL_SECONDS, para que un
+        VIN sin datos no cueste un timeout en cada reporte.  Mientras dure, la
+        misma consulta lanza EvaluationUnavailableError sin llamar a Scania.
+        Un circuito abierto no es un fallo propio del VIN y no se guarda."""
+        start_date = _normalize_date(start_date)
+        end_date = _normalize_date(end_date)
+        key = f"{REDIS_KEY_PREFIX}:{vin}:{start_date}:{end_date}"
+
+        entry = await self._cache_get(key)
+        if entry is not None:
+            if "error" in entry:
+                raise EvaluationUnavailableError(entry["error"])
+            return entry["report"]
 
+        try:
+            report = await asyncio.wait_for(
+                self.fetch_evaluation(vin, start_date, end_date),
+                timeout=settings.EVALUATION_TIMEOUT_SECONDS,
+            )
+        except CircuitOpenError:
+            raise
+        except (httpx.HTTPError, ValueError, TimeoutError) as e:
+            await self._cache_set(key, {"error": f"{type(e).__name__}: {e}"}, _negative_ttl(e))
+            raise
+
+        await self._cache_set(key, {"report": report}, _cache_ttl(end_date))
+        return report
+
+evaluation_client = VehicleEvaluationClient()
@@ -0,0 +1,66 @@
+import logging
+from datetime import datetime, timedelta, UTC
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal, engine
+from app.services.scania_vehicles.client import vehicles_client
+from app.services.scania_vehicles_status.client import vehicle_status_client
+from app.services.scania_vehicles_status.snapshot import fleet_snapshot
+from app.services.scania_vehicles_status.storage import (
+    ensure_status_tables,
+    get_high_water_mark,
+    save_status_samples,
+    set_high_water_mark,
+)
+
+logger = logging.getLogger(__name__)
+
+SYNC_SEGMENT = timedelta(days=5)
+
+
+async def sync_vin_statuses(session, vin: str, stop_dt: datetime):
+    """Descarga sólo lo posterior a la marca de agua del VIN y la avanza
+    segmento a segmento, para no repetir trabajo si el job se interrumpe."""
+    current = await get_high_water_mark(session, vin)
+    synced_from = None
+    if current is None:
+        current = synced_from = stop_dt - timedelta(days=settings.SCANIA_STATUS_SYNC_BACKFILL_DAYS)
+
+    while current < stop_dt:
+        segment_end = min(current + SYNC_SEGMENT, stop_dt)
+        async for page in vehicle_status_client.iter_vehicle_status_pages(
+            vin=vin,
+            starttime=current.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            stoptime=segment_end.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            content_filter="HEADER,SNAPSHOT,ACCUMULATED",
+            latest_only=False,
+        ):
+            await save_status_samples(page, vin, session)
+        await set_high_water_mark(session, vin, segment_end, synced_from=synced_from)
+        await session.commit()
+        current = segment_end
+
+
+async def sync_vehicle_statuses():
+    await ensure_status_tables(engine)
+    vehicle_map = await vehicles_client.get_vehicle_map()
+    # rFMS puede entregar muestras tarde: la marca se queda atrás de "ahora"
+    # lo suficiente para que lo que quede detrás ya esté asentado
+    stop_dt = datetime.now(UTC).replace(second=0, microsecond=0) - timedelta(
+        minutes=settings.SCANIA_STATUS_SYNC_SETTLE_MINUTES
+    )
+
+    async with AsyncSessionLocal() as session:
+        for vin in sorted(set(vehicle_map.values())):
+            try:
+                await sync_vin_statuses(session, vin, stop_dt)
+            except Exception:
+                await session.rollback()
+                logger.exception("Fallo sincronizando estatus de %s", vin)
+
+
+async def poll_fleet_snapshot():
+    snapshot = await fleet_snapshot.refresh_if_leader()
+    if snapshot is None:
+        return  # otra réplica barrió este intervalo
+    logger.info("Foto de flota actualizada: %d vehículos", len(snapshot["vehicles"]))
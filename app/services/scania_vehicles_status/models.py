@@ -0,0 +1,23 @@
+from sqlalchemy import Column, String, DateTime, Float
+from sqlalchemy.ext.declarative import declarative_base
+
+Base = declarative_base()
+
+
+class VehicleStatusSample(Base):
+    __tablename__ = "vehicle_status_sample"
+
+    vin = Column(String, primary_key=True)
+    created_at = Column(DateTime(timezone=True), primary_key=True)
+    hr_total_vehicle_distance = Column(Float, nullable=True)
+    engine_total_fuel_used = Column(Float, nullable=True)
+    catalyst_fuel_level = Column(Float, nullable=True)
+
+
+class VehicleStatusSync(Base):
+    __tablename__ = "vehicle_status_sync"
+
+    vin = Column(String, primary_key=True)
+    # [synced_from, synced_until) ya está completo en vehicle_status_sample
+    synced_from = Column(DateTime(timezone=True), nullable=True)
+    synced_until = Column(DateTime(timezone=True), nullable=False)
@@ -1,29 +1,148 @@
-from fastapi import APIRouter, Query, HTTPException
-from typing import List, Optional
-from pydantic import BaseModel
+import logging
+from typing import AsyncIterator, Optional
 
-from app.services.scania_vehicles.vehicle_map import get_vehicle_map
+import orjson
+from fastapi import APIRouter, Query, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from app.services.scania_vehicles.vehicle_map import get_vehicle_index
+from app.services.scania_vehicles_status.schemas import (
+    FleetSnapshotResponse,
+    FleetSummaryResponse,
+    FleetVehicleSummary,
+    VehicleHistoryResponse,
+    VehicleSnapshot,
+)
 from app.services.scania_vehicles_status.service import (
-    get_vehicle_historical_data, VehicleHistoricalData, VehicleSummaryData
+    get_fleet_summaries,
+    get_vehicle_historical_data,
+    iter_vehicle_history,
 )
+from app.services.scania_vehicles_status.snapshot import fleet_snapshot
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _wants_ndjson(request: Request, format: Optional[str]) -> bool:
+    if format is not None:
+        return format == "ndjson"
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _line(record: dict) -> bytes:
+    return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+
+
+async def _ndjson_history(vin: str, starttime: str, stoptime: str, resolution: str) -> AsyncIterator[bytes]:
+    """Una línea por muestra (o intervalo) conforme se procesa cada página
+    y el resumen como último registro.  El código HTTP ya se envió, así
+    que un fallo a medio flujo se reporta como registro ``error``."""
+    try:
+        async for kind, item in iter_vehicle_history(vin, starttime, stoptime, resolution):
+            if kind == "samples":
+                yield b"".join(_line({"type": "sample", **rec}) for rec in item.to_records(vin))
+            elif kind == "buckets":
+                yield b"".join(_line({"type": "bucket", **b.model_dump()}) for b in item)
+            else:
+                yield _line({
+                    "type": "summary",
+                    "resolution": resolution,
+                    "summary": item.model_dump() if item is not None else None,
+                })
+    except Exception as e:
+        logger.error(f"Error en histórico NDJSON de {vin}: {e}")
+        yield _line({"type": "error", "detail": str(e)})
 
-class VehicleHistoryResponse(BaseModel):
-    historical_data: List[VehicleHistoricalData]
-    summary: Optional[VehicleSummaryData]
 
 @router.get("/", response_model=VehicleHistoryResponse)
 async def vehicle_history(
+    request: Request,
     economic_number: str = Query(..., description="Número económico del tracto"),
     starttime: str = Query(..., description="Fecha/hora inicio en ISO 8601 UTC"),
-    stoptime: str = Query(..., description="Fecha/hora fin en ISO 8601 UTC")
+    stoptime: str = Query(..., description="Fecha/hora fin en ISO 8601 UTC"),
+    resolution: str = Query(
+        "raw",
+        pattern="^(raw|15m|1h|1d)$",
+        description="raw = todas las muestras; 15m/1h/1d = agregados por intervalo (primer/último/delta)",
+    ),
+    format: Optional[str] = Query(
+        None,
+        pattern="^(json|ndjson)$",
+        description="ndjson = una línea por muestra y el resumen al final (equivale a Accept: application/x-ndjson)",
+    ),
 ):
-    economic_to_vin = await get_vehicle_map()
-    vin = economic_to_vin.get(economic_number)
+    vehicle_index = await get_vehicle_index()
+    vin = vehicle_index.lookup(economic_number)
 
     if not vin:
         raise HTTPException(status_code=404, detail=f"No se encontró el VIN para el número económico {economic_number}")
 
-    data = await get_vehicle_historical_data(vin, starttime, stoptime)
+    if _wants_ndjson(request, format):
+        return StreamingResponse(
+            _ndjson_history(vin, starttime, stoptime, resolution),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+
+    data = await get_vehicle_historical_data(vin, starttime, stoptime, resolution=resolution)
     return data
+
+
+@router.get("/fleet", response_model=FleetSummaryResponse)
+async def fleet_history(
+    starttime: str = Query(..., description="Fecha/hora inicio en ISO 8601 UTC"),
+    stoptime: str = Query(..., description="Fecha/hora fin en ISO 8601 UTC"),
+    economic_numbers: str = Query(
+        "all",
+        description="Números económicos separados por coma, o 'all' para toda la flota",
+    ),
+    include_adblue: bool = Query(True, description="Calcular litros de AdBlue consumidos"),
+):
+    vehicle_index = await get_vehicle_index()
+
+    # VIN → No. Económico de los vehículos pedidos
+    targets: dict[str, str] = {}
+    not_found: list[str] = []
+    if economic_numbers.strip().lower() == "all":
+        targets = dict(vehicle_index.vin_to_economic)
+    else:
+        for eco in filter(None, (e.strip() for e in economic_numbers.split(","))):
+            vin = vehicle_index.lookup(eco)
+            if vin:
+                targets[vin] = vehicle_index.vin_to_economic.get(vin, eco)
+            else:
+                not_found.append(eco)
+
+    if not targets:
+        raise HTTPException(status_code=404, detail="No se encontró ningún VIN para los números económicos solicitados")
+
+    summaries = await get_fleet_summaries(targets.keys(), starttime, stoptime, include_adblue=include_adblue)
+    return FleetSummaryResponse(
+        starttime=starttime,
+        stoptime=stoptime,
+        vehicles=[
+            FleetVehicleSummary(economic_number=eco, vin=vin, summary=summaries.get(vin))
+            for vin, eco in targets.items()
+        ],
+        not_found=not_found,
+    )
+
+
+@router.get("/latest", response_model=FleetSnapshotResponse)
+async def fleet_latest():
+    """Último odómetro, combustible y AdBlue de cada vehículo, tal como lo
+    dejó el último sondeo de flota (sin llamadas a Scania)."""
+    snapshot = await fleet_snapshot.get_snapshot()
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="La foto de flota aún no está disponible")
+
+    vehicle_index = await get_vehicle_index()
+    return FleetSnapshotResponse(
+        fetched_at=snapshot["fetched_at"],
+        vehicles=[
+            VehicleSnapshot(economic_number=vehicle_index.vin_to_economic.get(vin), **entry)
+            for vin, entry in snapshot["vehicles"].items()
+        ],
+    )
@@ -0,0 +1,140 @@
+# app/services/scania_vehicles_status/samples.py
+"""Representación compacta de los estatus rFMS para el histórico.
+
+Un estatus crudo de rFMS es un dict anidado de decenas de llaves; el
+histórico sólo usa cuatro campos.  ``StatusColumns`` los guarda como
+columnas NumPy (struct-of-arrays): 32 bytes por muestra, más la
+referencia al VIN cuando la página es de toda la flota."""
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class StatusColumns:
+    """Estatus como columnas: ``epoch_ns`` (int64, UTC), ``km`` y ``diesel``
+    acumulados (km y L) y nivel de ``adblue`` (% ó L según ECU).  NaN =
+    dato ausente.  ``vins`` sólo existe en páginas de toda la flota."""
+
+    __slots__ = ("epoch_ns", "km", "diesel", "adblue", "vins")
+
+    def __init__(
+        self,
+        epoch_ns: np.ndarray,
+        km: np.ndarray,
+        diesel: np.ndarray,
+        adblue: np.ndarray,
+        vins: Optional[np.ndarray] = None,
+    ):
+        self.epoch_ns = epoch_ns
+        self.km = km
+        self.diesel = diesel
+        self.adblue = adblue
+        self.vins = vins
+
+    @classmethod
+    def empty(cls) -> "StatusColumns":
+        vacio = np.empty(0, dtype=float)
+        return cls(np.empty(0, dtype=np.int64), vacio, vacio, vacio)
+
+    @classmethod
+    def from_statuses(cls, statuses: list[dict], with_vin: bool = False) -> "StatusColumns":
+        """Extrae los cuatro campos de una página de estatus; los que no
+        traen createdDateTime se descartan."""
+        rows = [st for st in statuses if st.get("createdDateTime")]
+        if not rows:
+            return cls.empty()
+        epoch_ns = pd.to_datetime(
+            [st["createdDateTime"] for st in rows], utc=True, format="ISO8601"
+        ).as_unit("ns").asi8
+        km = np.array([st.get("hrTotalVehicleDistance", 0) for st in rows], dtype=float) / 1_000.0
+        diesel = np.array([st.get("engineTotalFuelUsed") for st in rows], dtype=float) / 1_000.0
+        adblue = np.array(
+            [(st.get("snapshotData") or {}).get("catalystFuelLevel") for st in rows], dtype=float
+        )
+        vins = np.array([st.get("vin") for st in rows], dtype=object) if with_vin else None
+        return cls(epoch_ns, km, diesel, adblue, vins)
+
+    @classmethod
+    def concat(cls, parts: Iterable["StatusColumns"]) -> "StatusColumns":
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls.empty()
+        if len(parts) == 1:
+            return parts[0]
+        vins = None
+        if all(p.vins is not None for p in parts):
+            vins = np.concatenate([p.vins for p in parts])
+        return cls(
+            np.concatenate([p.epoch_ns for p in parts]),
+            np.concatenate([p.km for p in parts]),
+            np.concatenate([p.diesel for p in parts]),
+            np.concatenate([p.adblue for p in parts]),
+            vins,
+        )
+
+    def __len__(self) -> int:
+        return len(self.epoch_ns)
+
+    @property
+    def timestamps(self) -> pd.DatetimeIndex:
+        return pd.to_datetime(self.epoch_ns, utc=True, unit="ns")
+
+    def take(self, index) -> "StatusColumns":
+        """Sub-conjunto por slice, máscara o arreglo de posiciones."""
+        return StatusColumns(
+            self.epoch_ns[index],
+            self.km[index],
+            self.diesel[index],
+            self.adblue[index],
+            None if self.vins is None else self.vins[index],
+        )
+
+    def sorted(self) -> "StatusColumns":
+        """La misma página ordenada por fecha; si ya lo está (lo normal en
+        rFMS) se devuelve sin copiar."""
+        if len(self) < 2 or bool(np.all(self.epoch_ns[1:] >= self.epoch_ns[:-1])):
+            return self
+        return self.take(np.argsort(self.epoch_ns, kind="stable"))
+
+    def ordered(self) -> "StatusColumns":
+        """Muestras ordenadas por fecha y sin repetir (misma fecha y VIN); de
+        las repetidas queda la primera que llegó.  Si ya lo está (lo normal
+        en rFMS) se devuelve sin copiar."""
+        if len(self) < 2:
+            return self
+        if self.vins is None:
+            if bool(np.all(self.epoch_ns[1:] > self.epoch_ns[:-1])):
+                return self
+            orden = np.argsort(self.epoch_ns, kind="stable")
+            fechas = self.epoch_ns[orden]
+            nueva = np.concatenate(([True], fechas[1:] != fechas[:-1]))
+        else:
+            codigos = pd.factorize(self.vins)[0]
+            orden = np.lexsort((codigos, self.epoch_ns))  # estable: por fecha y luego VIN
+            fechas, codigos = self.epoch_ns[orden], codigos[orden]
+            nueva = np.concatenate(([True], (fechas[1:] != fechas[:-1]) | (codigos[1:] != codigos[:-1])))
+        return self.take(orden[nueva])
+
+    def between(self, start_ns: int, stop_ns: int) -> "StatusColumns":
+        """Muestras en ``[start_ns, stop_ns)``; requiere ``epoch_ns`` ordenado."""
+        lo, hi = np.searchsorted(self.epoch_ns, [start_ns, stop_ns], side="left")
+        return self.take(slice(lo, hi))
+
+    def within(self, start_ns: int, stop_ns: int) -> "StatusColumns":
+        """Muestras en ``[start_ns, stop_ns)`` sin exigir orden; conserva el
+        orden de llegada."""
+        dentro = (self.epoch_ns >= start_ns) & (self.epoch_ns < stop_ns)
+        return self if dentro.all() else self.take(np.flatnonzero(dentro))
+
+    def split_by_vin(self, wanted: Optional[set[str]] = None) -> Dict[str, "StatusColumns"]:
+        """Parte una página de la flota por VIN, conservando el orden de
+        llegada dentro de cada vehículo."""
+        if self.vins is None or not len(self):
+            return {}
+        grupos = pd.Series(self.vins).groupby(self.vins, sort=False).indices
+        return {
+            vin: self.take(idx)
+            for vin, idx in grupos.items()
+            if vin and (wanted is None or vin in wanted)
+        }
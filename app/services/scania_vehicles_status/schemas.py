@@ -18,6 +18,51 @@ class VehicleSummaryData(BaseModel):
     lts_adblue_consumidos: float
     odometro: float
 
+class VehicleHistoryBucket(BaseModel):
+    """Agregado de un intervalo.  Los deltas se atribuyen al intervalo de la
+    muestra posterior, así que su suma coincide con el total de la ventana."""
+    vin: str
+    bucket_start: datetime
+    bucket_end: datetime
+    muestras: int
+    km_inicio: float
+    km_fin: float
+    km_recorridos: float
+    diesel_inicio: Optional[float] = None
+    diesel_fin: Optional[float] = None
+    consumo_lts_diesel: float
+    adblue_inicio: Optional[float] = None
+    adblue_fin: Optional[float] = None
+    lts_adblue_consumidos: float
+
 class VehicleHistoryResponse(BaseModel):
     historical_data: List[VehicleHistoricalData]
     summary: Optional[VehicleSummaryData]
+    resolution: str = "raw"
+    buckets: Optional[List[VehicleHistoryBucket]] = None
+
+class FleetVehicleSummary(BaseModel):
+    economic_number: Optional[str] = None
+    vin: str
+    summary: Optional[VehicleSummaryData] = None
+
+class FleetSummaryResponse(BaseModel):
+    starttime: str
+    stoptime: str
+    vehicles: List[FleetVehicleSummary]
+    not_found: List[str] = []
+
+class VehicleSnapshot(BaseModel):
+    economic_number: Optional[str] = None
+    vin: str
+    timestamp: Optional[datetime] = None
+    odometro: Optional[float] = None
+    lts_diesel_totales: Optional[float] = None
+    nivel_diesel: Optional[float] = None
+    nivel_adblue: Optional[float] = None
+    latitud: Optional[float] = None
+    longitud: Optional[float] = None
+
+class FleetSnapshotResponse(BaseModel):
+    fetched_at: datetime
+    vehicles: List[VehicleSnapshot]
@@ -0,0 +1,218 @@
+# app/services/scania_vehicles_status/segment_cache.py
+"""Caché por VIN de los estatus rFMS ya descargados, en cubetas de un día UTC.
+
+Cada cubeta guarda los intervalos del día que ya se pidieron a rFMS y las
+muestras que llegaron en ellos (como StatusColumns), comprimidas con zlib.  Una ventana se arma
+con lo que ya está en las cubetas y sólo los sub-intervalos faltantes se
+piden a Scania.  Sólo se guardan intervalos "asentados" (ver
+SCANIA_SEGMENT_CACHE_SETTLE_MINUTES): rFMS puede recibir muestras tarde."""
+import base64
+import json
+import logging
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.core.redis_client import get_redis_client
+from app.services.scania_vehicles_status.samples import StatusColumns
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "scania_status_day"
+DAY = timedelta(days=1)
+
+
+def _ns(dt: datetime) -> int:
+    return pd.Timestamp(dt).value
+
+
+def _from_ns(value: int) -> datetime:
+    return pd.Timestamp(value, tz="UTC").to_pydatetime()
+
+
+def _day_start(dt: datetime) -> datetime:
+    dt = dt.astimezone(timezone.utc)
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _days(start_dt: datetime, stop_dt: datetime) -> list[datetime]:
+    days = []
+    day = _day_start(start_dt)
+    while day < stop_dt:
+        days.append(day)
+        day += DAY
+    return days
+
+
+def _key(vin: str, content_filter: str, day: datetime) -> str:
+    return f"{REDIS_KEY_PREFIX}:{vin}:{content_filter}:{day:%Y%m%d}"
+
+
+class DayBucket:
+    """Intervalos cubiertos (epoch en ns, semiabiertos y disjuntos) y
+    muestras ordenadas por fecha de un día UTC."""
+
+    __slots__ = ("day", "covered", "cols", "dirty")
+
+    def __init__(self, day: datetime):
+        self.day = day
+        self.covered: list[list[int]] = []
+        self.cols = StatusColumns.empty()
+        self.dirty = False
+
+    def missing(self, start: int, stop: int) -> list[tuple[int, int]]:
+        gaps = []
+        cursor = start
+        for lo, hi in self.covered:
+            if hi <= cursor:
+                continue
+            if lo >= stop:
+                break
+            if lo > cursor:
+                gaps.append((cursor, lo))
+            cursor = max(cursor, hi)
+        if cursor < stop:
+            gaps.append((cursor, stop))
+        return gaps
+
+    def add(self, start: int, stop: int, cols: StatusColumns):
+        merged = []
+        for lo, hi in sorted(self.covered + [[int(start), int(stop)]]):
+            if merged and lo <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], hi)
+            else:
+                merged.append([lo, hi])
+        self.covered = merged
+
+        # Orden por fecha y una muestra por instante
+        todo = StatusColumns.concat([self.cols, cols])
+        _, first = np.unique(todo.epoch_ns, return_index=True)
+        self.cols = todo.take(first)
+        self.cols.vins = None
+        self.dirty = True
+
+    def dumps(self) -> str:
+        cols = self.cols
+        data = cols.epoch_ns.astype("<i8").tobytes() + np.stack(
+            [cols.km, cols.diesel, cols.adblue]
+        ).astype("<f8").tobytes()
+        # El cliente Redis compartido decodifica respuestas: zlib va en base64
+        return json.dumps({
+            "covered": self.covered,
+            "n": len(cols),
+            "data": base64.b64encode(zlib.compress(data, 6)).decode(),
+        })
+
+    @classmethod
+    def loads(cls, day: datetime, value: str) -> "DayBucket":
+        bucket = cls(day)
+        payload = json.loads(value)
+        n = int(payload["n"])
+        data = zlib.decompress(base64.b64decode(payload["data"]))
+        epoch_ns = np.frombuffer(data, dtype="<i8", count=n).astype(np.int64)
+        valores = np.frombuffer(data, dtype="<f8", offset=8 * n).reshape(3, n).astype(float)
+        bucket.covered = payload["covered"]
+        bucket.cols = StatusColumns(epoch_ns, valores[0], valores[1], valores[2])
+        return bucket
+
+
+class CachedWindow:
+    """Cubetas de una ventana ``[start_dt, stop_dt)`` de un VIN."""
+
+    def __init__(self, vin: str, content_filter: str, buckets: Dict[datetime, DayBucket]):
+        self.vin = vin
+        self.content_filter = content_filter
+        self.buckets = buckets
+
+    def plan(self, start_dt: datetime, stop_dt: datetime) -> list[tuple[datetime, datetime, bool]]:
+        """Tramos ``(inicio, fin, en_caché)`` en orden cronológico; los tramos
+        contiguos del mismo tipo se unen, así un hueco que cruza la
+        medianoche se pide a rFMS en una sola consulta."""
+        start, stop = _ns(start_dt), _ns(stop_dt)
+        pieces: list[list] = []
+
+        def _push(lo: int, hi: int, cached: bool):
+            if hi <= lo:
+                return
+            if pieces and pieces[-1][2] == cached and pieces[-1][1] == lo:
+                pieces[-1][1] = hi
+            else:
+                pieces.append([lo, hi, cached])
+
+        for day, bucket in sorted(self.buckets.items()):
+            lo = max(start, _ns(day))
+            hi = min(stop, _ns(day + DAY))
+            cursor = lo
+            for gap_lo, gap_hi in bucket.missing(lo, hi):
+                _push(cursor, gap_lo, True)
+                _push(gap_lo, gap_hi, False)
+                cursor = gap_hi
+            _push(cursor, hi, True)
+
+        return [(_from_ns(lo), _from_ns(hi), cached) for lo, hi, cached in pieces]
+
+    def read(self, start_dt: datetime, stop_dt: datetime) -> list[StatusColumns]:
+        """Muestras en caché del tramo, una página por día."""
+        start, stop = _ns(start_dt), _ns(stop_dt)
+        pages = []
+        for day in _days(start_dt, stop_dt):
+            page = self.buckets[day].cols.between(start, stop)
+            if len(page):
+                pages.append(page)
+        return pages
+
+    def store(self, start_dt: datetime, stop_dt: datetime, pages: list[StatusColumns]):
+        """Registra el tramo ``[start_dt, stop_dt)`` como descargado.  Las
+        muestras cuya fecha cae fuera del tramo no se guardan."""
+        cols = StatusColumns.concat(pages)
+        cols = cols.take(np.argsort(cols.epoch_ns, kind="stable"))
+        for day in _days(start_dt, stop_dt):
+            lo = max(_ns(start_dt), _ns(day))
+            hi = min(_ns(stop_dt), _ns(day + DAY))
+            self.buckets[day].add(lo, hi, cols.between(lo, hi))
+
+    async def save(self):
+        dirty = [bucket for bucket in self.buckets.values() if bucket.dirty]
+        if not dirty:
+            return
+        ttl = int(settings.SCANIA_SEGMENT_CACHE_TTL_DAYS * 86400)
+        try:
+            pipe = get_redis_client().pipeline(transaction=False)
+            for bucket in dirty:
+                pipe.set(_key(self.vin, self.content_filter, bucket.day), bucket.dumps(), ex=ttl)
+            await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"No se pudo guardar la caché de estatus de {self.vin}: {e}")
+            return
+        for bucket in dirty:
+            bucket.dirty = False
+
+
+async def load_window(
+    vin: str,
+    content_filter: str,
+    start_dt: datetime,
+    stop_dt: datetime,
+) -> CachedWindow:
+    """Cubetas de la ventana; si Redis no responde se devuelven vacías
+    (todo se pedirá a rFMS)."""
+    days = _days(start_dt, stop_dt)
+    buckets = {day: DayBucket(day) for day in days}
+    try:
+        values = await get_redis_client().mget([_key(vin, content_filter, day) for day in days])
+    except RedisError as e:
+        logger.warning(f"Caché de estatus no disponible para {vin}: {e}")
+        values = [None] * len(days)
+    for day, value in zip(days, values):
+        if not value:
+            continue
+        try:
+            buckets[day] = DayBucket.loads(day, value)
+        except (ValueError, KeyError, TypeError, zlib.error):
+            pass  # cubeta corrupta o de otro formato: se vuelve a descargar
+    return CachedWindow(vin, content_filter, buckets)
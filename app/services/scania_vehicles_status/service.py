@@ -1,116 +1,479 @@
 # app/services/scania_vehicles_status/service.py
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+import asyncio
+import logging
+from collections import deque
+from contextlib import aclosing
+from typing import Dict, Any, AsyncIterator, Iterable, NamedTuple, Optional
+from datetime import datetime, timedelta, timezone
 
+import numpy as np
+import pandas as pd
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal
 from app.services.scania_vehicles_status.client import vehicle_status_client
+from app.services.scania_vehicles_status import segment_cache
 from app.services.scania_vehicles_status.evaluation_client import evaluation_client
+from app.services.scania_vehicles_status.samples import StatusColumns
+from app.services.scania_vehicles_status.storage import (
+    get_sync_range,
+    iter_status_samples,
+)
 from app.services.scania_vehicles_status.schemas import (
     VehicleHistoricalData,
+    VehicleHistoryBucket,
     VehicleSummaryData,
 )
 
 # ----------------------------------------------------------------------
 TANK_CAPACITY_LTS = 105.0        # capacidad fija del depósito AdBlue
+SEGMENT_DAYS = 5                 # tamaño de cada consulta a rFMS
+
+# Distancia, combustible y fecha vienen en HEADER; el nivel de AdBlue en
+# SNAPSHOT.  ACCUMULATED (histogramas) es lo más pesado y el resumen no lo usa.
+FULL_CONTENT_FILTER = "HEADER,SNAPSHOT,ACCUMULATED"
+ADBLUE_CONTENT_FILTER = "HEADER,SNAPSHOT"
+HEADER_CONTENT_FILTER = "HEADER"
+
+# resolution de /api/vehicle_history → frecuencia de pandas
+RESOLUTIONS = {"15m": "15min", "1h": "1h", "1d": "1D"}
 # ----------------------------------------------------------------------
 
+logger = logging.getLogger(__name__)
 
-async def get_vehicle_historical_data(
-    vin: str,
-    starttime: str,
-    stoptime: str,
-) -> Dict[str, Any]:
-    """Histórico + resumen.  Calcula litros de AdBlue consumidos
-    asumiendo un tanque de 105 L y tomando únicamente las caídas
-    de nivel (las subidas ≃ recarga y no computan)."""
-    # ── 1. Obtiene el histórico en segmentos de 5 días ────────────────
-    start_dt = datetime.fromisoformat(starttime.replace("Z", "+00:00"))
-    stop_dt = datetime.fromisoformat(stoptime.replace("Z", "+00:00"))
-
-    statuses: List[dict] = []
+
+def _parse_iso(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _segments(start_dt: datetime, stop_dt: datetime) -> list[tuple[datetime, datetime]]:
+    segments = []
     current = start_dt
     while current < stop_dt:
-        segment_end = min(current + timedelta(days=5), stop_dt)
-        resp = await vehicle_status_client.get_vehicle_status(
-            vin=vin,
-            starttime=current.strftime("%Y-%m-%dT%H:%M:%SZ"),
-            stoptime=segment_end.strftime("%Y-%m-%dT%H:%M:%SZ"),
-            content_filter="HEADER,SNAPSHOT,ACCUMULATED",
-            latest_only=False,
-        )
-        seg_statuses = resp.get("vehicleStatusResponse", {}).get("vehicleStatuses", [])
-        statuses.extend(seg_statuses)
+        segment_end = min(current + timedelta(days=SEGMENT_DAYS), stop_dt)
+        segments.append((current, segment_end))
         current = segment_end
+    return segments
 
-    # ── 2. Recorre y arma lista ordenada ─────────────────────────────
-    historico: list[VehicleHistoricalData] = []
-    serie_adblue: list[tuple[datetime, float | None]] = []
 
-    for st in statuses:
-        ts_raw = st.get("createdDateTime")
-        if not ts_raw:
-            continue
-        ts = datetime.fromisoformat(ts_raw.replace("Z", "+00:00"))
+def _iter_segment_pages(
+    vin: Optional[str],
+    seg_start: datetime,
+    seg_end: datetime,
+    content_filter: str,
+) -> AsyncIterator[StatusColumns]:
+    return vehicle_status_client.iter_vehicle_status_columns(
+        vin=vin,
+        starttime=seg_start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        stoptime=seg_end.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        content_filter=content_filter,
+    )
 
-        km = st.get("hrTotalVehicleDistance", 0) / 1_000.0
 
-        diesel = (
-            st["engineTotalFuelUsed"] / 1_000.0
-            if st.get("engineTotalFuelUsed") is not None
-            else None
-        )
+async def _fetch_segment(
+    vin: Optional[str],
+    seg_start: datetime,
+    seg_end: datetime,
+    sem: asyncio.Semaphore,
+    content_filter: str,
+) -> StatusColumns:
+    """Un segmento completo como una sola página ordenada, sin muestras
+    repetidas y recortada a ``[seg_start, seg_end)``: las páginas de rFMS
+    pueden encimarse en sus bordes o llegar desordenadas, y así los
+    segmentos consecutivos quedan disjuntos y en orden."""
+    async with sem:
+        pages = [page async for page in _iter_segment_pages(vin, seg_start, seg_end, content_filter)]
+    segment = StatusColumns.concat(pages)
+    return segment.within(pd.Timestamp(seg_start).value, pd.Timestamp(seg_end).value).ordered()
 
-        adblue_raw = None
-        snap = st.get("snapshotData")
-        if snap and "catalystFuelLevel" in snap:
-            adblue_raw = snap["catalystFuelLevel"]  # % ó L según ECU
 
-        serie_adblue.append((ts, adblue_raw))
+async def _iter_window_statuses(
+    vin: Optional[str],
+    start_dt: datetime,
+    stop_dt: datetime,
+    sem: asyncio.Semaphore,
+    content_filter: str = FULL_CONTENT_FILTER,
+) -> AsyncIterator[StatusColumns]:
+    """Recorre la ventana en segmentos de 5 días y entrega una página por
+    segmento.  Entre todas forman una serie en orden cronológico estricto y
+    sin repetidas (ver _fetch_segment), que es lo que suponen las caídas de
+    AdBlue y los deltas por intervalo.
 
-        historico.append(
-            VehicleHistoricalData(
-                vin=vin,
-                timestamp=ts,
-                km_recorridos=km,
-                consumo_lts_diesel=diesel,
-                lts_adblue_consumidos=adblue_raw
-            )
+    Los segmentos se descargan en paralelo (acotado por ``sem``) con una
+    ventana deslizante de SCANIA_SEGMENT_CONCURRENCY segmentos por delante
+    del consumidor, de modo que nunca se retienen más de esos segmentos."""
+    segments = _segments(start_dt, stop_dt)
+    ahead = max(1, settings.SCANIA_SEGMENT_CONCURRENCY)
+    remaining = iter(segments)
+    pending: deque[asyncio.Task] = deque()
+
+    def _schedule_next() -> None:
+        segment = next(remaining, None)
+        if segment is not None:
+            pending.append(asyncio.create_task(_fetch_segment(vin, *segment, sem, content_filter)))
+
+    try:
+        for _ in range(ahead):
+            _schedule_next()
+        while pending:
+            page = await pending.popleft()
+            _schedule_next()
+            if len(page):
+                yield page
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _iter_cached_window_statuses(
+    vin: str,
+    start_dt: datetime,
+    stop_dt: datetime,
+    sem: asyncio.Semaphore,
+    content_filter: str = FULL_CONTENT_FILTER,
+) -> AsyncIterator[StatusColumns]:
+    """Como _iter_window_statuses, pero la parte asentada de la ventana se
+    arma con la caché por día (segment_cache) y sólo los huecos se piden a
+    rFMS.  Lo que queda a menos de SCANIA_SEGMENT_CACHE_SETTLE_MINUTES de
+    ahora siempre se pide a rFMS y no se guarda."""
+    settled = datetime.now(timezone.utc) - timedelta(minutes=settings.SCANIA_SEGMENT_CACHE_SETTLE_MINUTES)
+    cache_stop = min(stop_dt, settled)
+    if not settings.SCANIA_SEGMENT_CACHE_ENABLED or cache_stop <= start_dt:
+        async with aclosing(_iter_window_statuses(vin, start_dt, stop_dt, sem, content_filter)) as pages:
+            async for page in pages:
+                yield page
+        return
+
+    window = await segment_cache.load_window(vin, content_filter, start_dt, cache_stop)
+    try:
+        for piece_start, piece_stop, cached in window.plan(start_dt, cache_stop):
+            if cached:
+                for page in window.read(piece_start, piece_stop):
+                    yield page
+                continue
+            # rFMS puede devolver muestras fuera del tramo pedido: se recortan
+            # para que lo entregado coincida con lo que se guarda en caché
+            lo, hi = pd.Timestamp(piece_start).value, pd.Timestamp(piece_stop).value
+            fetched: list[StatusColumns] = []
+            async with aclosing(
+                _iter_window_statuses(vin, piece_start, piece_stop, sem, content_filter)
+            ) as pages:
+                async for page in pages:
+                    page = page.within(lo, hi)
+                    if not len(page):
+                        continue
+                    fetched.append(page)
+                    yield page
+            window.store(piece_start, piece_stop, fetched)
+    finally:
+        # Lo ya descargado se guarda aunque el consumidor corte antes
+        await window.save()
+
+    if cache_stop < stop_dt:
+        async with aclosing(_iter_window_statuses(vin, cache_stop, stop_dt, sem, content_filter)) as pages:
+            async for page in pages:
+                yield page
+
+
+async def _store_coverage(vin: str, start_dt: datetime, stop_dt: datetime) -> Optional[tuple[datetime, datetime]]:
+    """Tramo de la ventana que el almacén local tiene completo:
+    ``[max(start, synced_from), min(stop, synced_until))``, o None si no
+    cubre nada o no está disponible."""
+    if not settings.SCANIA_STATUS_STORE_ENABLED:
+        return None
+    try:
+        async with AsyncSessionLocal() as session:
+            synced = await get_sync_range(session, vin)
+    except Exception:
+        logger.warning("Almacén de estatus no disponible; se consulta rFMS para %s", vin)
+        return None
+    if synced is None:
+        return None
+    lo, hi = max(start_dt, synced[0]), min(stop_dt, synced[1])
+    return (lo, hi) if lo < hi else None
+
+
+async def _iter_history_pages(
+    vin: str,
+    start_dt: datetime,
+    stop_dt: datetime,
+    sem: asyncio.Semaphore,
+    content_filter: str = FULL_CONTENT_FILTER,
+) -> AsyncIterator[StatusColumns]:
+    """Las muestras ya sincronizadas salen de vehicle_status_sample; lo
+    anterior al primer backfill y lo posterior a la marca de agua se pide
+    a rFMS, en orden cronológico."""
+    coverage = await _store_coverage(vin, start_dt, stop_dt)
+    if coverage is None:
+        async with aclosing(
+            _iter_cached_window_statuses(vin, start_dt, stop_dt, sem, content_filter)
+        ) as pages:
+            async for page in pages:
+                yield page
+        return
+
+    store_start, store_stop = coverage
+    if start_dt < store_start:
+        async with aclosing(
+            _iter_cached_window_statuses(vin, start_dt, store_start, sem, content_filter)
+        ) as pages:
+            async for page in pages:
+                yield page
+
+    async with AsyncSessionLocal() as session, aclosing(
+        iter_status_samples(session, vin, store_start, store_stop)
+    ) as pages:
+        async for page in pages:
+            yield page
+
+    if store_stop < stop_dt:
+        async with aclosing(
+            _iter_cached_window_statuses(vin, store_stop, stop_dt, sem, content_filter)
+        ) as pages:
+            async for page in pages:
+                yield page
+
+
+class _Sample(NamedTuple):
+    timestamp: datetime
+    km: float
+    diesel: float | None
+    adblue: float | None
+
+
+def _none_if_nan(value: float) -> float | None:
+    return None if np.isnan(value) else float(value)
+
+
+class _PageColumns:
+    """Una página de StatusColumns lista para el histórico: fechas como
+    DatetimeIndex y caídas de AdBlue por muestra (NaN = dato ausente)."""
+
+    __slots__ = ("timestamps", "km", "diesel", "adblue", "adblue_drops")
+
+    def __init__(self, page: StatusColumns):
+        self.timestamps = page.timestamps
+        self.km = page.km
+        self.diesel = page.diesel
+        self.adblue = page.adblue  # % ó L según ECU
+        self.adblue_drops: Optional[np.ndarray] = None  # lo llena el acumulador
+
+    def __len__(self) -> int:
+        return len(self.km)
+
+    def sample(self, i: int) -> _Sample:
+        return _Sample(
+            timestamp=self.timestamps[i].to_pydatetime(),
+            km=float(self.km[i]),
+            diesel=_none_if_nan(self.diesel[i]),
+            adblue=_none_if_nan(self.adblue[i]),
         )
 
-    # ── 3. Calcula litros consumidos ─────────────────────────────────
-    serie_adblue.sort(key=lambda x: x[0])  # ordena por fecha
+    def to_records(self, vin: str) -> list[Dict[str, Any]]:
+        """Diccionarios planos con los campos de VehicleHistoricalData, sin
+        pasar por Pydantic (los usa el modo NDJSON)."""
+        return [
+            {
+                "vin": vin,
+                "timestamp": ts,
+                "km_recorridos": km,
+                "consumo_lts_diesel": None if np.isnan(diesel) else diesel,
+                "lts_adblue_consumidos": None if np.isnan(adblue) else adblue,
+            }
+            for ts, km, diesel, adblue in zip(
+                self.timestamps.to_pydatetime(),
+                self.km.tolist(),
+                self.diesel.tolist(),
+                self.adblue.tolist(),
+            )
+        ]
+
+    def to_models(self, vin: str) -> list[VehicleHistoricalData]:
+        """Modelos Pydantic, sólo en la frontera de la respuesta."""
+        return [VehicleHistoricalData(**rec) for rec in self.to_records(vin)]
 
-    adblue_consumido = 0.0
-    previo: float | None = None
 
-    for _, nivel in serie_adblue:
-        if nivel is None:
-            previo = None
-            continue
+def _adblue_drops_lts(niveles: np.ndarray, previo: float) -> tuple[np.ndarray, float]:
+    """Caída de AdBlue en litros de cada muestra (0 si no bajó) y último
+    nivel (NaN si ausente).
+
+    ``previo`` es el último nivel de la página anterior.  Un nivel ausente
+    corta la serie: la caída siguiente no se compara contra nada."""
+    # Si la ECU da porcentaje (<=100) lo convertimos a litros
+    lts = np.where(niveles <= 100, niveles * TANK_CAPACITY_LTS / 100, niveles)
+    serie = np.concatenate(([previo], lts))
+    caidas = serie[:-1] - serie[1:]          # previo - actual
+    # sólo caídas; las subidas ≃ recarga y los huecos (NaN) no suman
+    caidas = np.nan_to_num(np.clip(caidas, 0, None), nan=0.0)
+    return caidas, float(serie[-1])
+
+
+class _HistoryAccumulator:
+    """Procesa los estatus página por página: conserva sólo la primera y
+    la última muestra y va sumando las caídas de nivel de AdBlue."""
+
+    def __init__(self, vin: str):
+        self.vin = vin
+        self.count = 0
+        self.first: Optional[_Sample] = None
+        self.last: Optional[_Sample] = None
+        self._adblue_consumido = 0.0
+        self._previo = np.nan
+
+    def add_page(self, page: StatusColumns) -> Optional[_PageColumns]:
+        # Una caída de AdBlue sólo tiene sentido entre muestras consecutivas
+        cols = _PageColumns(page.sorted())
+        n = len(cols)
+        if not n:
+            return None
+        if self.first is None:
+            self.first = cols.sample(0)
+        self.last = cols.sample(n - 1)
+        self.count += n
+
+        cols.adblue_drops, self._previo = _adblue_drops_lts(cols.adblue, self._previo)
+        self._adblue_consumido += float(cols.adblue_drops.sum())
+        return cols
+
+    @classmethod
+    def from_range(
+        cls,
+        vin: str,
+        cols: _PageColumns,
+        lo: int,
+        hi: int,
+        caidas_acumuladas: np.ndarray,
+    ) -> "_HistoryAccumulator":
+        """Acumulador de las muestras ``[lo, hi)`` de una serie ordenada.
+        ``caidas_acumuladas`` es la suma acumulada de las caídas de AdBlue de
+        toda la serie; la caída de la primera muestra (contra una muestra
+        fuera del rango) no cuenta, igual que al recorrer sólo el rango."""
+        acc = cls(vin)
+        if hi <= lo:
+            return acc
+        acc.first = cols.sample(lo)
+        acc.last = cols.sample(hi - 1)
+        acc.count = hi - lo
+        acc._adblue_consumido = float(caidas_acumuladas[hi - 1] - caidas_acumuladas[lo])
+        return acc
+
+    @property
+    def adblue_consumido(self) -> float:
+        return round(self._adblue_consumido, 2)
+
+
+class _BucketAggregator:
+    """Agrega las páginas por intervalos de ``freq`` sin retener muestras:
+    sólo el intervalo abierto (que puede seguir en la página siguiente)."""
+
+    def __init__(self, vin: str, freq: str):
+        self.vin = vin
+        self.freq = pd.tseries.frequencies.to_offset(freq)
+        self._pending: Optional[dict] = None
+        self._prev_km = np.nan
+        self._prev_diesel = np.nan
 
-        # Si la ECU da porcentaje (<=100) lo convertimos a litros
-        nivel_lts = (
-            nivel * TANK_CAPACITY_LTS / 100
-            if nivel <= 100
-            else nivel
+    @staticmethod
+    def _deltas(valores: np.ndarray, previo: float) -> tuple[np.ndarray, float]:
+        """Diferencias de un contador acumulado contra la última lectura
+        válida (aunque haya huecos NaN o venga de la página anterior), y esa
+        última lectura válida para la página siguiente."""
+        llenos = pd.Series(np.concatenate(([previo], valores))).ffill().to_numpy()
+        return np.diff(llenos), llenos[-1]
+
+    def add_page(self, cols: _PageColumns) -> list[VehicleHistoryBucket]:
+        km_delta, self._prev_km = self._deltas(cols.km, self._prev_km)
+        diesel_delta, self._prev_diesel = self._deltas(cols.diesel, self._prev_diesel)
+        df = pd.DataFrame({
+            "bucket": cols.timestamps.floor(self.freq),
+            "km": cols.km,
+            "diesel": cols.diesel,
+            "adblue": cols.adblue,
+            "km_delta": km_delta,
+            "diesel_delta": diesel_delta,
+            "adblue_drops": cols.adblue_drops,
+        })
+
+        # first/last omiten NaN y sum los trata como 0
+        agg = df.groupby("bucket", sort=False).agg(
+            muestras=("km", "size"),
+            km_inicio=("km", "first"),
+            km_fin=("km", "last"),
+            km_recorridos=("km_delta", "sum"),
+            diesel_inicio=("diesel", "first"),
+            diesel_fin=("diesel", "last"),
+            consumo_lts_diesel=("diesel_delta", "sum"),
+            adblue_inicio=("adblue", "first"),
+            adblue_fin=("adblue", "last"),
+            lts_adblue_consumidos=("adblue_drops", "sum"),
         )
 
-        if previo is not None and nivel_lts < previo:   # sólo caídas
-            adblue_consumido += previo - nivel_lts
+        out: list[VehicleHistoryBucket] = []
+        for bucket, row in zip(agg.index, agg.to_dict("records")):
+            row["bucket_start"] = bucket
+            if self._pending is not None and self._pending["bucket_start"] == bucket:
+                row = self._merge(self._pending, row)
+            elif self._pending is not None:
+                out.append(self._to_model(self._pending))
+            self._pending = row
+        return out
+
+    @staticmethod
+    def _merge(prev: dict, new: dict) -> dict:
+        merged = dict(new)
+        for campo in ("muestras", "km_recorridos", "consumo_lts_diesel", "lts_adblue_consumidos"):
+            merged[campo] = prev[campo] + new[campo]
+        for campo in ("km_inicio", "diesel_inicio", "adblue_inicio"):
+            if not pd.isna(prev[campo]):
+                merged[campo] = prev[campo]
+        for campo in ("km_fin", "diesel_fin", "adblue_fin"):
+            if pd.isna(new[campo]):
+                merged[campo] = prev[campo]
+        return merged
+
+    def _to_model(self, row: dict) -> VehicleHistoryBucket:
+        start = row["bucket_start"]
+        return VehicleHistoryBucket(
+            vin=self.vin,
+            bucket_start=start.to_pydatetime(),
+            bucket_end=(start + self.freq).to_pydatetime(),
+            muestras=int(row["muestras"]),
+            km_inicio=row["km_inicio"],
+            km_fin=row["km_fin"],
+            km_recorridos=row["km_recorridos"],
+            diesel_inicio=None if pd.isna(row["diesel_inicio"]) else row["diesel_inicio"],
+            diesel_fin=None if pd.isna(row["diesel_fin"]) else row["diesel_fin"],
+            consumo_lts_diesel=row["consumo_lts_diesel"],
+            adblue_inicio=None if pd.isna(row["adblue_inicio"]) else row["adblue_inicio"],
+            adblue_fin=None if pd.isna(row["adblue_fin"]) else row["adblue_fin"],
+            lts_adblue_consumidos=round(row["lts_adblue_consumidos"], 2),
+        )
 
-        # Si sube ⇒ ­recarga, no suma
-        previo = nivel_lts
+    def finish(self) -> list[VehicleHistoryBucket]:
+        if self._pending is None:
+            return []
+        last, self._pending = self._pending, None
+        return [self._to_model(last)]
 
-    adblue_consumido = round(adblue_consumido, 2)
 
-    # ── 4. Datos de Vehicle Evaluation ───────────────────────────────
+async def _fetch_evaluation(
+    vin: str,
+    start_dt: datetime,
+    stop_dt: datetime,
+    sem: asyncio.Semaphore,
+) -> tuple[float | None, float | None]:
+    """Distancia y combustible del Vehicle Evaluation Report (o None).  Cada
+    reporte tiene su propio plazo (ver get_evaluation): uno lento sólo deja
+    su ventana sin datos de evaluación."""
     eval_distance: float | None = None
     eval_fuel: float | None = None
     try:
-        evaluation = await evaluation_client.get_evaluation(
-            vin=vin,
-            start_date=start_dt.strftime("%Y%m%d%H%M"),
-            end_date=stop_dt.strftime("%Y%m%d%H%M"),
-        )
+        async with sem:
+            evaluation = await evaluation_client.get_evaluation(
+                vin=vin,
+                start_date=start_dt.strftime("%Y%m%d%H%M"),
+                end_date=stop_dt.strftime("%Y%m%d%H%M"),
+            )
         vehicles = evaluation.get("VehicleList") or evaluation.get("EvaluationVehicles")
         if vehicles:
             ev = vehicles[0]
@@ -120,46 +483,268 @@ async def get_vehicle_historical_data(
                 eval_fuel = float(ev["TotalFuelConsumption"])
     except Exception:
         pass
+    return eval_distance, eval_fuel
 
-    # ── 4. Resumen ───────────────────────────────────────────────────
-    # ── 4. Resumen ───────────────────────────────────────────────────
-    resumen: Optional[VehicleSummaryData] = None
-    if len(historico) >= 2:
-        inicio, fin = historico[0], historico[-1]
-        km_value = eval_distance if eval_distance is not None else fin.km_recorridos - inicio.km_recorridos
+
+def _build_summary(
+    acc: _HistoryAccumulator,
+    eval_distance: float | None,
+    eval_fuel: float | None,
+    starttime: str,
+    stoptime: str,
+) -> Optional[VehicleSummaryData]:
+    if acc.count >= 2:
+        inicio, fin = acc.first, acc.last
+        km_value = eval_distance if eval_distance is not None else fin.km - inicio.km
         diesel_value = eval_fuel if eval_fuel is not None else (
-                (fin.consumo_lts_diesel or 0) - (inicio.consumo_lts_diesel or 0)
+                (fin.diesel or 0) - (inicio.diesel or 0)
         )
-        resumen = VehicleSummaryData(
-            vin=vin,
+        return VehicleSummaryData(
+            vin=acc.vin,
             start_timestamp=inicio.timestamp,
             end_timestamp=fin.timestamp,
             km_recorridos=km_value,
             consumo_lts_diesel=diesel_value,
-            lts_adblue_consumidos=adblue_consumido,
-            odometro=fin.km_recorridos,
+            lts_adblue_consumidos=acc.adblue_consumido,
+            odometro=fin.km,
         )
-    # ------- NUEVO: Si no hay históricos, pero sí evaluación -------
-    elif eval_distance is not None or eval_fuel is not None:
+    # ------- Si no hay históricos, pero sí evaluación -------
+    if eval_distance is not None or eval_fuel is not None:
         # Usa los datos de los parámetros originales como timestamp
         try:
-            start_dt = datetime.fromisoformat(starttime.replace("Z", "+00:00"))
-            end_dt = datetime.fromisoformat(stoptime.replace("Z", "+00:00"))
+            start_dt = _parse_iso(starttime)
+            end_dt = _parse_iso(stoptime)
         except Exception:
             start_dt = None
             end_dt = None
-        resumen = VehicleSummaryData(
-            vin=vin,
+        return VehicleSummaryData(
+            vin=acc.vin,
             start_timestamp=start_dt,
             end_timestamp=end_dt,
             km_recorridos=eval_distance if eval_distance is not None else 0,
             consumo_lts_diesel=eval_fuel if eval_fuel is not None else 0,
-            lts_adblue_consumidos=adblue_consumido,  # normalmente será 0
+            lts_adblue_consumidos=acc.adblue_consumido,  # normalmente será 0
             odometro=eval_distance if eval_distance is not None else 0,
         )
+    return None
+
+
+async def iter_vehicle_history(
+    vin: str,
+    starttime: str,
+    stoptime: str,
+    resolution: str = "raw",
+) -> AsyncIterator[tuple[str, Any]]:
+    """Histórico + resumen como flujo de eventos ``(tipo, dato)``:
+
+    * ``("samples", _PageColumns)`` por cada página de estatus (resolution raw)
+    * ``("buckets", list[VehicleHistoryBucket])`` conforme se cierran intervalos
+    * ``("summary", VehicleSummaryData | None)`` siempre como último evento
+
+    Calcula litros de AdBlue consumidos asumiendo un tanque de 105 L y
+    tomando únicamente las caídas de nivel (las subidas ≃ recarga y no
+    computan).
+
+    Los estatus se consumen segmento por segmento: nunca se retiene la
+    respuesta cruda completa de la ventana.  Cada segmento llega ordenado
+    por createdDateTime y sin repetidas, aunque rFMS encime o desordene sus
+    páginas, así que las caídas de AdBlue salen igual que sobre la serie
+    completa ordenada.
+
+    Los segmentos y el Vehicle Evaluation Report se piden en paralelo,
+    con un máximo de SCANIA_SEGMENT_CONCURRENCY llamadas simultáneas.
+    La parte de la ventana ya sincronizada se lee del almacén local."""
+    start_dt = _parse_iso(starttime)
+    stop_dt = _parse_iso(stoptime)
+    sem = asyncio.Semaphore(max(1, settings.SCANIA_SEGMENT_CONCURRENCY))
+
+    # ── 1. Evaluation en segundo plano mientras llega el histórico ──
+    eval_task = asyncio.create_task(_fetch_evaluation(vin, start_dt, stop_dt, sem))
+
+    try:
+        # ── 2. Histórico en segmentos de 5 días, procesado por página ──
+        acc = _HistoryAccumulator(vin)
+        aggregator = None
+        if resolution != "raw":
+            aggregator = _BucketAggregator(vin, RESOLUTIONS[resolution])
+        async with aclosing(_iter_history_pages(vin, start_dt, stop_dt, sem)) as pages:
+            async for page in pages:
+                cols = acc.add_page(page)
+                if cols is None:
+                    continue
+                if aggregator is None:
+                    yield "samples", cols
+                    continue
+                closed = aggregator.add_page(cols)
+                if closed:
+                    yield "buckets", closed
+        if aggregator is not None:
+            closed = aggregator.finish()
+            if closed:
+                yield "buckets", closed
+
+        eval_distance, eval_fuel = await eval_task
+
+        # ── 3. Resumen ─────────────────────────────────────────────────
+        yield "summary", _build_summary(acc, eval_distance, eval_fuel, starttime, stoptime)
+    finally:
+        # Cliente desconectado o error a medio flujo: no dejar el
+        # Evaluation Report corriendo huérfano.
+        eval_task.cancel()
+
+
+async def get_vehicle_historical_data(
+    vin: str,
+    starttime: str,
+    stoptime: str,
+    resolution: str = "raw",
+) -> Dict[str, Any]:
+    """Histórico + resumen en una sola respuesta (ver iter_vehicle_history).
+
+    Con ``resolution`` distinta de "raw" (15m, 1h, 1d) no se devuelven las
+    muestras sino agregados por intervalo en ``buckets``."""
+    historico: list[VehicleHistoricalData] = []
+    buckets: list[VehicleHistoryBucket] | None = [] if resolution != "raw" else None
+    resumen: Optional[VehicleSummaryData] = None
+    async with aclosing(iter_vehicle_history(vin, starttime, stoptime, resolution)) as events:
+        async for kind, item in events:
+            if kind == "samples":
+                historico.extend(item.to_models(vin))
+            elif kind == "buckets":
+                buckets.extend(item)
+            else:
+                resumen = item
 
     return {
         "historical_data": historico,
         "summary": resumen,
+        "resolution": resolution,
+        "buckets": buckets,
     }
 
+
+async def _collect_range(
+    vin: str,
+    start_dt: datetime,
+    stop_dt: datetime,
+    sem: asyncio.Semaphore,
+    content_filter: str,
+) -> list[StatusColumns]:
+    async with aclosing(_iter_history_pages(vin, start_dt, stop_dt, sem, content_filter)) as pages:
+        return [page async for page in pages]
+
+
+async def get_vehicle_window_summaries(
+    vin: str,
+    windows: list[tuple[str, str]],
+    include_adblue: bool = True,
+    download_timeout: Optional[float] = None,
+) -> list[Optional[VehicleSummaryData]]:
+    """Resumen de varias ventanas de un mismo VIN (p. ej. los viajes de un
+    mes) con una sola descarga contigua que las cubre todas.
+
+    La serie se ordena una vez y cada ventana se resuelve con búsqueda
+    binaria sobre las fechas y sumas acumuladas de las caídas de AdBlue,
+    con el mismo resultado que recorrer cada ventana por separado.
+
+    El Vehicle Evaluation Report sigue siendo uno por ventana: da distancia
+    y combustible de todo el rango pedido y no se puede partir por viaje.
+    Las ventanas cerradas quedan en caché (y los fallos, en caché negativa;
+    ver evaluation_client), así que repetir un mes no vuelve a pedirlos.
+
+    ``download_timeout`` limita sólo la descarga de estatus, que va por
+    tramos de SEGMENT_DAYS días.  Si vence, se resuelven las ventanas que
+    terminan dentro de los tramos que alcanzaron a completarse en orden y
+    las demás quedan en None."""
+    if not windows:
+        return []
+    bounds = [(_parse_iso(a), _parse_iso(b)) for a, b in windows]
+    start_dt = min(a for a, _ in bounds)
+    stop_dt = max(b for _, b in bounds)
+    sem = asyncio.Semaphore(max(1, settings.SCANIA_SEGMENT_CONCURRENCY))
+    content_filter = ADBLUE_CONTENT_FILTER if include_adblue else HEADER_CONTENT_FILTER
+
+    eval_tasks = [asyncio.create_task(_fetch_evaluation(vin, a, b, sem)) for a, b in bounds]
+    tramos = _segments(start_dt, stop_dt)
+    tramo_tasks = [
+        asyncio.create_task(_collect_range(vin, a, b, sem, content_filter)) for a, b in tramos
+    ]
+    # Todo lo anterior a completo_hasta llegó completo: sólo avanza al
+    # terminar cada tramo, en orden
+    completo_hasta = start_dt
+    pages: list[StatusColumns] = []
+    try:
+        try:
+            async with asyncio.timeout(download_timeout):
+                for (_, tramo_stop), task in zip(tramos, tramo_tasks):
+                    pages.extend(await task)
+                    completo_hasta = tramo_stop
+        except TimeoutError:
+            logger.warning("Descarga de estatus de %s incompleta tras %ss", vin, download_timeout)
+        evaluaciones = await asyncio.gather(*eval_tasks)
+    except BaseException:
+        for task in eval_tasks:
+            task.cancel()
+        raise
+    finally:
+        for task in tramo_tasks:
+            task.cancel()
+
+    serie = StatusColumns.concat(pages)
+    serie = serie.take(np.argsort(serie.epoch_ns, kind="stable"))
+    cols = _PageColumns(serie)
+    if include_adblue:
+        caidas, _ = _adblue_drops_lts(cols.adblue, np.nan)
+    else:
+        caidas = np.zeros(len(serie))
+    caidas_acumuladas = np.cumsum(caidas)
+
+    inicios = np.searchsorted(serie.epoch_ns, [pd.Timestamp(a).value for a, _ in bounds], side="left")
+    fines = np.searchsorted(serie.epoch_ns, [pd.Timestamp(b).value for _, b in bounds], side="left")
+
+    resumenes = []
+    for (starttime, stoptime), (_, b), lo, hi, (eval_distance, eval_fuel) in zip(
+        windows, bounds, inicios.tolist(), fines.tolist(), evaluaciones
+    ):
+        if b > completo_hasta:
+            resumenes.append(None)
+            continue
+        acc = _HistoryAccumulator.from_range(vin, cols, lo, hi, caidas_acumuladas)
+        resumenes.append(_build_summary(acc, eval_distance, eval_fuel, starttime, stoptime))
+    return resumenes
+
+
+async def get_fleet_summaries(
+    vins: Optional[Iterable[str]],
+    starttime: str,
+    stoptime: str,
+    include_adblue: bool = True,
+) -> Dict[str, Optional[VehicleSummaryData]]:
+    """Resumen por VIN de varios vehículos con un solo barrido paginado de
+    rFMS sin ``vin`` (toda la flota), repartiendo cada página por VIN.
+
+    ``vins=None`` resume todos los vehículos que aparezcan en el barrido.
+    Los resúmenes salen sólo de los estatus (odómetro y combustible
+    acumulados): pedir un Vehicle Evaluation Report por vehículo
+    devolvería las N llamadas que este barrido evita."""
+    start_dt = _parse_iso(starttime)
+    stop_dt = _parse_iso(stoptime)
+    sem = asyncio.Semaphore(max(1, settings.SCANIA_SEGMENT_CONCURRENCY))
+    content_filter = ADBLUE_CONTENT_FILTER if include_adblue else HEADER_CONTENT_FILTER
+
+    wanted = set(vins) if vins is not None else None
+    accs: Dict[str, _HistoryAccumulator] = {vin: _HistoryAccumulator(vin) for vin in wanted or ()}
+    async with aclosing(
+        _iter_window_statuses(None, start_dt, stop_dt, sem, content_filter)
+    ) as pages:
+        async for page in pages:
+            for vin, cols in page.split_by_vin(wanted).items():
+                acc = accs.get(vin)
+                if acc is None:
+                    acc = accs[vin] = _HistoryAccumulator(vin)
+                acc.add_page(cols)
+
+    return {
+        vin: _build_summary(acc, None, None, starttime, stoptime)
+        for vin, acc in accs.items()
+    }
@@ -0,0 +1,123 @@
+# app/services/scania_vehicles_status/snapshot.py
+"""Último estatus conocido de cada vehículo de la flota.
+
+Un solo job periódico (ver app.core.scheduler) pide a rFMS
+``latestOnly=true`` sin VIN y deja la foto en memoria y en Redis; el
+endpoint la sirve sin tocar Scania.  El job corre en todas las réplicas,
+pero en cada intervalo sólo barre la que toma el candado en Redis; las
+demás leen la foto compartida."""
+import json
+import logging
+import time
+from datetime import datetime, UTC
+from typing import Any, Dict, Optional
+
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.core.redis_client import get_redis_client
+from app.services.scania_vehicles_status.client import vehicle_status_client
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY = "scania_fleet_snapshot"
+REDIS_LOCK_KEY = "scania_fleet_snapshot:lock"
+SNAPSHOT_CONTENT_FILTER = "HEADER,SNAPSHOT"
+
+
+def _scaled(value: Any, factor: float) -> Optional[float]:
+    return None if value is None else float(value) / factor
+
+
+def _vehicle_snapshot(status: dict) -> Dict[str, Any]:
+    snap = status.get("snapshotData") or {}
+    position = snap.get("gnssPosition") or {}
+    return {
+        "vin": status["vin"],
+        "timestamp": status.get("createdDateTime"),
+        "odometro": _scaled(status.get("hrTotalVehicleDistance"), 1_000.0),
+        "lts_diesel_totales": _scaled(status.get("engineTotalFuelUsed"), 1_000.0),
+        "nivel_diesel": snap.get("fuelLevel1"),
+        "nivel_adblue": snap.get("catalystFuelLevel"),
+        "latitud": position.get("latitude"),
+        "longitud": position.get("longitude"),
+    }
+
+
+class FleetSnapshot:
+    def __init__(self):
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._loaded_at = 0.0  # time.monotonic() de la última carga
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Un barrido paginado de toda la flota; si un VIN aparece más de
+        una vez se queda su estatus más reciente."""
+        vehicles: Dict[str, Dict[str, Any]] = {}
+        async for page in vehicle_status_client.iter_vehicle_status_pages(
+            vin=None,
+            starttime=None,
+            stoptime=None,
+            content_filter=SNAPSHOT_CONTENT_FILTER,
+            latest_only=True,
+        ):
+            for status in page:
+                if not status.get("vin"):
+                    continue
+                entry = _vehicle_snapshot(status)
+                previous = vehicles.get(entry["vin"])
+                if previous is None or (entry["timestamp"] or "") >= (previous["timestamp"] or ""):
+                    vehicles[entry["vin"]] = entry
+
+        snapshot = {"fetched_at": datetime.now(UTC).isoformat(), "vehicles": vehicles}
+        self._set(snapshot)
+        try:
+            await get_redis_client().set(
+                REDIS_KEY, json.dumps(snapshot), ex=max(60, settings.SCANIA_SNAPSHOT_POLL_SECONDS * 10)
+            )
+        except RedisError as e:
+            logger.warning(f"No se pudo guardar la foto de flota en Redis: {e}")
+        return snapshot
+
+    async def refresh_if_leader(self) -> Optional[Dict[str, Any]]:
+        """Barre la flota sólo si esta réplica toma el candado del intervalo
+        (``SET NX EX``); si otra ya lo tiene devuelve None.  Sin Redis cada
+        réplica barre por su cuenta, como antes."""
+        try:
+            acquired = await get_redis_client().set(
+                REDIS_LOCK_KEY, "1", nx=True, ex=max(1, settings.SCANIA_SNAPSHOT_POLL_SECONDS - 1)
+            )
+        except RedisError as e:
+            logger.warning(f"Candado de la foto de flota no disponible: {e}")
+            acquired = True
+        if not acquired:
+            return None
+        return await self.refresh()
+
+    def _set(self, snapshot: Dict[str, Any]):
+        self._snapshot = snapshot
+        self._loaded_at = time.monotonic()
+
+    async def get_snapshot(self) -> Optional[Dict[str, Any]]:
+        """Foto en memoria; si ya pasó un intervalo de sondeo (o no hay) se
+        relee de Redis, donde pudo dejarla otra réplica."""
+        if (
+            self._snapshot is not None
+            and time.monotonic() - self._loaded_at < settings.SCANIA_SNAPSHOT_POLL_SECONDS
+        ):
+            return self._snapshot
+        try:
+            cached = await get_redis_client().get(REDIS_KEY)
+        except RedisError:
+            cached = None
+        if cached:
+            try:
+                snapshot = json.loads(cached)
+            except json.JSONDecodeError:
+                snapshot = None
+            if snapshot and (
+                self._snapshot is None or snapshot["fetched_at"] >= self._snapshot["fetched_at"]
+            ):
+                self._set(snapshot)
+        return self._snapshot
+
+fleet_snapshot = FleetSnapshot()
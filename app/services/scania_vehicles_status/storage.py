@@ -0,0 +1,141 @@
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.services.scania_vehicles_status.models import (
+    Base,
+    VehicleStatusSample,
+    VehicleStatusSync,
+)
+from app.services.scania_vehicles_status.samples import StatusColumns
+
+STORE_PAGE_SIZE = 1000
+
+
+async def ensure_status_tables(engine: AsyncEngine):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        # Tablas creadas antes de synced_from: se toma la muestra más
+        # antigua guardada como inicio de lo sincronizado
+        await conn.execute(text(
+            "ALTER TABLE vehicle_status_sync ADD COLUMN IF NOT EXISTS synced_from TIMESTAMPTZ"
+        ))
+        await conn.execute(text("""
+            UPDATE vehicle_status_sync s
+            SET synced_from = coalesce(
+                (SELECT min(created_at) FROM vehicle_status_sample m WHERE m.vin = s.vin),
+                s.synced_until
+            )
+            WHERE s.synced_from IS NULL
+        """))
+        # Los resúmenes diarios ya no se usan: la ventana completa del
+        # reporte sale de una sola descarga contigua por VIN
+        await conn.execute(text("DROP TABLE IF EXISTS vehicle_daily_summary"))
+
+
+def _sample_row(vin: str, st: dict) -> Optional[dict]:
+    ts_raw = st.get("createdDateTime")
+    if not ts_raw:
+        return None
+    snap = st.get("snapshotData") or {}
+    return {
+        "vin": vin,
+        "created_at": datetime.fromisoformat(ts_raw.replace("Z", "+00:00")),
+        "hr_total_vehicle_distance": st.get("hrTotalVehicleDistance"),
+        "engine_total_fuel_used": st.get("engineTotalFuelUsed"),
+        "catalyst_fuel_level": snap.get("catalystFuelLevel"),
+    }
+
+
+def _columns_from_rows(rows) -> StatusColumns:
+    """Filas ``(created_at, distancia, combustible, adblue)`` como columnas,
+    con las mismas unidades y faltantes que StatusColumns.from_statuses."""
+    created_at, distance, fuel, adblue = zip(*rows)
+    return StatusColumns(
+        pd.to_datetime(list(created_at), utc=True).as_unit("ns").asi8,
+        np.array([0.0 if d is None else d for d in distance], dtype=float) / 1_000.0,
+        np.array(fuel, dtype=float) / 1_000.0,
+        np.array(adblue, dtype=float),
+    )
+
+
+async def save_status_samples(statuses: list[dict], vin: str, db: AsyncSession):
+    rows = [r for r in (_sample_row(vin, st) for st in statuses) if r]
+    if not rows:
+        return
+    stmt = insert(VehicleStatusSample).values(rows).on_conflict_do_nothing(
+        index_elements=["vin", "created_at"]
+    )
+    await db.execute(stmt)
+
+
+async def get_high_water_mark(db: AsyncSession, vin: str) -> Optional[datetime]:
+    result = await db.execute(
+        select(VehicleStatusSync.synced_until).where(VehicleStatusSync.vin == vin)
+    )
+    return result.scalar_one_or_none()
+
+
+async def get_sync_range(db: AsyncSession, vin: str) -> Optional[tuple[datetime, datetime]]:
+    """``(synced_from, synced_until)`` del VIN, o None si nunca se sincronizó."""
+    result = await db.execute(
+        select(VehicleStatusSync.synced_from, VehicleStatusSync.synced_until)
+        .where(VehicleStatusSync.vin == vin)
+    )
+    row = result.one_or_none()
+    if row is None or row.synced_from is None:
+        return None
+    return row.synced_from, row.synced_until
+
+
+async def set_high_water_mark(
+    db: AsyncSession,
+    vin: str,
+    synced_until: datetime,
+    synced_from: Optional[datetime] = None,
+):
+    """Avanza la marca de agua; ``synced_from`` sólo se guarda al crear la
+    fila (el inicio del primer backfill) y después no cambia."""
+    stmt = insert(VehicleStatusSync).values(
+        vin=vin,
+        synced_from=synced_from,
+        synced_until=synced_until,
+    ).on_conflict_do_update(
+        index_elements=["vin"],
+        set_={"synced_until": synced_until},
+    )
+    await db.execute(stmt)
+
+
+async def iter_status_samples(
+    db: AsyncSession,
+    vin: str,
+    start: datetime,
+    stop: datetime,
+) -> AsyncIterator[StatusColumns]:
+    """Muestras guardadas en [start, stop) ordenadas por fecha, por páginas
+    de columnas (sin pasar por objetos ORM ni dicts)."""
+    stmt = (
+        select(
+            VehicleStatusSample.created_at,
+            VehicleStatusSample.hr_total_vehicle_distance,
+            VehicleStatusSample.engine_total_fuel_used,
+            VehicleStatusSample.catalyst_fuel_level,
+        )
+        .where(
+            VehicleStatusSample.vin == vin,
+            VehicleStatusSample.created_at >= start,
+            VehicleStatusSample.created_at < stop,
+        )
+        .order_by(VehicleStatusSample.created_at)
+        .execution_options(yield_per=STORE_PAGE_SIZE)
+    )
+    result = await db.stream(stmt)
+    async for partition in result.partitions():
+        if partition:
+            yield _columns_from_rows(partition)
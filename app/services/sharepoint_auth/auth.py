@@ -3,6 +3,7 @@ import logging
 from typing import Optional
 
 from app.config import settings
+from app.core.http_client import get_http_client, MS_LOGIN_HOST
 
 logger = logging.getLogger(__name__)
 
@@ -10,10 +11,15 @@ logger = logging.getLogger(__name__)
 class SharePointAuthService:
     TOKEN_URL = "https://login.microsoftonline.com/206805c7-24a4-4581-9843-e227b0ee55b1/oauth2/v2.0/token"
 
-    def __init__(self):
+    def __init__(self, http_client: httpx.AsyncClient | None = None):
         self.client_id = settings.SHAREPOINT_CLIENT_ID
         self.client_secret = settings.SHAREPOINT_CLIENT_SECRET
         self.scope = "https://graph.microsoft.com/.default"
+        self._http_client = http_client
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self._http_client or get_http_client(MS_LOGIN_HOST)
 
     async def get_access_token(self) -> Optional[str]:
         headers = {
@@ -27,12 +33,11 @@ class SharePointAuthService:
             "grant_type": "client_credentials"
         }
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(self.TOKEN_URL, data=data, headers=headers)
-                response.raise_for_status()
-                return response.json().get("access_token")
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Error al obtener token SharePoint: {e.response.text}")
+        try:
+            response = await self.http_client.post(self.TOKEN_URL, data=data, headers=headers)
+            response.raise_for_status()
+            return response.json().get("access_token")
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Error al obtener token SharePoint: {e.response.text}")
 
         return None
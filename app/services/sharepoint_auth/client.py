@@ -3,16 +3,22 @@
 import httpx
 from app.config import settings
 from app.core.redis_client import get_redis_client
+from app.core.http_client import get_http_client, MS_LOGIN_HOST
 
 SHAREPOINT_TOKEN_KEY = "sharepoint_access_token"
 
 class SharePointClient:
-    def __init__(self):
+    def __init__(self, http_client: httpx.AsyncClient | None = None):
         self.token_url = "https://login.microsoftonline.com/206805c7-24a4-4581-9843-e227b0ee55b1/oauth2/v2.0/token"
         self.client_id = settings.SHAREPOINT_CLIENT_ID
         self.client_secret = settings.SHAREPOINT_CLIENT_SECRET
         self.scope = "https://graph.microsoft.com/.default"
         self.redis = get_redis_client()
+        self._http_client = http_client
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self._http_client or get_http_client(MS_LOGIN_HOST)
 
     async def get_token_from_api(self) -> dict:
         data = {
@@ -26,22 +32,29 @@ class SharePointClient:
             "Content-Type": "application/x-www-form-urlencoded"
         }
 
-        async with httpx.AsyncClient() as client:
-            r = await client.post(self.token_url, data=data, headers=headers)
-            r.raise_for_status()
-            return r.json()
+        r = await self.http_client.post(self.token_url, data=data, headers=headers)
+        r.raise_for_status()
+        return r.json()
 
     async def store_token(self, token: str, expires_in: int = 3590):
         await self.redis.set(SHAREPOINT_TOKEN_KEY, token, ex=expires_in)
 
+    async def get_token_ttl(self) -> int:
+        """Segundos de vida que le quedan al token guardado (<= 0 si no hay)."""
+        return await self.redis.ttl(SHAREPOINT_TOKEN_KEY)
+
+    async def refresh_access_token(self) -> tuple[str, int]:
+        token_data = await self.get_token_from_api()
+        token = token_data.get("access_token")
+        expires_in = int(token_data.get("expires_in", 3590))
+        await self.store_token(token, expires_in)
+        return token, expires_in
+
     async def get_access_token(self) -> str:
         token = await self.redis.get(SHAREPOINT_TOKEN_KEY)
         if token:
             return token
 
         # No hay token, se genera uno nuevo
-        token_data = await self.get_token_from_api()
-        token = token_data.get("access_token")
-        expires_in = int(token_data.get("expires_in", 3590))
-        await self.store_token(token, expires_in)
+        token, _ = await self.refresh_access_token()
         return token
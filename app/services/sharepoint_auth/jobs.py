@@ -1,34 +1,40 @@
 import httpx
 
+from app.config import settings
 from app.db.session import AsyncSessionLocal
 from app.services.sharepoint_auth.client import SharePointClient
 from app.services.sharepoint_auth.storage import save_items_to_db, save_reassignments_to_db
+from app.services.sharepoint_auth.utils import graph_get
 
 
-async def refresh_sharepoint_token():
+async def refresh_sharepoint_token() -> int:
+    """Renueva el token sólo si está por caducar (otra réplica pudo haberlo
+    hecho ya).  Devuelve los segundos de vida que le quedan."""
     client = SharePointClient()
-    token_data = await client.get_token_from_api()
-    token = token_data.get("access_token")
-    expires_in = int(token_data.get("expires_in", 3590))
-    await client.store_token(token, expires_in)
-
-
-async def fetch_sharepoint_list_items(token: str, url: str) -> list:
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
-
-    async with httpx.AsyncClient() as http_client:
-        items = []
-        next_url = url
-        while next_url:
-            resp = await http_client.get(next_url, headers=headers)
-            resp.raise_for_status()
-            data = resp.json()
-            items.extend(data.get("value", []))
-            next_url = data.get("@odata.nextLink")
-        return items
+    ttl = await client.get_token_ttl()
+    if ttl and ttl > settings.TOKEN_REFRESH_MARGIN_SECONDS:
+        return ttl
+    _, expires_in = await client.refresh_access_token()
+    return expires_in
+
+
+async def fetch_sharepoint_list_items(
+    token: str,
+    url: str,
+    http_client: httpx.AsyncClient | None = None,
+) -> list:
+    items = []
+    next_url = url
+    while next_url:
+        # Tras la primera página (o una renovación) vale el token de Redis
+        resp = await graph_get(
+            next_url, token=token, headers={"Content-Type": "application/json"}, http_client=http_client
+        )
+        token = None
+        data = resp.json()
+        items.extend(data.get("value", []))
+        next_url = data.get("@odata.nextLink")
+    return items
 
 
 async def update_sharepoint_items():
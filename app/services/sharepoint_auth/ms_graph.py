@@ -2,13 +2,35 @@
 # ────────────────────────────────────────
 import httpx, pandas as pd
 from io import BytesIO
-from app.services.sharepoint_auth.client import SharePointClient
+from app.core.http_client import get_http_client, GRAPH_HOST
+from app.services.sharepoint_auth.utils import graph_get
 
 GRAPH_BASE_URL = "https://graph.microsoft.com/v1.0"
 DRIVE_ID      = "b!o7HBJ3ipyEKwjcpneGiAzvmjvnw6bvxEivisl_xxW0D4hiM1LaJ1R6_tdoRCxYUe"
 PLANTILLA_COSTOS_FOLDER_ID = "01USEHRLUQN5OQ4PLCZFEZTMUB2DIWLQLG"
 
-sharepoint_client = SharePointClient()
+async def buscar_archivo_onedrive(
+    nombre_archivo: str,
+    *,
+    http_client: httpx.AsyncClient | None = None,
+) -> dict:
+    """
+    Metadatos (id, eTag, lastModifiedDateTime…) de un archivo de la carpeta
+    Plantilla Costos, sin descargarlo.
+    """
+    url_list  = f"{GRAPH_BASE_URL}/drives/{DRIVE_ID}/items/{PLANTILLA_COSTOS_FOLDER_ID}/children"
+    res       = await graph_get(url_list, http_client=http_client)
+
+    archivo = next((a for a in res.json().get("value", []) if a["name"] == nombre_archivo), None)
+    if not archivo:
+        raise FileNotFoundError(f"No se encontró el archivo: {nombre_archivo}")
+    return archivo
+
+
+def version_archivo(archivo: dict) -> str | None:
+    """Identificador de la versión del contenido (cambia al editar el archivo)."""
+    return archivo.get("cTag") or archivo.get("eTag") or archivo.get("lastModifiedDateTime")
+
 
 # ➊  NUEVO parámetro header_row  (por defecto = 8 para Peajes)
 async def leer_excel_desde_onedrive(
@@ -16,46 +38,44 @@ async def leer_excel_desde_onedrive(
     *,
     header_row: int = 8,
     sheet_name: str | int = 0,
+    http_client: httpx.AsyncClient | None = None,
+    archivo: dict | None = None,
 ) -> pd.DataFrame:
     """
     Descarga un Excel de la carpeta Plantilla Costos y lo devuelve como DataFrame.
     • header_row = número (0-based) de la fila que contiene los encabezados.
+    • http_client = cliente a usar; por defecto el compartido de Graph.
+    • archivo = metadatos ya obtenidos con buscar_archivo_onedrive (evita listar otra vez).
     """
-    token   = await sharepoint_client.get_access_token()
-    headers = {"Authorization": f"Bearer {token}"}
-
-    async with httpx.AsyncClient() as client:
-        url_list  = f"{GRAPH_BASE_URL}/drives/{DRIVE_ID}/items/{PLANTILLA_COSTOS_FOLDER_ID}/children"
-        res       = await client.get(url_list, headers=headers)
-        res.raise_for_status()
-
-        archivo = next((a for a in res.json().get("value", []) if a["name"] == nombre_archivo), None)
-        if not archivo:
-            raise FileNotFoundError(f"No se encontró el archivo: {nombre_archivo}")
+    client  = http_client or get_http_client(GRAPH_HOST)
+    if archivo is None:
+        archivo = await buscar_archivo_onedrive(nombre_archivo, http_client=client)
 
-        url_download = f"{GRAPH_BASE_URL}/drives/{DRIVE_ID}/items/{archivo['id']}/content"
-        res          = await client.get(url_download, headers=headers, follow_redirects=True)
-        res.raise_for_status()
+    url_download = f"{GRAPH_BASE_URL}/drives/{DRIVE_ID}/items/{archivo['id']}/content"
+    res          = await graph_get(url_download, http_client=client, follow_redirects=True)
 
-        df = pd.read_excel(
-            BytesIO(res.content),
-            header=header_row,
-            sheet_name=sheet_name,
-        )
+    df = pd.read_excel(
+        BytesIO(res.content),
+        header=header_row,
+        sheet_name=sheet_name,
+    )
 
-        # pd.read_excel devuelve un dict si sheet_name=None; garantizamos
-        # retornar siempre un DataFrame usando la primera hoja si es el caso
-        if isinstance(df, dict):
-            df = next(iter(df.values()))
+    # pd.read_excel devuelve un dict si sheet_name=None; garantizamos
+    # retornar siempre un DataFrame usando la primera hoja si es el caso
+    if isinstance(df, dict):
+        df = next(iter(df.values()))
 
-        df.columns = df.columns.str.strip()  # quita espacios
-        return df
+    df.columns = df.columns.str.strip()  # quita espacios
+    return df
 
 
 # Helper específico para Diesel.xlsx
-async def leer_diesel_desde_onedrive(nombre_archivo: str = "Diesel.xlsx") -> pd.DataFrame:
+async def leer_diesel_desde_onedrive(
+    nombre_archivo: str = "Diesel.xlsx",
+    archivo: dict | None = None,
+) -> pd.DataFrame:
     """Descarga Diesel.xlsx y calcula PRECIO_DIESEL y COSTO_DIESEL."""
-    df = await leer_excel_desde_onedrive(nombre_archivo, header_row=4)
+    df = await leer_excel_desde_onedrive(nombre_archivo, header_row=4, archivo=archivo)
     df.columns = df.columns.str.strip()
 
     # Normaliza nombres esperados
@@ -74,12 +94,14 @@ async def leer_diesel_desde_onedrive(nombre_archivo: str = "Diesel.xlsx") -> pd.
 async def leer_factores_desde_onedrive(
     nombre_archivo: str = "Factores.xlsx",
     hoja: str = "Data1",
+    archivo: dict | None = None,
 ) -> pd.DataFrame:
     """Descarga Factores.xlsx y devuelve la hoja especificada como DataFrame."""
     df = await leer_excel_desde_onedrive(
         nombre_archivo,
         header_row=1,
         sheet_name=hoja,
+        archivo=archivo,
     )
     df.columns = df.columns.str.strip()
 
@@ -2,6 +2,12 @@ from dateutil import parser
 from typing import Optional
 import datetime
 
+import httpx
+
+from app.core.http_client import get_http_client, GRAPH_HOST
+from app.core.resilience import resilient_get
+from app.services.sharepoint_auth.client import SharePointClient
+
 def parse_fecha(fecha_str: Optional[str]) -> Optional[datetime.datetime]:
     if not fecha_str:
         return None
@@ -9,3 +15,31 @@ def parse_fecha(fecha_str: Optional[str]) -> Optional[datetime.datetime]:
         return parser.parse(fecha_str, dayfirst=True)
     except (ValueError, TypeError):
         return None
+
+
+async def graph_get(
+    url: str,
+    *,
+    token: Optional[str] = None,
+    headers: Optional[dict] = None,
+    http_client: Optional[httpx.AsyncClient] = None,
+    **kwargs,
+) -> httpx.Response:
+    """GET autenticado contra Graph por la capa de reintentos/circuit
+    breaker.  ``token`` por defecto es el compartido en Redis; si Graph lo
+    rechaza (401) se renueva bajo demanda y se reintenta una sola vez."""
+    client = SharePointClient()
+    http_client = http_client or get_http_client(GRAPH_HOST)
+    token = token or await client.get_access_token()
+    response = await resilient_get(
+        http_client, url, host=GRAPH_HOST,
+        headers={**(headers or {}), "Authorization": f"Bearer {token}"}, **kwargs,
+    )
+    if response.status_code == httpx.codes.UNAUTHORIZED:
+        token, _ = await client.refresh_access_token()
+        response = await resilient_get(
+            http_client, url, host=GRAPH_HOST,
+            headers={**(headers or {}), "Authorization": f"Bearer {token}"}, **kwargs,
+        )
+    response.raise_for_status()
+    return response
@@ -0,0 +1,52 @@
+import pytest
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def set(self, key, value, ex=None):
+        self.ops.append((key, value, ex))
+
+    async def execute(self):
+        for key, value, ex in self.ops:
+            await self.redis.set(key, value, ex=ex)
+
+
+class FakeRedis:
+    """Redis en memoria con los comandos que usa la app: get/mget, set con
+    ``ex`` y ``nx``, ttl y pipeline.  ``ttls`` guarda el ``ex`` de cada llave
+    y ``gets`` cuenta las lecturas."""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+        self.gets = 0
+
+    async def get(self, key):
+        self.gets += 1
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        return [await self.get(k) for k in keys]
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        self.ttls[key] = ex
+        return True
+
+    async def ttl(self, key):
+        if key not in self.data:
+            return -2
+        return -1 if self.ttls.get(key) is None else self.ttls[key]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+@pytest.fixture
+def fake_redis():
+    return FakeRedis()
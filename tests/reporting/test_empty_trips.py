@@ -0,0 +1,91 @@
+import random
+
+import pandas as pd
+
+from app.services.reporting_service.lookups import viajes_con_vacios
+
+COLS = [
+    "TR_NO_VIAJE", "NO_TRACTO", "PLACAS_TRACTO", "NO_REMOLQUE", "PLACAS_REMOLQUE",
+    "NOMBRE_OP", "ORIGEN", "DESTINO", "CLIENTE", "EMPRESA", "CARGA_KILOS",
+    "FECHA_CARGA", "HORA_CARGA", "FECHA_DESCARGA", "HORA_DESCARGA",
+    "KM_RECORRIDOS", "CONSUMO_LTS_DIESEL", "LTS_ADBLUE_CONSUMIDOS", "PEAJES_VIAPASS",
+]
+
+
+def _vacios_reference(viajes, cols):
+    """Implementación fila por fila anterior (referencia)."""
+    rows_out = []
+    for _, v in viajes.iterrows():
+        tracto, fc, hc = v["NO_TRACTO"], v["FECHA_CARGA"], v["HORA_CARGA"]
+        prev = viajes[
+            (viajes["NO_TRACTO"] == tracto)
+            & ((viajes["FECHA_CARGA"] < fc) |
+               ((viajes["FECHA_CARGA"] == fc) & (viajes["HORA_CARGA"] < hc)))
+        ].sort_values(["FECHA_CARGA", "HORA_CARGA"], ascending=False).head(1)
+
+        vac = pd.Series("", index=cols, dtype=object)  # como en pandas 2
+        vac[["KM_RECORRIDOS", "CONSUMO_LTS_DIESEL", "LTS_ADBLUE_CONSUMIDOS"]] = None
+        if not prev.empty:
+            p = prev.iloc[0]
+            vac[["NO_TRACTO", "PLACAS_TRACTO", "NO_REMOLQUE", "PLACAS_REMOLQUE", "NOMBRE_OP"]] = \
+                p[["NO_TRACTO", "PLACAS_TRACTO", "NO_REMOLQUE", "PLACAS_REMOLQUE", "NOMBRE_OP"]]
+            vac["ORIGEN"], vac["DESTINO"] = p["DESTINO"], v["ORIGEN"]
+            vac["FECHA_CARGA"], vac["HORA_CARGA"] = p["FECHA_DESCARGA"], p["HORA_DESCARGA"]
+        else:
+            vac[["NO_TRACTO", "PLACAS_TRACTO", "NO_REMOLQUE", "PLACAS_REMOLQUE", "NOMBRE_OP"]] = \
+                v[["NO_TRACTO", "PLACAS_TRACTO", "NO_REMOLQUE", "PLACAS_REMOLQUE", "NOMBRE_OP"]]
+            vac["ORIGEN"], vac["DESTINO"] = v["ORIGEN"], v["DESTINO"]
+        vac["FECHA_DESCARGA"], vac["HORA_DESCARGA"] = fc, hc
+        vac["CLIENTE"] = vac["EMPRESA"] = "VIAJE VACÍO"
+        vac["CARGA_KILOS"], vac["TR_NO_VIAJE"] = 0, v["TR_NO_VIAJE"]
+        rows_out.extend([vac, v])
+    return pd.DataFrame(rows_out).drop(columns=["ES_REASIG"])
+
+
+def _viajes(rng, n=400):
+    filas = []
+    for i in range(n):
+        fecha = pd.Timestamp("2024-03-01") + pd.Timedelta(days=rng.randrange(0, 20))
+        # Cada (tracto, fecha, hora) es único: los empates no tienen un orden definido
+        hora = None if rng.random() < 0.1 else f"{rng.randrange(0, 24):02d}:{rng.randrange(0, 60):02d}:{i % 60:02d}"
+        filas.append({
+            "TR_NO_VIAJE": f"T{i}",
+            "NO_TRACTO": f"ECO {rng.randrange(1, 8)}",
+            "PLACAS_TRACTO": f"P{i}",
+            "NO_REMOLQUE": f"R{i}",
+            "PLACAS_REMOLQUE": f"PR{i}",
+            "NOMBRE_OP": f"OP{i}",
+            "ORIGEN": f"O{i}",
+            "DESTINO": f"D{i}",
+            "CLIENTE": "ACME",
+            "EMPRESA": "ACME",
+            "CARGA_KILOS": rng.randrange(1000, 30000),
+            "FECHA_CARGA": fecha if rng.random() > 0.03 else pd.NaT,
+            "HORA_CARGA": hora,
+            "FECHA_DESCARGA": fecha + pd.Timedelta(days=1),
+            "HORA_DESCARGA": "12:00:00",
+            "KM_RECORRIDOS": "",
+            "CONSUMO_LTS_DIESEL": "",
+            "LTS_ADBLUE_CONSUMIDOS": "",
+            "PEAJES_VIAPASS": round(rng.uniform(0, 500), 2),
+            "ES_REASIG": False,
+        })
+    df = pd.DataFrame(filas).drop_duplicates(["NO_TRACTO", "FECHA_CARGA", "HORA_CARGA"])
+    # fila de tracto único: su vacío no tiene viaje anterior
+    df.loc[len(df) + 10] = {**filas[0], "TR_NO_VIAJE": "SOLO", "NO_TRACTO": "ECO 99", "ES_REASIG": True}
+    df["hora_sort"] = pd.to_timedelta(df["HORA_CARGA"].fillna("00:00:00"))
+    return df.sort_values(["NO_TRACTO", "FECHA_CARGA", "hora_sort"]).drop(columns=["hora_sort"])
+
+
+def test_empty_trips_match_row_wise_loop():
+    viajes = _viajes(random.Random(5))
+
+    esperado = _vacios_reference(viajes, COLS).reset_index(drop=True)
+    obtenido = viajes_con_vacios(viajes, COLS)
+
+    def _normaliza(df):
+        # None y NaN son el mismo faltante para los pasos siguientes
+        df = df.astype(object)
+        return df.where(df.notna(), None)
+
+    pd.testing.assert_frame_equal(_normaliza(obtenido), _normaliza(esperado))
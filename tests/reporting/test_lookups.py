@@ -0,0 +1,175 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.reporting_service import lookups
+from app.services.reporting_service.lookups import (
+    FactoresIndex,
+    PeajesIndex,
+    PrecioDieselIndex,
+    costo_peajes,
+    fechas_sharepoint,
+    por_version,
+)
+
+
+def _costo_peajes_reference(peajes_df, r):
+    """Implementación fila por fila anterior (referencia)."""
+    eco = r.get("No. Económico") or r.get("NO_TRACTO")
+    fecha_carga = r.get("fecha_carga") or r.get("FECHA_CARGA")
+    hora_carga = r.get("hora_carga") or r.get("HORA_CARGA")
+    fecha_descarga = r.get("fecha_descarga") or r.get("FECHA_DESCARGA")
+    hora_descarga = r.get("hora_descarga") or r.get("HORA_DESCARGA")
+    try:
+        ini = pd.to_datetime(f"{pd.to_datetime(fecha_carga).date()} {hora_carga}")
+        fin = pd.to_datetime(f"{pd.to_datetime(fecha_descarga).date()} {hora_descarga}")
+    except Exception:
+        return 0
+    sel = peajes_df[(peajes_df["No. Económico"] == eco) & (peajes_df["Fecha"].between(ini, fin))]
+    return sel["Costo final"].sum()
+
+
+def _peajes(rng):
+    base = pd.Timestamp("2024-01-01")
+    filas = []
+    for _ in range(3_000):
+        filas.append({
+            "Fecha": base + pd.Timedelta(minutes=rng.randrange(0, 60 * 24 * 60)) if rng.random() > 0.02 else pd.NaT,
+            "No. Económico": f"ECO {rng.randrange(1, 12)}",
+            "Costo final": round(rng.uniform(20, 900), 2) if rng.random() > 0.03 else np.nan,
+        })
+    # peaje exactamente en el borde de un viaje
+    filas.append({"Fecha": pd.Timestamp("2024-01-10 08:00:00"), "No. Económico": "ECO 1", "Costo final": 111.0})
+    return pd.DataFrame(filas)
+
+
+def test_toll_interval_join_matches_row_wise_scan():
+    rng = random.Random(11)
+    peajes_df = _peajes(rng)
+    base = pd.Timestamp("2024-01-01")
+
+    viajes = []
+    for _ in range(400):
+        carga = base + pd.Timedelta(hours=rng.randrange(0, 24 * 55))
+        descarga = carga + pd.Timedelta(hours=rng.randrange(-5, 72))
+        viajes.append({
+            "No. Económico": f"ECO {rng.randrange(1, 14)}",
+            "fecha_carga": carga.normalize() if rng.random() > 0.03 else pd.NaT,
+            "hora_carga": rng.choice([carga.strftime("%H:%M:%S"), carga.strftime("%H:%M"), None, ""]),
+            "fecha_descarga": descarga.normalize(),
+            "hora_descarga": descarga.strftime("%H:%M:%S"),
+        })
+    viajes.append({"No. Económico": "ECO 1", "fecha_carga": pd.Timestamp("2024-01-10"), "hora_carga": "08:00:00",
+                   "fecha_descarga": pd.Timestamp("2024-01-10"), "hora_descarga": "08:00:00"})
+    df = pd.DataFrame(viajes)
+
+    esperado = (df.apply(lambda r: _costo_peajes_reference(peajes_df, r), axis=1) / 1.16).round(2)
+    obtenido = (costo_peajes(df, PeajesIndex(peajes_df)) / 1.16).round(2)
+    assert obtenido.tolist() == esperado.tolist()
+
+    # formato del DataFrame final (viajes vacíos): columnas en mayúsculas
+    final = df.rename(columns={
+        "No. Económico": "NO_TRACTO", "fecha_carga": "FECHA_CARGA", "hora_carga": "HORA_CARGA",
+        "fecha_descarga": "FECHA_DESCARGA", "hora_descarga": "HORA_DESCARGA",
+    })
+    esperado = (final.apply(lambda r: _costo_peajes_reference(peajes_df, r), axis=1) / 1.16).round(2)
+    obtenido = (costo_peajes(final, PeajesIndex(peajes_df)) / 1.16).round(2)
+    assert obtenido.tolist() == esperado.tolist()
+
+
+def test_diesel_price_as_of_matches_last_row_on_or_before_date():
+    rng = random.Random(3)
+    base = pd.Timestamp("2024-01-01")
+    diesel_df = pd.DataFrame({
+        "Fecha ": [
+            (base + pd.Timedelta(days=rng.randrange(0, 90))).strftime("%d/%m/%Y") if rng.random() > 0.05 else None
+            for _ in range(60)
+        ],
+        "PRECIO_DIESEL": [round(rng.uniform(18, 24), 2) for _ in range(60)],
+    })
+    # Referencia: filtro fila por fila anterior.  Con fechas repetidas su
+    # sort_values no estable no define cuál gana: se dejan fechas únicas.
+    ref = diesel_df.copy()
+    ref.columns = ref.columns.str.strip().str.upper()
+    ref["FECHA"] = pd.to_datetime(ref["FECHA"], dayfirst=True, errors="coerce")
+    ref = ref.drop_duplicates("FECHA", keep=False).sort_values("FECHA")
+    diesel_df = diesel_df[diesel_df["Fecha "].isin(
+        ref["FECHA"].dt.strftime("%d/%m/%Y").tolist() + [None]
+    )]
+
+    def _reference(fecha):
+        if pd.isna(fecha):
+            return None
+        rows = ref[ref["FECHA"] <= pd.to_datetime(fecha).normalize()]
+        return None if rows.empty else float(rows.iloc[-1]["PRECIO_DIESEL"])
+
+    fechas = pd.Series(
+        [base + pd.Timedelta(hours=rng.randrange(-48, 24 * 100)) for _ in range(300)] + [pd.NaT],
+        index=range(1000, 1301),
+    )
+    esperado = fechas.apply(_reference).astype(float)
+    obtenido = PrecioDieselIndex(diesel_df).precios(fechas)
+    pd.testing.assert_series_equal(obtenido, esperado, check_names=False)
+
+
+def test_diesel_file_without_date_column_is_rejected():
+    diesel_df = pd.DataFrame({"DIA": ["01/02/2024"], "PRECIO_DIESEL": [21.5]})
+    with pytest.raises(ValueError, match="FECHA"):
+        PrecioDieselIndex(diesel_df)
+
+
+def test_sharepoint_dates_are_read_per_value_regardless_of_row_order():
+    valores = pd.Series(
+        ["2024-03-05T06:00:00Z", "15/03/2024", " 5/3/2024 9:30", "2024-3-31", "31/02/2024", "abc", None, 7],
+        dtype=object,
+    )
+    esperado = pd.to_datetime(
+        ["2024-03-05", "2024-03-15", "2024-03-05", "2024-03-31", None, None, None, None]
+    ).tolist()
+    assert fechas_sharepoint(valores).tolist() == esperado
+    # pd.to_datetime(..., dayfirst=True) cambia de lectura con la primera fila
+    assert fechas_sharepoint(valores[::-1]).tolist() == esperado[::-1]
+
+
+def test_maintenance_factor_takes_first_matching_range():
+    factores_df = pd.DataFrame({
+        "Rango1": [0, 100_000, 100_000, 250_000, np.nan, 400_000],
+        "Rango2": [100_000, 250_000, 300_000, 350_000, 900_000, 500_000.5],
+        "Factor": [0.5, 0.8, 9.9, 1.1, 7.7, 1.4],
+    })
+
+    def _reference(odo):
+        if odo is None or pd.isna(odo):
+            return 0.0
+        row = factores_df[(factores_df["Rango1"] <= odo) & (odo <= factores_df["Rango2"])]
+        return 0.0 if row.empty else float(row.iloc[0]["Factor"])
+
+    odometros = pd.Series(
+        [None, -1, 0, 50_000, 100_000, 100_000.1, 250_000, 299_999, 300_000, 350_000,
+         360_000, 400_000, 500_000.5, 500_001, np.nan],
+        dtype=object,
+    )
+    esperado = [_reference(o) for o in odometros]
+    assert FactoresIndex(factores_df).factores(odometros).tolist() == esperado
+
+
+@pytest.mark.asyncio
+async def test_lookup_tables_are_rebuilt_only_when_file_version_changes(monkeypatch):
+    monkeypatch.setattr(lookups, "_por_version", {})
+    construidas = []
+
+    async def _construir():
+        construidas.append(object())
+        return construidas[-1]
+
+    a = await por_version("Diesel.xlsx", "ctag-1", _construir)
+    b = await por_version("Diesel.xlsx", "ctag-1", _construir)
+    c = await por_version("Diesel.xlsx", "ctag-2", _construir)
+    d = await por_version("Diesel.xlsx", None, _construir)
+
+    assert a is b
+    assert c is not a
+    assert d is not c
+    assert len(construidas) == 3
@@ -0,0 +1,54 @@
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.services.reporting_service.repository import get_filtered_logs
+
+# Consulta propia de PostgreSQL (jsonb, regexp_match, make_date): sólo corre
+# con una base de pruebas, p. ej. TEST_DATABASE_URL=postgresql+asyncpg://…
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="requiere TEST_DATABASE_URL (PostgreSQL)")
+async def test_month_logs_include_each_tractor_previous_trip_only():
+    anio = datetime.now().year
+    viajes = [
+        # (Title, tracto, fecha de carga, reasignación)
+        ("A-ENE", "ECO 1", f"20/01/{anio}", False),
+        ("A-FEB", "ECO 1", f"{anio}-02-10T06:00:00Z", False),  # anterior al mes
+        ("A-MAR1", "ECO1", f"05/03/{anio} 08:00", False),
+        ("A-MAR2", " ECO 1 ", f"{anio}-03-20", False),
+        ("A-ABR", "ECO 1", f"2/4/{anio}", False),  # su vacío sale de A-MAR2
+        ("A-MAY", "ECO 1", f"01/05/{anio}", False),
+        ("B-FEB", "ECO 2", f"27/02/{anio}", False),  # tracto sin viajes en el mes
+        ("B-ENE", "ECO 2", f"10/01/{anio}", True),
+        ("C-MAL", "ECO 3", "sin fecha", False),
+        ("C-INV", "ECO 3", f"30/02/{anio}", False),
+        ("C-MAR", "ECO 3", f"31/03/{anio}", False),
+    ]
+    engine = create_async_engine(TEST_DATABASE_URL)
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text(
+                "CREATE TEMP TABLE travel_log (id serial, fields json NOT NULL, created_at timestamptz DEFAULT now())"
+            ))
+            for titulo, tracto, fecha, reasignado in viajes:
+                await conn.execute(
+                    text("INSERT INTO travel_log (fields) VALUES (CAST(:fields AS json))"),
+                    {"fields": (
+                        f'{{"Title": "{titulo}", "field_1": "{tracto}", "field_6": "{fecha}", '
+                        f'"field_16": "", "field_17": "", "F_CARGA_YEAR": {anio}, '
+                        f'"REASIGNACION": {"true" if reasignado else "false"}}}'
+                    )},
+                )
+            session = AsyncSession(bind=conn)
+            rows = await get_filtered_logs(session, 3)
+            await session.close()
+    finally:
+        await engine.dispose()
+
+    assert {r["Title"] for r in rows} == {"A-FEB", "A-MAR1", "A-MAR2", "A-ABR", "B-ENE", "C-MAR"}
@@ -6,3 +6,61 @@ from app.services.scania_auth.auth import auth_service
 async def test_token_fetch():
     token = await auth_service.get_token()
     assert token is not None
+
+
+class FakeScaniaClient:
+    def __init__(self):
+        self.challenges = 0
+
+    async def get_challenge(self):
+        self.challenges += 1
+        await asyncio.sleep(0.01)
+        return "Y2hhbGxlbmdl"
+
+    async def get_token(self, challenge_response):
+        return {"token": f"TOKEN{self.challenges}", "refreshToken": "REFRESH"}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_token_exchange(monkeypatch, fake_redis):
+    from app.services.scania_auth import auth as auth_module
+
+    monkeypatch.setattr(auth_module.settings, "SECRET_KEY", "c2VjcmV0")
+    service = auth_module.ScaniaAuthService()
+    service.redis = fake_redis
+    service.client = FakeScaniaClient()
+
+    tokens = await asyncio.gather(*(service.get_token() for _ in range(20)))
+
+    assert set(tokens) == {"TOKEN1"}
+    assert service.client.challenges == 1
+    # Los siguientes llamados salen del caché en proceso, sin ir a Redis
+    gets_before = service.redis.gets
+    assert await service.get_token() == "TOKEN1"
+    assert service.redis.gets == gets_before
+
+
+@pytest.mark.asyncio
+async def test_refresh_reports_token_real_expiry(monkeypatch, fake_redis):
+    import base64
+    import json
+    import time
+    from app.services.scania_auth import auth as auth_module
+
+    claims = json.dumps({"exp": int(time.time()) + 1800}).encode()
+    jwt = "e30." + base64.urlsafe_b64encode(claims).decode().rstrip("=") + ".firma"
+
+    class JwtClient(FakeScaniaClient):
+        async def refresh_token(self, refresh_token):
+            return {"token": jwt, "refreshToken": "REFRESH"}
+
+    service = auth_module.ScaniaAuthService()
+    service.redis = fake_redis
+    service.client = JwtClient()
+    await fake_redis.set(auth_module.REDIS_REFRESH_TOKEN_KEY, "REFRESH", ex=86400)
+
+    ttl = await service.refresh_if_expiring(300)
+
+    assert 1790 <= ttl <= 1800
+    assert fake_redis.data[auth_module.REDIS_TOKEN_KEY] == jwt
+    assert fake_redis.ttls[auth_module.REDIS_TOKEN_KEY] == ttl
@@ -0,0 +1,75 @@
+import httpx
+import pytest
+
+from app.services.scania_vehicles_status import evaluation_client as evaluation_module
+
+
+@pytest.mark.asyncio
+async def test_closed_window_is_cached_and_failures_are_negative_entries(monkeypatch, fake_redis):
+    redis = fake_redis
+    monkeypatch.setattr(evaluation_module, "get_redis_client", lambda: redis)
+
+    calls = []
+
+    async def fake_fetch(vin, start_date, end_date):
+        calls.append((vin, start_date, end_date))
+        if vin == "SLOWVIN":
+            raise httpx.ConnectTimeout("timeout")
+        if vin == "BADVIN":
+            request = httpx.Request("GET", "https://example.test/report")
+            raise httpx.HTTPStatusError("404", request=request, response=httpx.Response(404, request=request))
+        return {"VehicleList": [{"Distance": 120.0}]}
+
+    client = evaluation_module.VehicleEvaluationClient()
+    monkeypatch.setattr(client, "fetch_evaluation", fake_fetch)
+
+    first = await client.get_evaluation("VIN1", "202401010000", "202401312359")
+    # la misma ventana en ISO 8601 cae en la misma llave
+    second = await client.get_evaluation("VIN1", "2024-01-01T00:00:00Z", "2024-01-31T23:59:30Z")
+    assert first == second == {"VehicleList": [{"Distance": 120.0}]}
+    assert calls == [("VIN1", "202401010000", "202401312359")]
+    key = "scania_evaluation:VIN1:202401010000:202401312359"
+    assert redis.ttls[key] == evaluation_module.settings.EVALUATION_CACHE_CLOSED_TTL_SECONDS
+
+    # un error de red es pasajero: entrada negativa corta
+    for _ in range(2):
+        with pytest.raises((httpx.ConnectTimeout, evaluation_module.EvaluationUnavailableError)):
+            await client.get_evaluation("SLOWVIN", "202401010000", "202401312359")
+    assert [c[0] for c in calls].count("SLOWVIN") == 1
+    slow_key = "scania_evaluation:SLOWVIN:202401010000:202401312359"
+    assert redis.ttls[slow_key] == evaluation_module.settings.EVALUATION_CACHE_TRANSIENT_TTL_SECONDS
+
+    for _ in range(2):
+        with pytest.raises((httpx.HTTPStatusError, evaluation_module.EvaluationUnavailableError)):
+            await client.get_evaluation("BADVIN", "202401010000", "202401312359")
+    assert [c[0] for c in calls].count("BADVIN") == 1
+    bad_key = "scania_evaluation:BADVIN:202401010000:202401312359"
+    assert redis.ttls[bad_key] == evaluation_module.settings.EVALUATION_CACHE_NEGATIVE_TTL_SECONDS
+
+
+@pytest.mark.asyncio
+async def test_timed_out_evaluation_is_negative_cached(monkeypatch, fake_redis):
+    import asyncio
+
+    redis = fake_redis
+    monkeypatch.setattr(evaluation_module, "get_redis_client", lambda: redis)
+    monkeypatch.setattr(evaluation_module.settings, "EVALUATION_TIMEOUT_SECONDS", 0.05)
+
+    calls = 0
+
+    async def slow_fetch(vin, start_date, end_date):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(10)
+
+    client = evaluation_module.VehicleEvaluationClient()
+    monkeypatch.setattr(client, "fetch_evaluation", slow_fetch)
+
+    with pytest.raises(TimeoutError):
+        await client.get_evaluation("VIN1", "202401010000", "202401312359")
+    # el siguiente reporte ya no espera el plazo
+    with pytest.raises(evaluation_module.EvaluationUnavailableError):
+        await client.get_evaluation("VIN1", "202401010000", "202401312359")
+    assert calls == 1
+    key = "scania_evaluation:VIN1:202401010000:202401312359"
+    assert redis.ttls[key] == evaluation_module.settings.EVALUATION_CACHE_TRANSIENT_TTL_SECONDS
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from app.services.scania_vehicles_status import snapshot as snapshot_module
+
+
+@pytest.mark.asyncio
+async def test_single_latest_only_sweep_is_shared_through_redis(monkeypatch, fake_redis):
+    redis = fake_redis
+    monkeypatch.setattr(snapshot_module, "get_redis_client", lambda: redis)
+
+    calls = []
+
+    async def fake_iter_vehicle_status_pages(**kwargs):
+        calls.append(kwargs)
+        yield [
+            {"vin": "VIN1", "createdDateTime": "2024-01-01T10:00:00Z", "hrTotalVehicleDistance": 1_000_000,
+             "engineTotalFuelUsed": 500_000, "snapshotData": {"catalystFuelLevel": 80, "fuelLevel1": 55}},
+            {"vin": "VIN2", "createdDateTime": "2024-01-01T10:05:00Z", "hrTotalVehicleDistance": 2_000_000},
+        ]
+        yield [
+            {"vin": "VIN1", "createdDateTime": "2024-01-01T10:30:00Z", "hrTotalVehicleDistance": 1_020_000,
+             "engineTotalFuelUsed": 506_000, "snapshotData": {"catalystFuelLevel": 79, "fuelLevel1": 54}},
+        ]
+
+    monkeypatch.setattr(snapshot_module.vehicle_status_client, "iter_vehicle_status_pages", fake_iter_vehicle_status_pages)
+
+    await snapshot_module.FleetSnapshot().refresh()
+
+    assert len(calls) == 1
+    assert calls[0]["vin"] is None and calls[0]["latest_only"] is True
+
+    # otra réplica (sin foto en memoria) la lee de Redis
+    snapshot = await snapshot_module.FleetSnapshot().get_snapshot()
+    assert set(snapshot["vehicles"]) == {"VIN1", "VIN2"}
+    assert snapshot["vehicles"]["VIN1"]["odometro"] == 1020
+    assert snapshot["vehicles"]["VIN1"]["nivel_adblue"] == 79
+    assert snapshot["vehicles"]["VIN2"]["lts_diesel_totales"] is None
+    assert json.loads(redis.data[snapshot_module.REDIS_KEY]) == snapshot
+
+
+@pytest.mark.asyncio
+async def test_only_lock_holder_sweeps_the_fleet(monkeypatch, fake_redis):
+    redis = fake_redis
+    monkeypatch.setattr(snapshot_module, "get_redis_client", lambda: redis)
+
+    calls = []
+
+    async def fake_iter_vehicle_status_pages(**kwargs):
+        calls.append(kwargs)
+        yield [{"vin": "VIN1", "createdDateTime": "2024-01-01T10:00:00Z", "hrTotalVehicleDistance": 1_000_000}]
+
+    monkeypatch.setattr(snapshot_module.vehicle_status_client, "iter_vehicle_status_pages", fake_iter_vehicle_status_pages)
+
+    leader, follower = snapshot_module.FleetSnapshot(), snapshot_module.FleetSnapshot()
+    assert await leader.refresh_if_leader() is not None
+    assert await follower.refresh_if_leader() is None
+    assert len(calls) == 1
+
+    # la réplica que no barrió sirve la foto de la otra
+    snapshot = await follower.get_snapshot()
+    assert set(snapshot["vehicles"]) == {"VIN1"}
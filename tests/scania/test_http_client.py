@@ -0,0 +1,182 @@
+import httpx
+import pytest
+
+from app.core import http_client
+from app.services.scania_auth.auth import auth_service
+from app.services.scania_vehicles_status.client import VehicleStatusClient
+
+
+@pytest.mark.asyncio
+async def test_vehicle_status_pages_share_injected_client(monkeypatch):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if len(requests) == 1:
+            return httpx.Response(200, json={
+                "vehicleStatusResponse": {"vehicleStatuses": [{"vin": "VIN1"}]},
+                "moreDataAvailable": True,
+                "moreDataAvailableLink": "/rfms4/vehiclestatuses?lastVin=VIN1",
+            })
+        return httpx.Response(200, json={
+            "vehicleStatusResponse": {"vehicleStatuses": [{"vin": "VIN1"}]},
+            "moreDataAvailable": False,
+        })
+
+    async def fake_get_token():
+        return "TOKEN"
+
+    monkeypatch.setattr(auth_service, "get_token", fake_get_token)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as mock_client:
+        client = VehicleStatusClient(http_client=mock_client)
+        resp = await client.get_vehicle_status("VIN1", "2024-01-01T00:00:00Z", "2024-01-02T00:00:00Z")
+
+    assert len(resp["vehicleStatusResponse"]["vehicleStatuses"]) == 2
+    assert requests[0].url.params["vin"] == "VIN1"
+    assert requests[1].url.params["lastVin"] == "VIN1"
+    assert requests[1].headers["Authorization"] == "Bearer TOKEN"
+
+
+@pytest.mark.asyncio
+async def test_unauthorized_renews_token_and_retries_once(monkeypatch):
+    seen_tokens = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        token = request.headers["Authorization"].removeprefix("Bearer ")
+        seen_tokens.append(token)
+        if token == "OLD":
+            return httpx.Response(401)
+        return httpx.Response(200, json={"vehicleStatusResponse": {"vehicleStatuses": []}})
+
+    async def fake_get_token():
+        return "OLD"
+
+    async def fake_renew_after_unauthorized(rejected_token):
+        assert rejected_token == "OLD"
+        return "NEW"
+
+    monkeypatch.setattr(auth_service, "get_token", fake_get_token)
+    monkeypatch.setattr(auth_service, "renew_after_unauthorized", fake_renew_after_unauthorized)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as mock_client:
+        client = VehicleStatusClient(http_client=mock_client)
+        resp = await client.get_vehicle_status("VIN1", "2024-01-01T00:00:00Z", "2024-01-02T00:00:00Z")
+
+    assert resp["vehicleStatusResponse"]["vehicleStatuses"] == []
+    assert seen_tokens == ["OLD", "NEW"]
+
+
+@pytest.mark.asyncio
+async def test_shared_client_is_reused_until_closed():
+    first = http_client.get_http_client(http_client.SCANIA_HOST)
+    assert http_client.get_http_client(http_client.SCANIA_HOST) is first
+
+    await http_client.close_http_clients()
+    assert first.is_closed
+    assert http_client.get_http_client(http_client.SCANIA_HOST) is not first
+    await http_client.close_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_sleeps_for_reserved_turn_and_fails_open(monkeypatch):
+    from redis.exceptions import ConnectionError as RedisConnectionError
+    from app.core import rate_limiter
+
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    async def reserved_script(keys, args):
+        assert keys == ["rate_limit:scania:test"]
+        return "0.25"
+
+    async def broken_script(keys, args):
+        raise RedisConnectionError("down")
+
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", fake_sleep)
+    limiter = rate_limiter.RedisTokenBucket("test", rate_per_second=4, burst=1)
+
+    limiter._script = reserved_script
+    await limiter.acquire()
+    limiter._script = broken_script
+    await limiter.acquire()
+
+    assert sleeps == [0.25]
+
+
+@pytest.mark.asyncio
+async def test_resilient_get_honours_retry_after_and_opens_circuit(monkeypatch):
+    from app.core import resilience
+
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr(resilience.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(resilience.settings, "HTTP_RETRY_ATTEMPTS", 2)
+    monkeypatch.setattr(resilience.settings, "CIRCUIT_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(resilience, "_circuit_breakers", {})
+
+    responses = iter([httpx.Response(429, headers={"Retry-After": "7"}), httpx.Response(200)])
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(lambda r: next(responses))) as client:
+        resp = await resilience.resilient_get(client, "https://example.test/a", host="test")
+    assert resp.status_code == 200
+    assert sleeps == [7.0]
+
+    calls = 0
+
+    def down(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(503)
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(down)) as client:
+        # el circuito se abre tras el 2.º 503: el tercer intento ya no sale
+        with pytest.raises(resilience.CircuitOpenError):
+            await resilience.resilient_get(client, "https://example.test/b", host="test")
+        with pytest.raises(resilience.CircuitOpenError):
+            await resilience.resilient_get(client, "https://example.test/b", host="test")
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_trial_call_does_not_wedge_half_open_circuit(monkeypatch):
+    import asyncio
+    from app.core import resilience
+
+    monkeypatch.setattr(resilience, "_circuit_breakers", {})
+    breaker = resilience.get_circuit_breaker("test")
+    breaker._opened_at = 0.0  # abierto hace mucho: la siguiente llamada es la prueba
+
+    def cancelled(request):
+        raise asyncio.CancelledError()
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(cancelled)) as client:
+        with pytest.raises(asyncio.CancelledError):
+            await resilience.resilient_get(client, "https://example.test/a", host="test")
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(200))) as client:
+        resp = await resilience.resilient_get(client, "https://example.test/a", host="test")
+    assert resp.status_code == 200
+    assert not breaker.is_open
+
+
+@pytest.mark.asyncio
+async def test_throttled_trial_call_leaves_circuit_half_open(monkeypatch):
+    from app.core import resilience
+
+    monkeypatch.setattr(resilience.settings, "HTTP_RETRY_ATTEMPTS", 0)
+    monkeypatch.setattr(resilience, "_circuit_breakers", {})
+    breaker = resilience.get_circuit_breaker("test")
+    breaker._opened_at = 0.0  # abierto hace mucho: la siguiente llamada es la prueba
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(429))) as client:
+        resp = await resilience.resilient_get(client, "https://example.test/a", host="test")
+    assert resp.status_code == 429
+    # el 429 no prueba que el host esté sano: sigue semiabierto, listo para otra prueba
+    assert breaker.is_open
+    assert not breaker._trial_in_flight
@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.scania_vehicles_status import segment_cache, service
+
+
+def _parse(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+@pytest.mark.asyncio
+async def test_overlapping_windows_only_fetch_missing_sub_intervals(monkeypatch, fake_redis):
+    redis = fake_redis
+    monkeypatch.setattr(segment_cache, "get_redis_client", lambda: redis)
+    monkeypatch.setattr(service.settings, "SCANIA_SEGMENT_CACHE_ENABLED", True)
+
+    requested = []
+
+    async def fake_iter_vehicle_status_pages(**kwargs):
+        start, stop = _parse(kwargs["starttime"]), _parse(kwargs["stoptime"])
+        requested.append((start, stop))
+        ts = start
+        while ts < stop:
+            yield [{"createdDateTime": ts.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "hrTotalVehicleDistance": int(ts.timestamp())}]
+            ts += timedelta(hours=1)
+
+    monkeypatch.setattr(service.vehicle_status_client, "iter_vehicle_status_pages", fake_iter_vehicle_status_pages)
+
+    async def collect(start, stop):
+        sem = asyncio.Semaphore(2)
+        return [ts.strftime("%Y-%m-%dT%H:%M:%SZ") async for page in service._iter_cached_window_statuses(
+            "VIN1", _parse(start), _parse(stop), sem) for ts in page.timestamps]
+
+    first = await collect("2024-01-01T06:00:00Z", "2024-01-02T06:00:00Z")
+    second = await collect("2024-01-01T12:00:00Z", "2024-01-02T12:00:00Z")
+
+    utc = timezone.utc
+    assert requested == [
+        (datetime(2024, 1, 1, 6, tzinfo=utc), datetime(2024, 1, 2, 6, tzinfo=utc)),
+        (datetime(2024, 1, 2, 6, tzinfo=utc), datetime(2024, 1, 2, 12, tzinfo=utc)),
+    ]
+    assert len(first) == 24 and len(second) == 24
+    assert second[0] == "2024-01-01T12:00:00Z" and second[-1] == "2024-01-02T11:00:00Z"
+    assert second == sorted(second)
+    assert len(redis.data) == 2  # una cubeta por día
+
+
+@pytest.mark.asyncio
+async def test_miss_yields_only_samples_inside_the_piece(monkeypatch, fake_redis):
+    redis = fake_redis
+    monkeypatch.setattr(segment_cache, "get_redis_client", lambda: redis)
+    monkeypatch.setattr(service.settings, "SCANIA_SEGMENT_CACHE_ENABLED", True)
+
+    async def fake_iter_vehicle_status_pages(**kwargs):
+        # rFMS devuelve también los bordes: una hora antes y justo en el fin
+        start, stop = _parse(kwargs["starttime"]), _parse(kwargs["stoptime"])
+        ts = start - timedelta(hours=1)
+        while ts <= stop:
+            yield [{"createdDateTime": ts.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "hrTotalVehicleDistance": int(ts.timestamp())}]
+            ts += timedelta(hours=1)
+
+    monkeypatch.setattr(service.vehicle_status_client, "iter_vehicle_status_pages", fake_iter_vehicle_status_pages)
+
+    async def collect():
+        sem = asyncio.Semaphore(2)
+        return [ts.strftime("%Y-%m-%dT%H:%M:%SZ") async for page in service._iter_cached_window_statuses(
+            "VIN1", _parse("2024-01-01T06:00:00Z"), _parse("2024-01-01T12:00:00Z"), sem) for ts in page.timestamps]
+
+    fetched = await collect()
+    cached = await collect()
+
+    assert fetched == cached
+    assert fetched[0] == "2024-01-01T06:00:00Z" and fetched[-1] == "2024-01-01T11:00:00Z"
+
+
+def test_day_bucket_round_trips_compact_columns():
+    from app.services.scania_vehicles_status.samples import StatusColumns
+
+    cols = StatusColumns.from_statuses([
+        {"createdDateTime": "2024-01-01T00:00:00Z", "hrTotalVehicleDistance": 1_000_000,
+         "engineTotalFuelUsed": 5_000, "snapshotData": {"catalystFuelLevel": 80}},
+        {"createdDateTime": "2024-01-01T00:10:00.5Z", "hrTotalVehicleDistance": 1_001_000},
+    ])
+    day = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    bucket = segment_cache.DayBucket(day)
+    bucket.add(cols.epoch_ns[0], cols.epoch_ns[-1] + 1, cols)
+
+    loaded = segment_cache.DayBucket.loads(day, bucket.dumps())
+
+    assert loaded.covered == bucket.covered
+    assert loaded.cols.epoch_ns.tolist() == cols.epoch_ns.tolist()
+    assert loaded.cols.km.tolist() == [1000.0, 1001.0]
+    assert loaded.cols.diesel[0] == 5.0 and loaded.cols.diesel[1] != loaded.cols.diesel[1]
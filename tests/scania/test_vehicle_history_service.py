@@ -1,32 +1,31 @@
+import asyncio
+import numpy as np
 import pytest
 from datetime import datetime, timedelta
 
 from app.services.scania_vehicles_status import service
+from app.services.scania_vehicles_status.samples import StatusColumns
 
 @pytest.mark.asyncio
 async def test_segmented_vehicle_status(monkeypatch):
     calls = []
 
-    async def fake_get_vehicle_status(*, vin, starttime, stoptime, content_filter="", latest_only=False):
+    async def fake_iter_vehicle_status_pages(*, vin, starttime, stoptime, content_filter="", latest_only=False):
         calls.append((starttime, stoptime))
         idx = len(calls)
-        return {
-            "vehicleStatusResponse": {
-                "vehicleStatuses": [
-                    {
-                        "createdDateTime": starttime,
-                        "hrTotalVehicleDistance": idx * 1000,
-                        "engineTotalFuelUsed": idx * 100,
-                        "snapshotData": {"catalystFuelLevel": 50 - idx}
-                    }
-                ]
+        yield [
+            {
+                "createdDateTime": starttime,
+                "hrTotalVehicleDistance": idx * 1000,
+                "engineTotalFuelUsed": idx * 100,
+                "snapshotData": {"catalystFuelLevel": 50 - idx}
             }
-        }
+        ]
 
     async def fake_get_evaluation(vin, start_date, end_date):
         return {}
 
-    monkeypatch.setattr(service.vehicle_status_client, "get_vehicle_status", fake_get_vehicle_status)
+    monkeypatch.setattr(service.vehicle_status_client, "iter_vehicle_status_pages", fake_iter_vehicle_status_pages)
     monkeypatch.setattr(service.evaluation_client, "get_evaluation", fake_get_evaluation)
 
     start = datetime(2024, 1, 1)
@@ -39,3 +38,528 @@ async def test_segmented_vehicle_status(monkeypatch):
 
     assert len(calls) == 3
     assert len(result["historical_data"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_history_consumes_pages_incrementally(monkeypatch):
+    pages = [
+        [
+            {"createdDateTime": "2024-01-01T00:00:00Z", "hrTotalVehicleDistance": 1_000_000,
+             "engineTotalFuelUsed": 500_000, "snapshotData": {"catalystFuelLevel": 80}},
+            {"createdDateTime": "2024-01-01T01:00:00Z", "hrTotalVehicleDistance": 1_050_000,
+             "engineTotalFuelUsed": 520_000, "snapshotData": {"catalystFuelLevel": 70}},
+        ],
+        [
+            {"createdDateTime": "2024-01-01T02:00:00Z", "hrTotalVehicleDistance": 1_100_000,
+             "engineTotalFuelUsed": 540_000, "snapshotData": {"catalystFuelLevel": 90}},
+            {"createdDateTime": "2024-01-01T03:00:00Z", "hrTotalVehicleDistance": 1_150_000,
+             "engineTotalFuelUsed": 560_000, "snapshotData": {"catalystFuelLevel": 60}},
+        ],
+    ]
+
+    async def fake_iter_vehicle_status_pages(**kwargs):
+        for page in pages:
+            yield page
+
+    async def fake_get_evaluation(vin, start_date, end_date):
+        return {}
+
+    monkeypatch.setattr(service.vehicle_status_client, "iter_vehicle_status_pages", fake_iter_vehicle_status_pages)
+    monkeypatch.setattr(service.evaluation_client, "get_evaluation", fake_get_evaluation)
+
+    result = await service.get_vehicle_historical_data("VIN1", "2024-01-01T00:00:00Z", "2024-01-01T04:00:00Z")
+
+    summary = result["summary"]
+    assert len(result["historical_data"]) == 4
+    assert summary.km_recorridos == 150
+    assert summary.consumo_lts_diesel == 60
+    assert summary.odometro == 1150
+    # caídas 80→70 y 90→60 (%) sobre tanque de 105 L; la recarga no suma
+    assert summary.lts_adblue_consumidos == round((10 + 30) * 105 / 100, 2)
+
+
+@pytest.mark.asyncio
+async def test_segments_fetched_concurrently_in_time_order(monkeypatch):
+    in_flight = 0
+    max_in_flight = 0
+
+    async def fake_iter_vehicle_status_pages(*, vin, starttime, stoptime, content_filter="", latest_only=False):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        day = datetime.fromisoformat(starttime.replace("Z", "+00:00")).day
+        # segmentos tempranos tardan más: el merge debe respetar el orden temporal
+        await asyncio.sleep(0.01 * (40 - day) / 5)
+        in_flight -= 1
+        yield [{
+            "createdDateTime": starttime,
+            "hrTotalVehicleDistance": day * 1000,
+            "engineTotalFuelUsed": day * 100,
+            "snapshotData": {"catalystFuelLevel": 100 - day},
+        }]
+
+    async def fake_get_evaluation(vin, start_date, end_date):
+        return {}
+
+    monkeypatch.setattr(service.settings, "SCANIA_SEGMENT_CONCURRENCY", 2)
+    monkeypatch.setattr(service.vehicle_status_client, "iter_vehicle_status_pages", fake_iter_vehicle_status_pages)
+    monkeypatch.setattr(service.evaluation_client, "get_evaluation", fake_get_evaluation)
+
+    result = await service.get_vehicle_historical_data("VIN1", "2024-01-01T00:00:00Z", "2024-01-31T00:00:00Z")
+
+    timestamps = [h.timestamp for h in result["historical_data"]]
+    assert timestamps == sorted(timestamps)
+    assert len(timestamps) == 6
+    assert max_in_flight <= 2
+
+
+@pytest.mark.asyncio
+async def test_history_reads_store_and_fetches_head_and_tail(monkeypatch):
+    calls = []
+
+    async def fake_get_sync_range(session, vin):
+        # primer backfill desde el 2 de enero; marca de agua el 3
+        return (datetime.fromisoformat("2024-01-02T00:00:00+00:00"),
+                datetime.fromisoformat("2024-01-03T00:00:00+00:00"))
+
+    async def fake_iter_status_samples(session, vin, start, stop):
+        assert start == datetime.fromisoformat("2024-01-02T00:00:00+00:00")
+        assert stop == datetime.fromisoformat("2024-01-03T00:00:00+00:00")
+        yield StatusColumns.from_statuses([
+            {"createdDateTime": "2024-01-02T00:00:00+00:00", "hrTotalVehicleDistance": 1_100_000},
+            {"createdDateTime": "2024-01-02T12:00:00+00:00", "hrTotalVehicleDistance": 1_150_000},
+        ])
+
+    async def fake_iter_vehicle_status_pages(*, vin, starttime, stoptime, content_filter="", latest_only=False):
+        calls.append((starttime, stoptime))
+        km = {"2024-01-01T00:00:00Z": 1_000_000, "2024-01-03T00:00:00Z": 1_200_000}[starttime]
+        yield [{"createdDateTime": starttime, "hrTotalVehicleDistance": km}]
+
+    async def fake_get_evaluation(vin, start_date, end_date):
+        return {}
+
+    monkeypatch.setattr(service.settings, "SCANIA_STATUS_STORE_ENABLED", True)
+    monkeypatch.setattr(service, "get_sync_range", fake_get_sync_range)
+    monkeypatch.setattr(service, "iter_status_samples", fake_iter_status_samples)
+    monkeypatch.setattr(service.vehicle_status_client, "iter_vehicle_status_pages", fake_iter_vehicle_status_pages)
+    monkeypatch.setattr(service.evaluation_client, "get_evaluation", fake_get_evaluation)
+
+    result = await service.get_vehicle_historical_data("VIN1", "2024-01-01T00:00:00Z", "2024-01-04T00:00:00Z")
+
+    # lo anterior al primer backfill y lo posterior a la marca van a rFMS
+    assert calls == [
+        ("2024-01-01T00:00:00Z", "2024-01-02T00:00:00Z"),
+        ("2024-01-03T00:00:00Z", "2024-01-04T00:00:00Z"),
+    ]
+    assert [h.km_recorridos for h in result["historical_data"]] == [1000, 1100, 1150, 1200]
+    assert result["summary"].km_recorridos == 200
+
+
+def _scalar_adblue_reference(niveles):
+    """Implementación escalar original (recorrido elemento a elemento)."""
+    consumido, previo = 0.0, None
+    for nivel in niveles:
+        if nivel is None:
+            previo = None
+            continue
+        nivel_lts = nivel * service.TANK_CAPACITY_LTS / 100 if nivel <= 100 else nivel
+        if previo is not None and nivel_lts < previo:
+            consumido += previo - nivel_lts
+        previo = nivel_lts
+    return round(consumido, 2)
+
+
+def test_store_rows_become_the_same_columns_as_rfms_statuses():
+    from datetime import timezone
+    from app.services.scania_vehicles_status.storage import _columns_from_rows
+
+    ts = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    rows = [
+        (ts, 1_100_000.0, 500_000.0, 80.0),
+        (ts + timedelta(minutes=10), None, None, None),
+    ]
+    statuses = [
+        {"createdDateTime": "2024-01-02T00:00:00Z", "hrTotalVehicleDistance": 1_100_000,
+         "engineTotalFuelUsed": 500_000, "snapshotData": {"catalystFuelLevel": 80}},
+        {"createdDateTime": "2024-01-02T00:10:00Z"},
+    ]
+
+    obtenido, esperado = _columns_from_rows(rows), StatusColumns.from_statuses(statuses)
+    for campo in ("epoch_ns", "km", "diesel", "adblue"):
+        np.testing.assert_array_equal(getattr(obtenido, campo), getattr(esperado, campo))
+
+
+def test_vectorized_adblue_matches_scalar_reference_across_pages():
+    import random
+
+    rng = random.Random(7)
+    niveles = [
+        None if rng.random() < 0.1 else rng.choice([rng.uniform(0, 100), rng.uniform(101, 105)])
+        for _ in range(5_000)
+    ]
+    statuses = [
+        {
+            "createdDateTime": (datetime(2024, 1, 1) + timedelta(seconds=i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "hrTotalVehicleDistance": 1_000 * i,
+            **({"snapshotData": {"catalystFuelLevel": n}} if n is not None else {}),
+        }
+        for i, n in enumerate(niveles)
+    ]
+
+    acc = service._HistoryAccumulator("VIN1")
+    for i in range(0, len(statuses), 137):
+        acc.add_page(StatusColumns.from_statuses(statuses[i:i + 137]))
+
+    assert acc.count == len(statuses)
+    assert acc.adblue_consumido == _scalar_adblue_reference(niveles)
+    assert acc.last.km == (len(statuses) - 1)
+
+
+def test_adblue_drops_ignore_arrival_order_within_page():
+    import random
+
+    statuses = [
+        {
+            "createdDateTime": f"2024-01-01T00:{i:02d}:00Z",
+            "hrTotalVehicleDistance": 1_000 * i,
+            "snapshotData": {"catalystFuelLevel": 90 - i},
+        }
+        for i in range(40)
+    ]
+    desordenados = statuses[:]
+    random.Random(3).shuffle(desordenados)
+
+    acc = service._HistoryAccumulator("VIN1")
+    acc.add_page(StatusColumns.from_statuses(desordenados))
+
+    # nivel 90→51 % en bajada continua: sin caídas fantasma por el desorden
+    assert acc.adblue_consumido == round(39 * service.TANK_CAPACITY_LTS / 100, 2)
+    assert acc.first.km == 0 and acc.last.km == 39
+
+
+@pytest.mark.asyncio
+async def test_overlapping_out_of_order_pages_match_sorted_series(monkeypatch):
+    start = datetime.fromisoformat("2024-01-01T00:00:00+00:00")
+    samples = [
+        {
+            "createdDateTime": (start + timedelta(minutes=10 * i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "hrTotalVehicleDistance": 1_000_000 + i * 5_000,
+            "engineTotalFuelUsed": 400_000 + i * 1_500,
+            "snapshotData": {"catalystFuelLevel": 90 - (i * 7 % 40)},
+        }
+        for i in range(60)
+    ]
+    # la segunda página repite el borde de la primera y trae una muestra
+    # anterior a él; la tercera llega desordenada
+    desordenadas = [
+        samples[0:20] + [samples[25]],
+        samples[20:25] + samples[19:20] + samples[26:40],
+        samples[40:60][::-1],
+    ]
+
+    def fake_pages(pages):
+        async def fake_iter_vehicle_status_pages(**kwargs):
+            for page in pages:
+                yield page
+        return fake_iter_vehicle_status_pages
+
+    async def fake_get_evaluation(vin, start_date, end_date):
+        return {}
+
+    monkeypatch.setattr(service.evaluation_client, "get_evaluation", fake_get_evaluation)
+
+    async def history(pages):
+        monkeypatch.setattr(service.vehicle_status_client, "iter_vehicle_status_pages", fake_pages(pages))
+        return await service.get_vehicle_historical_data(
+            "VIN1", "2024-01-01T00:00:00Z", "2024-01-02T00:00:00Z", resolution="1h"
+        )
+
+    esperado = await history([samples])
+    obtenido = await history(desordenadas)
+
+    assert obtenido["summary"] == esperado["summary"]
+    assert obtenido["buckets"] == esperado["buckets"]
+    assert sum(b.muestras for b in obtenido["buckets"]) == len(samples)
+
+
+@pytest.mark.asyncio
+async def test_bucketed_history_sums_to_window_totals(monkeypatch):
+    start = datetime.fromisoformat("2024-01-01T00:00:00+00:00")
+    samples = [
+        {
+            "createdDateTime": (start + timedelta(minutes=10 * i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "hrTotalVehicleDistance": 1_000_000 + i * 5_000,
+            "engineTotalFuelUsed": 400_000 + i * 1_500,
+            "snapshotData": {"catalystFuelLevel": 90 - (i % 50)},
+        }
+        for i in range(24 * 6)
+    ]
+
+    async def fake_iter_vehicle_status_pages(**kwargs):
+        # páginas de 7 muestras: los intervalos de 1 h cruzan páginas
+        for i in range(0, len(samples), 7):
+            yield samples[i:i + 7]
+
+    async def fake_get_evaluation(vin, start_date, end_date):
+        return {}
+
+    monkeypatch.setattr(service.vehicle_status_client, "iter_vehicle_status_pages", fake_iter_vehicle_status_pages)
+    monkeypatch.setattr(service.evaluation_client, "get_evaluation", fake_get_evaluation)
+
+    result = await service.get_vehicle_historical_data(
+        "VIN1", "2024-01-01T00:00:00Z", "2024-01-02T00:00:00Z", resolution="1h"
+    )
+
+    buckets = result["buckets"]
+    summary = result["summary"]
+    assert result["historical_data"] == []
+    assert len(buckets) == 24
+    assert all(b.muestras == 6 for b in buckets)
+    assert buckets[1].bucket_start == start + timedelta(hours=1)
+    assert buckets[1].km_inicio == 1030 and buckets[1].km_fin == 1055
+    assert sum(b.km_recorridos for b in buckets) == pytest.approx(summary.km_recorridos)
+    assert sum(b.consumo_lts_diesel for b in buckets) == pytest.approx(summary.consumo_lts_diesel)
+    assert sum(b.lts_adblue_consumidos for b in buckets) == pytest.approx(summary.lts_adblue_consumidos, abs=0.01 * 24)
+
+
+@pytest.mark.asyncio
+async def test_bucketed_consumption_bridges_missing_readings(monkeypatch):
+    start = datetime.fromisoformat("2024-01-01T00:00:00+00:00")
+    samples = []
+    for i in range(24 * 6):
+        sample = {
+            "createdDateTime": (start + timedelta(minutes=10 * i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "hrTotalVehicleDistance": 1_000_000 + i * 5_000,
+            "engineTotalFuelUsed": 400_000 + i * 1_500,
+        }
+        # huecos sueltos y al cierre de cada página de 7
+        if i % 5 == 2 or i % 7 == 6:
+            del sample["engineTotalFuelUsed"]
+        samples.append(sample)
+
+    async def fake_iter_vehicle_status_pages(**kwargs):
+        for i in range(0, len(samples), 7):
+            yield samples[i:i + 7]
+
+    async def fake_get_evaluation(vin, start_date, end_date):
+        return {}
+
+    monkeypatch.setattr(service.vehicle_status_client, "iter_vehicle_status_pages", fake_iter_vehicle_status_pages)
+    monkeypatch.setattr(service.evaluation_client, "get_evaluation", fake_get_evaluation)
+
+    result = await service.get_vehicle_historical_data(
+        "VIN1", "2024-01-01T00:00:00Z", "2024-01-02T00:00:00Z", resolution="1h"
+    )
+
+    buckets = result["buckets"]
+    diesel = [s["engineTotalFuelUsed"] for s in samples if "engineTotalFuelUsed" in s]
+    total = (diesel[-1] - diesel[0]) / 1000
+    assert sum(b.consumo_lts_diesel for b in buckets) == pytest.approx(total)
+    assert sum(b.consumo_lts_diesel for b in buckets) == pytest.approx(result["summary"].consumo_lts_diesel)
+
+
+@pytest.mark.asyncio
+async def test_ndjson_history_streams_samples_then_summary(monkeypatch):
+    import orjson
+    from app.services.scania_vehicles_status import routers
+
+    pages = [
+        [
+            {"createdDateTime": "2024-01-01T00:00:00Z", "hrTotalVehicleDistance": 1_000_000,
+             "engineTotalFuelUsed": 500_000, "snapshotData": {"catalystFuelLevel": 80}},
+            {"createdDateTime": "2024-01-01T01:00:00Z", "hrTotalVehicleDistance": 1_050_000,
+             "engineTotalFuelUsed": 520_000},
+        ],
+        [
+            {"createdDateTime": "2024-01-01T02:00:00Z", "hrTotalVehicleDistance": 1_100_000,
+             "engineTotalFuelUsed": 540_000, "snapshotData": {"catalystFuelLevel": 70}},
+        ],
+    ]
+
+    async def fake_iter_vehicle_status_pages(**kwargs):
+        for page in pages:
+            yield page
+
+    async def fake_get_evaluation(vin, start_date, end_date):
+        return {}
+
+    monkeypatch.setattr(service.vehicle_status_client, "iter_vehicle_status_pages", fake_iter_vehicle_status_pages)
+    monkeypatch.setattr(service.evaluation_client, "get_evaluation", fake_get_evaluation)
+
+    body = b"".join([
+        chunk async for chunk in routers._ndjson_history(
+            "VIN1", "2024-01-01T00:00:00Z", "2024-01-01T03:00:00Z", "raw"
+        )
+    ])
+    records = [orjson.loads(line) for line in body.splitlines()]
+
+    assert [r["type"] for r in records] == ["sample"] * 3 + ["summary"]
+    assert records[0]["timestamp"] == "2024-01-01T00:00:00+00:00"
+    assert records[1]["lts_adblue_consumidos"] is None
+    assert records[-1]["summary"]["km_recorridos"] == 100
+
+
+@pytest.mark.asyncio
+async def test_fleet_summaries_use_one_sweep_demuxed_by_vin(monkeypatch):
+    def status(vin, hour, km, fuel, adblue):
+        return {"vin": vin, "createdDateTime": f"2024-01-01T{hour:02d}:00:00Z",
+                "hrTotalVehicleDistance": km, "engineTotalFuelUsed": fuel,
+                "snapshotData": {"catalystFuelLevel": adblue}}
+
+    pages = [
+        [status("VIN1", 0, 1_000_000, 500_000, 80), status("VIN2", 0, 2_000_000, 900_000, 50),
+         status("VIN3", 0, 3_000_000, 100_000, 40)],
+        [status("VIN1", 1, 1_040_000, 515_000, 75), status("VIN2", 1, 2_010_000, 903_000, 50)],
+    ]
+    calls = []
+
+    async def fake_iter_vehicle_status_pages(**kwargs):
+        calls.append(kwargs["vin"])
+        for page in pages:
+            yield page
+
+    monkeypatch.setattr(service.vehicle_status_client, "iter_vehicle_status_pages", fake_iter_vehicle_status_pages)
+
+    summaries = await service.get_fleet_summaries(
+        ["VIN1", "VIN2", "VIN4"], "2024-01-01T00:00:00Z", "2024-01-01T02:00:00Z"
+    )
+
+    assert calls == [None]
+    assert set(summaries) == {"VIN1", "VIN2", "VIN4"}
+    assert summaries["VIN1"].km_recorridos == 40
+    assert summaries["VIN1"].consumo_lts_diesel == 15
+    assert summaries["VIN1"].lts_adblue_consumidos == round(5 * 105 / 100, 2)
+    assert summaries["VIN2"].km_recorridos == 10
+    assert summaries["VIN4"] is None
+
+
+@pytest.mark.asyncio
+async def test_window_summaries_from_one_prefetch_match_per_window(monkeypatch):
+    start = datetime.fromisoformat("2024-03-01T00:00:00+00:00")
+    samples = [
+        {
+            "createdDateTime": (start + timedelta(minutes=20 * i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "hrTotalVehicleDistance": 2_000_000 + i * 9_000,
+            "engineTotalFuelUsed": 700_000 + i * 3_100,
+            "snapshotData": {"catalystFuelLevel": 90 - (i * 7 % 60)},
+        }
+        for i in range(3 * 72)
+    ]
+    calls = []
+
+    async def fake_iter_vehicle_status_pages(**kwargs):
+        calls.append((kwargs["starttime"], kwargs["stoptime"]))
+        lo, hi = service._parse_iso(kwargs["starttime"]), service._parse_iso(kwargs["stoptime"])
+        yield [s for s in samples if lo <= service._parse_iso(s["createdDateTime"]) < hi]
+
+    async def fake_get_evaluation(vin, start_date, end_date):
+        return {}
+
+    monkeypatch.setattr(service.vehicle_status_client, "iter_vehicle_status_pages", fake_iter_vehicle_status_pages)
+    monkeypatch.setattr(service.evaluation_client, "get_evaluation", fake_get_evaluation)
+
+    windows = [
+        ("2024-03-01T02:00:00Z", "2024-03-01T09:30:00Z"),
+        ("2024-03-01T09:30:00Z", "2024-03-02T01:10:00Z"),
+        ("2024-03-02T06:00:00Z", "2024-03-03T20:00:00Z"),
+        ("2024-03-03T21:00:00Z", "2024-03-03T21:05:00Z"),  # sin muestras
+    ]
+    batch = await service.get_vehicle_window_summaries("VIN1", windows)
+    assert len(calls) == 1
+
+    for (a, b), resumen in zip(windows, batch):
+        esperado = (await service.get_vehicle_historical_data("VIN1", a, b))["summary"]
+        if esperado is None:
+            assert resumen is None
+            continue
+        assert resumen.km_recorridos == pytest.approx(esperado.km_recorridos)
+        assert resumen.consumo_lts_diesel == pytest.approx(esperado.consumo_lts_diesel)
+        assert resumen.lts_adblue_consumidos == pytest.approx(esperado.lts_adblue_consumidos)
+        assert resumen.odometro == esperado.odometro
+        assert resumen.start_timestamp == esperado.start_timestamp
+
+
+@pytest.mark.asyncio
+async def test_window_summaries_keep_trips_resolved_before_timeouts(monkeypatch, fake_redis):
+    from app.services.scania_vehicles_status import evaluation_client as evaluation_module
+
+    start = datetime.fromisoformat("2024-03-01T00:00:00+00:00")
+    samples = [
+        {
+            "createdDateTime": (start + timedelta(minutes=20 * i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "hrTotalVehicleDistance": 2_000_000 + i * 9_000,
+            "engineTotalFuelUsed": 700_000 + i * 3_100,
+        }
+        for i in range(3 * 72)
+    ]
+    cutoff = start + timedelta(days=1)
+
+    async def fake_iter_vehicle_status_pages(**kwargs):
+        lo, hi = service._parse_iso(kwargs["starttime"]), service._parse_iso(kwargs["stoptime"])
+        if lo >= cutoff:
+            await asyncio.sleep(10)  # el resto de la descarga se cuelga
+        yield [s for s in samples if lo <= service._parse_iso(s["createdDateTime"]) < hi]
+
+    async def fake_fetch_evaluation(vin, start_date, end_date):
+        if start_date == "202403010200":
+            await asyncio.sleep(10)  # un reporte lento no arrastra a los demás
+        return {"VehicleList": [{"Distance": 1.0, "TotalFuelConsumption": 2.0}]}
+
+    monkeypatch.setattr(service, "SEGMENT_DAYS", 1)  # el primer día llega completo
+    monkeypatch.setattr(service.settings, "SCANIA_SEGMENT_CACHE_ENABLED", False)
+    monkeypatch.setattr(service.settings, "EVALUATION_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(service.vehicle_status_client, "iter_vehicle_status_pages", fake_iter_vehicle_status_pages)
+    monkeypatch.setattr(service.evaluation_client, "fetch_evaluation", fake_fetch_evaluation)
+    monkeypatch.setattr(evaluation_module, "get_redis_client", lambda: fake_redis)
+
+    windows = [
+        ("2024-03-01T02:00:00Z", "2024-03-01T09:30:00Z"),
+        ("2024-03-01T09:30:00Z", "2024-03-01T20:00:00Z"),
+        ("2024-03-02T06:00:00Z", "2024-03-03T20:00:00Z"),
+    ]
+    batch = await service.get_vehicle_window_summaries("VIN1", windows, download_timeout=0.2)
+
+    # la evaluación vencida cae a los estatus; la otra sí llegó
+    assert batch[0].km_recorridos == pytest.approx(22 * 9)
+    assert batch[1].km_recorridos == 1.0
+    # la descarga no alcanzó el fin de la última ventana
+    assert batch[2] is None
+
+
+@pytest.mark.asyncio
+async def test_window_summaries_follow_finished_segments_not_last_sample(monkeypatch):
+    start = datetime.fromisoformat("2024-03-01T00:00:00+00:00")
+    samples = [
+        {
+            "createdDateTime": (start + timedelta(minutes=20 * i)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "hrTotalVehicleDistance": 2_000_000 + i * 9_000,
+            "engineTotalFuelUsed": 700_000 + i * 3_100,
+        }
+        for i in range(3 * 72)
+        if not 36 <= i < 72  # estacionado la tarde del día 1: sin muestras
+    ]
+
+    async def fake_iter_vehicle_status_pages(**kwargs):
+        lo, hi = service._parse_iso(kwargs["starttime"]), service._parse_iso(kwargs["stoptime"])
+        if lo > start:
+            await asyncio.sleep(10)  # del día 2 en adelante se cuelga
+        yield [s for s in samples if lo <= service._parse_iso(s["createdDateTime"]) < hi]
+
+    async def fake_get_evaluation(vin, start_date, end_date):
+        return {}
+
+    monkeypatch.setattr(service, "SEGMENT_DAYS", 1)
+    monkeypatch.setattr(service.settings, "SCANIA_SEGMENT_CACHE_ENABLED", False)
+    monkeypatch.setattr(service.vehicle_status_client, "iter_vehicle_status_pages", fake_iter_vehicle_status_pages)
+    monkeypatch.setattr(service.evaluation_client, "get_evaluation", fake_get_evaluation)
+
+    windows = [
+        ("2024-03-01T00:00:00Z", "2024-03-01T20:00:00Z"),
+        ("2024-03-01T20:00:00Z", "2024-03-02T12:00:00Z"),
+        ("2024-03-02T12:00:00Z", "2024-03-03T20:00:00Z"),
+    ]
+    batch = await service.get_vehicle_window_summaries("VIN1", windows, download_timeout=0.2)
+
+    # el día 1 terminó de bajar aunque su última muestra sea de las 11:40
+    assert batch[0].km_recorridos == pytest.approx(35 * 9)
+    assert batch[1] is None and batch[2] is None
@@ -0,0 +1,46 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services.scania_vehicles import client as vehicles_module
+from app.services.scania_vehicles.utils import VehicleIndex
+
+
+def test_vehicle_index_lookup_by_normalized_number_and_vin():
+    index = VehicleIndex({"ECO 012": "VIN12", "345": "VIN345"})
+
+    assert index.lookup("ECO 012") == "VIN12"
+    assert index.lookup("12") == "VIN12"
+    assert index.lookup("eco-345") == "VIN345"
+    assert index.lookup("VIN345") == "VIN345"
+    assert index.lookup("999") is None
+
+
+@pytest.mark.asyncio
+async def test_stale_map_is_served_while_one_refresh_runs(monkeypatch, fake_redis):
+    stale = json.dumps({"fetched_at": 0, "vehicles": {"1": "OLDVIN"}})
+    redis = fake_redis
+    redis.data[vehicles_module.REDIS_KEY] = stale
+    monkeypatch.setattr(vehicles_module, "get_redis_client", lambda: redis)
+
+    api_calls = 0
+    release = asyncio.Event()
+
+    async def fake_fetch():
+        nonlocal api_calls
+        api_calls += 1
+        await release.wait()
+        return [{"customerVehicleName": "1", "vin": "NEWVIN"}]
+
+    client = vehicles_module.ScaniaVehiclesClient()
+    monkeypatch.setattr(client, "fetch_vehicles_from_api", fake_fetch)
+
+    maps = await asyncio.gather(*(client.get_vehicle_map() for _ in range(10)))
+    assert all(m == {"1": "OLDVIN"} for m in maps)
+
+    release.set()
+    await client._refresh_task
+    assert api_calls == 1
+    assert await client.get_vehicle_map() == {"1": "NEWVIN"}
+    assert json.loads(redis.data[vehicles_module.REDIS_KEY])["vehicles"] == {"1": "NEWVIN"}